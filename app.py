@@ -1,30 +1,57 @@
 import streamlit as st
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from PIL import Image
+import io
 import os
+import json
+from encoder_utils import load_pipeline
+from inference import load_artifacts, predict_batch, explain_batch, MODEL_PATH
+from explain import LocalExplainer
+from data_loader import NA_VALUES
+from metrics import load_runs
+
+EVALUATION_METRICS_PATH = "results/evaluation_metrics.json"
+SHAP_SUMMARY_PATH = "results/shap/shap_top_features_summary.csv"
+GLOBAL_CHART_PATH = "results/shap/global_feature_importance.png"
+THUMBNAIL_DIR = "results/thumbnails"
+THUMBNAIL_WIDTH = 900
+# Matches --server.maxUploadSize in the Dockerfile; uploads are scored in bounded batches
+MAX_UPLOAD_MB = 512
+SCORE_BATCH_ROWS = 50_000
+PREVIEW_ROWS = 1_000
 
 # === Page Setup ===
 st.set_page_config(page_title="Heart Diagnosis Model", layout="wide")
 st.title("🫀 Diagnosis of Cardiometabolic Conditions")
 st.markdown("---")
 
+def _mtime(path):
+    # Part of the cache key of every file-backed loader: a new pipeline run invalidates it
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
 # === Load Metrics ===
 @st.cache_data
-def load_metrics():
+def load_metrics(mtime=None):
+    # Written by the evaluate stage; ROC AUC is the macro one-vs-rest AUC of the test set
     try:
-        report = pd.read_csv("results/classification_report.csv", index_col=0)
-        metrics = {
-            "Accuracy": round(report.loc["accuracy"]["f1-score"], 4),
-            "ROC AUC": round(report.loc["weighted avg"]["f1-score"], 4)
+        with open(EVALUATION_METRICS_PATH, encoding="utf-8") as f:
+            evaluation = json.load(f)
+        return {
+            "Accuracy": round(evaluation["accuracy"], 4),
+            "ROC AUC": round(evaluation["roc_auc_macro"], 4)
         }
-        return metrics
     except Exception:
         return None
 
 # === Load Base Model Accuracies ===
 @st.cache_data
-def load_model_comparison():
+def load_model_comparison(mtime=None):
     try:
         return pd.read_csv("results/base_model_accuracies.csv")
     except FileNotFoundError:
@@ -32,14 +59,69 @@ def load_model_comparison():
 
 # === Load SHAP Summary ===
 @st.cache_data
-def load_shap_summary():
+def load_shap_summary(mtime=None):
     try:
-        return pd.read_csv("results/shap/shap_top_features_summary.csv")
+        return pd.read_csv(SHAP_SUMMARY_PATH)
     except FileNotFoundError:
         return pd.DataFrame()
 
-# === Save Bar Chart as PNG ===
-def save_global_bar_chart(df, output_path="results/shap/global_feature_importance.png", top_n=15):
+# === Load Pipeline Run Metrics ===
+@st.cache_data(ttl=60)
+def load_run_metrics(limit=30):
+    runs = load_runs(limit=limit)
+    rows = [dict(step, run_id=run["run_id"]) for run in runs for step in run["steps"]]
+    totals = pd.DataFrame([{"run_id": run["run_id"], "total_wall_seconds": run["total_wall_seconds"]}
+                           for run in runs])
+    return pd.DataFrame(rows), totals
+
+# === Load Preprocessing Pipeline ===
+@st.cache_resource
+def load_preprocessing_pipeline(path="models/preprocessing_pipeline.pkl", mtime=None):
+    try:
+        return load_pipeline(path)
+    except FileNotFoundError:
+        return None
+
+# === Load Model + Pipeline for Scoring (once per process) ===
+@st.cache_resource
+def load_scoring_artifacts(mtime=None):
+    try:
+        return load_artifacts()
+    except FileNotFoundError:
+        return None
+
+# === Per-Prediction Explainer (prebuilt xgb booster + LRU cache, shared across sessions) ===
+@st.cache_resource
+def load_local_explainer(mtime=None):
+    artifacts = load_scoring_artifacts(mtime)
+    return None if artifacts is None else LocalExplainer(*artifacts)
+
+# === Downscaled Thumbnails ===
+def thumbnail(path, mtime=None, max_width=THUMBNAIL_WIDTH):
+    """
+    Path of a downscaled copy of a results/ image. It is written once and regenerated only
+    when the source is newer, so reruns send a small image instead of the full-size PNG.
+    """
+    thumb_path = os.path.join(THUMBNAIL_DIR, os.path.relpath(path, "results"))
+    if _mtime(thumb_path) is not None and _mtime(thumb_path) >= mtime:
+        return thumb_path
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+    with Image.open(path) as image:
+        if image.width > max_width:
+            image.thumbnail((max_width, max_width * image.height // image.width), Image.LANCZOS)
+        # Plots have few distinct colours: a 256-colour palette keeps them sharp at a fraction of the size
+        image.convert("RGB").quantize(256).save(thumb_path, optimize=True)
+    return thumb_path
+
+def show_image(path, caption, missing):
+    mtime = _mtime(path)
+    if mtime is None:
+        st.error(f"{missing}: {path}")
+    else:
+        st.image(thumbnail(path, mtime), caption=caption, use_column_width=True)
+
+# === Global Importance (recomputed only when the SHAP summary changes) ===
+def save_global_bar_chart(df, output_path=GLOBAL_CHART_PATH, top_n=15):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     plt.figure(figsize=(10, 6))
     df.head(top_n).set_index("Feature").plot(kind="barh", legend=False)
@@ -50,10 +132,102 @@ def save_global_bar_chart(df, output_path="results/shap/global_feature_importanc
     plt.savefig(output_path)
     plt.close()
 
+@st.cache_data
+def load_global_importance(mtime=None, output_path=GLOBAL_CHART_PATH):
+    shap_summary = load_shap_summary(mtime)
+    if shap_summary.empty:
+        return shap_summary
+    global_df = (
+        shap_summary
+        .groupby("Feature", as_index=False)
+        .agg({"MeanAbsSHAP": "mean"})
+        .sort_values(by="MeanAbsSHAP", ascending=False)
+    )
+    # The PNG is rendered only if it is older than the summary it was built from
+    if _mtime(output_path) is None or _mtime(output_path) < mtime:
+        save_global_bar_chart(global_df, output_path)
+    return global_df
+
+# === Batch Scoring of an Uploaded File ===
+def score_upload(uploaded, model, pipeline, batch_rows=SCORE_BATCH_ROWS):
+    """
+    Scores the upload batch by batch (progress by bytes read). Predictions are streamed into an
+    in-memory Parquet file, so memory stays bounded for uploads up to the 512 MB limit.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    uploaded.seek(0)
+    if uploaded.name.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(uploaded)
+        batches = (b.to_pandas() for b in parquet_file.iter_batches(batch_size=batch_rows))
+        position = lambda n_rows: n_rows / max(parquet_file.metadata.num_rows, 1)
+    else:
+        batches = pd.read_csv(uploaded, na_values=NA_VALUES, chunksize=batch_rows)
+        position = lambda n_rows: uploaded.tell() / max(uploaded.size, 1)
+
+    progress = st.progress(0.0, text="Scoring...")
+    buffer, writer = io.BytesIO(), None
+    preview, inputs, counts, n_rows = [], [], None, 0
+    try:
+        for batch in batches:
+            result = predict_batch(model, pipeline, batch)
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(buffer, table.schema, compression="zstd")
+            writer.write_table(table.cast(writer.schema))
+
+            batch_counts = result["Prediction"].value_counts()
+            counts = batch_counts if counts is None else counts.add(batch_counts, fill_value=0)
+            if n_rows < PREVIEW_ROWS:
+                preview.append(result.head(PREVIEW_ROWS - n_rows))
+                # Raw rows of the preview, kept for per-row explanations
+                inputs.append(batch.head(PREVIEW_ROWS - n_rows))
+            n_rows += len(result)
+            progress.progress(min(position(n_rows), 1.0), text=f"Scored {n_rows:,} rows")
+    finally:
+        if writer is not None:
+            writer.close()
+    progress.progress(1.0, text=f"Scored {n_rows:,} rows")
+
+    return {
+        "rows": n_rows,
+        "counts": counts.astype(int).rename("Rows") if counts is not None else pd.Series(dtype=int),
+        "preview": pd.concat(preview) if preview else pd.DataFrame(),
+        "inputs": pd.concat(inputs, ignore_index=True) if inputs else pd.DataFrame(),
+        "parquet": buffer.getvalue()
+    }
+
+# === Explanation of One Prediction ===
+def show_row_explanation(inputs, top_k=10):
+    if inputs.empty:
+        return
+    st.markdown("#### 🧠 Why this prediction?")
+    row = st.number_input(f"Row of the preview (0-{len(inputs) - 1})", min_value=0, max_value=len(inputs) - 1,
+                          value=0, step=1)
+    explainer = load_local_explainer(_mtime(MODEL_PATH))
+    artifacts = load_scoring_artifacts(_mtime(MODEL_PATH))
+    if explainer is None or artifacts is None:
+        st.error("No trained model found. Please run the model first.")
+        return
+    result, explanation = explain_batch(*artifacts, inputs.iloc[[row]], explainer=explainer, top_k=top_k)
+    st.write(f"Prediction: **{result['Prediction'].iloc[0]}** "
+             f"(probability {result.filter(like='Proba_').max(axis=1).iloc[0]:.2f})")
+    cols = st.columns([2, 3])
+    with cols[0]:
+        # Raw values mix numbers and categories: shown as text
+        st.dataframe(explanation[["Feature", "Value", "SHAP"]].astype({"Value": str}).set_index("Feature"),
+                     use_container_width=True)
+    with cols[1]:
+        st.bar_chart(explanation.set_index("Feature")["SHAP"])
+    st.caption(f"Top {top_k} SHAP contributions of the XGBoost base model to the predicted class "
+               f"(log-odds, base value {explanation['BaseValue'].iloc[0]:.3f}). "
+               f"Cache: {explainer.cache_info()['hits']} hits, {explainer.cache_info()['misses']} misses.")
+
 # === Main App ===
 def main():
     # --- Overall Metrics ---
-    metrics = load_metrics()
+    metrics = load_metrics(_mtime(EVALUATION_METRICS_PATH))
     if metrics:
         col1, col2 = st.columns(2)
         col1.metric("✅ Accuracy", metrics["Accuracy"])
@@ -63,9 +237,55 @@ def main():
 
     st.markdown("---")
 
+    # --- Model Inputs ---
+    pipeline = load_preprocessing_pipeline(mtime=_mtime("models/preprocessing_pipeline.pkl"))
+    if pipeline is not None:
+        with st.expander("🧩 Model Inputs (preprocessing pipeline)"):
+            st.write(f"Features ({len(pipeline.feature_names_)}): " + ", ".join(pipeline.feature_names_))
+            if pipeline.classes_ is not None:
+                st.write("Classes: " + ", ".join(pipeline.classes_))
+            st.dataframe(
+                pd.DataFrame({
+                    "Feature": list(pipeline.categories_),
+                    "Categories": [", ".join(cats) for cats in pipeline.categories_.values()]
+                }).set_index("Feature"),
+                use_container_width=True
+            )
+
+    # --- Live Scoring ---
+    st.subheader("🩺 Score an Uploaded CSV")
+    uploaded = st.file_uploader(f"CSV or Parquet with the model input columns (up to {MAX_UPLOAD_MB} MB)",
+                                type=["csv", "parquet"])
+    if uploaded is not None:
+        if st.button("Run predictions", type="primary"):
+            artifacts = load_scoring_artifacts(_mtime(MODEL_PATH))
+            if artifacts is None:
+                st.error("No trained model found. Please run the model first.")
+            else:
+                try:
+                    # Kept in the session so that other widgets do not trigger a re-score
+                    st.session_state["scored"] = dict(score_upload(uploaded, *artifacts), file_id=uploaded.file_id)
+                except (ValueError, KeyError) as e:
+                    st.error(f"Could not score {uploaded.name}: {e}")
+
+        scored = st.session_state.get("scored")
+        if scored is not None and scored["file_id"] == uploaded.file_id:
+            cols = st.columns([1, 2])
+            with cols[0]:
+                st.metric("Rows scored", f"{scored['rows']:,}")
+                st.dataframe(scored["counts"], use_container_width=True)
+            with cols[1]:
+                st.dataframe(scored["preview"], use_container_width=True, height=300)
+            st.download_button("⬇️ Download predictions (Parquet)", scored["parquet"],
+                               file_name=f"{os.path.splitext(uploaded.name)[0]}_predictions.parquet",
+                               mime="application/octet-stream")
+            show_row_explanation(scored["inputs"])
+
+    st.markdown("---")
+
     # --- Base Model Accuracies ---
     st.subheader("📊 Base Model Accuracies")
-    model_df = load_model_comparison()
+    model_df = load_model_comparison(_mtime("results/base_model_accuracies.csv"))
     if not model_df.empty:
         st.dataframe(model_df.set_index("Model"), use_container_width=True)
     else:
@@ -75,7 +295,8 @@ def main():
 
     # --- SHAP Visualizations per Diagnosis ---
     st.subheader("🔍 SHAP Explanations by Diagnosis")
-    shap_summary = load_shap_summary()
+    summary_mtime = _mtime(SHAP_SUMMARY_PATH)
+    shap_summary = load_shap_summary(summary_mtime)
     if not shap_summary.empty:
         diagnoses = shap_summary["Class"].unique().tolist()
         selected_diagnosis = st.selectbox("Select Diagnosis Class", diagnoses)
@@ -90,21 +311,12 @@ def main():
         )
 
         # SHAP Plots
-        bar_path = f"results/shap/shap_bar_{selected_diagnosis}.png"
-        swarm_path = f"results/shap/shap_beeswarm_{selected_diagnosis}.png"
         cols = st.columns(2)
-
-        if os.path.exists(bar_path):
-            with cols[0]:
-                st.image(Image.open(bar_path), caption="SHAP Bar Plot")
-        else:
-            st.error(f"Missing SHAP bar plot: {bar_path}")
-
-        if os.path.exists(swarm_path):
-            with cols[1]:
-                st.image(Image.open(swarm_path), caption="SHAP Beeswarm Plot")
-        else:
-            st.error(f"Missing SHAP beeswarm plot: {swarm_path}")
+        with cols[0]:
+            show_image(f"results/shap/shap_bar_{selected_diagnosis}.png", "SHAP Bar Plot", "Missing SHAP bar plot")
+        with cols[1]:
+            show_image(f"results/shap/shap_beeswarm_{selected_diagnosis}.png", "SHAP Beeswarm Plot",
+                       "Missing SHAP beeswarm plot")
     else:
         st.warning("No SHAP summary available.")
 
@@ -118,7 +330,7 @@ def main():
     cols = st.columns(2)
     if os.path.exists(cm_path_img):
         with cols[0]:
-            st.image(Image.open(cm_path_img), caption="Confusion Matrix")
+            show_image(cm_path_img, "Confusion Matrix", "Missing confusion matrix")
     else:
         st.warning("No confusion matrix image found.")
 
@@ -133,22 +345,38 @@ def main():
 
     # --- Global SHAP Importance ---
     st.subheader("🌍 Global SHAP Feature Importance (All Classes Combined)")
-    if not shap_summary.empty:
-        global_df = (
-            shap_summary
-            .groupby("Feature", as_index=False)
-            .agg({"MeanAbsSHAP": "mean"})
-            .sort_values(by="MeanAbsSHAP", ascending=False)
-        )
+    global_df = load_global_importance(summary_mtime)
+    if not global_df.empty:
         st.dataframe(global_df.set_index("Feature"), use_container_width=True)
         st.bar_chart(global_df.set_index("Feature").head(15))
-
-        # Save as PNG
-        save_global_bar_chart(global_df)
-        st.success("📁 Global feature importance plot saved to `results/shap/global_feature_importance.png`")
+        st.caption(f"📁 Global feature importance plot: `{GLOBAL_CHART_PATH}`")
     else:
         st.warning("No SHAP summary available to compute global importance.")
 
+    st.markdown("---")
+
+    # --- Pipeline Run Metrics ---
+    st.subheader("⏱️ Pipeline Run Metrics")
+    steps, totals = load_run_metrics()
+    if not steps.empty:
+        # Stages (top-level spans) per run
+        stages = steps[~steps["name"].str.contains("/")]
+        st.line_chart(stages.pivot_table(index="run_id", columns="name", values="wall_seconds", aggfunc="sum"))
+
+        latest = steps[steps["run_id"] == totals["run_id"].iloc[-1]]
+        cols = st.columns(2)
+        with cols[0]:
+            st.caption(f"Slowest steps — run {totals['run_id'].iloc[-1]} "
+                       f"({totals['total_wall_seconds'].iloc[-1]:.1f}s total)")
+            st.dataframe(latest.nlargest(15, "wall_seconds")
+                         .set_index("name")[["wall_seconds", "cpu_seconds"]], use_container_width=True)
+        with cols[1]:
+            st.caption("Peak RSS (MB) per step")
+            st.dataframe(latest.dropna(subset=["peak_rss_mb"]).nlargest(15, "peak_rss_mb")
+                         .set_index("name")[["peak_rss_mb", "peak_delta_mb"]], use_container_width=True)
+    else:
+        st.info("No pipeline run metrics found in `results/metrics/` (run `python main.py`).")
+
 # === Main Thread ===
 if __name__ == "__main__":
     main()
@@ -0,0 +1,87 @@
+# === benchmarks/bench_distill.py ===
+# Teacher (pickle, artifact) έναντι distilled μοντέλου: μέγεθος στο δίσκο, cold load μαζί με τα imports
+# των βιβλιοθηκών (ό,τι πληρώνει ένα gateway στην εκκίνηση), latency ανά γραμμή και ακρίβεια
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_model_artifact import _rss_mb, _size_mb
+
+def _run(kind, model_path, X, y, queue):
+    import numpy as np
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if kind == 'distilled':
+        from edge_model import load_edge_model
+        model = load_edge_model(model_path)
+    elif kind == 'artifact':
+        from model_artifact import load_artifact
+        model = load_artifact(model_path, lazy=False)
+    else:
+        import joblib
+        model = joblib.load(model_path)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    if kind != 'distilled':
+        import pandas as pd
+        from encoder_utils import load_pipeline  # noqa: F401 (ίδιες προϋποθέσεις με το inference)
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    model.predict_proba(X[:10])  # warm-up (lazy loading)
+
+    single = []
+    for i in range(min(200, len(X))):
+        t = time.perf_counter()
+        model.predict_proba(X[i:i + 1])
+        single.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    proba = model.predict_proba(X)
+    batch_seconds = time.perf_counter() - t
+    queue.put({"load_s": load_seconds, "load_mb": rss_loaded - rss_before,
+               "single_row_ms": 1000 * float(np.median(single)), "batch_row_us": 1e6 * batch_seconds / len(X),
+               "accuracy": float((np.asarray(proba).argmax(axis=1) == y).mean())})
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark distilled μοντέλου έναντι του stacking")
+    parser.add_argument('--pickle', default='models/final_model.pkl')
+    parser.add_argument('--artifact', default='models/final_model')
+    parser.add_argument('--distilled', default='models/distilled')
+    parser.add_argument('--pipeline', default='models/preprocessing_pipeline.pkl')
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--rows', type=int, default=None)
+    args = parser.parse_args()
+
+    import numpy as np
+    import pandas as pd
+    from encoder_utils import load_pipeline
+    from data_loader import NA_VALUES
+    pipeline = load_pipeline(args.pipeline)
+    data = pd.read_csv(args.data, na_values=NA_VALUES, nrows=args.rows)
+    data = data[data[pipeline.target].notna()]
+    X = pipeline.transform_array(data)
+    y = pipeline.encode_target(data[pipeline.target]).to_numpy()
+
+    ctx = mp.get_context('spawn')
+    print(f"{'format':>10} {'disk MB':>8} {'load s':>8} {'RSS load MB':>12} {'1 row ms':>9} "
+          f"{'batch µs/row':>13} {'accuracy':>9}")
+    for kind, path in (('pickle', args.pickle), ('artifact', args.artifact), ('distilled', args.distilled)):
+        if not os.path.exists(path):
+            continue
+        # Νέο process ανά μορφή: cold load μαζί με τα imports (xgboost/lightgbm/sklearn ή μόνο numpy)
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(kind, path, X, y, queue))
+        proc.start()
+        r = queue.get()
+        proc.join()
+        print(f"{kind:>10} {_size_mb(path):>8.2f} {r['load_s']:>8.3f} {r['load_mb']:>12.1f} "
+              f"{r['single_row_ms']:>9.2f} {r['batch_row_us']:>13.1f} {r['accuracy']:>9.4f}")
+    print("(accuracy σε όλες τις γραμμές του --data, μαζί με το train set του teacher)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# === benchmarks/bench_explain.py ===
+# Latency ερμηνείας ανά γραμμή: shap.TreeExplainer ανά request έναντι LocalExplainer (booster φορτωμένος,
+# pred_contribs) χωρίς cache (cold) και με cache (warm), ανά μέγεθος batch
+
+import os
+import sys
+import time
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoder_utils import load_pipeline
+from explain import LocalExplainer, _as_class_tensor
+
+def _median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ερμηνείας μεμονωμένων προβλέψεων")
+    parser.add_argument('--model', default='models/final_model.pkl')
+    parser.add_argument('--pipeline', default='models/preprocessing_pipeline.pkl')
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--sizes', default='1,10,100,1000')
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    import shap
+    model = joblib.load(args.model)
+    pipeline = load_pipeline(args.pipeline)
+    data = pd.read_csv(args.data)
+    X_all = pipeline.transform(data)
+    xgb_model = model.named_estimators_['xgb']
+
+    # Έλεγχος ισοδυναμίας με τον shap.TreeExplainer (path-dependent)
+    explainer = LocalExplainer(model, pipeline, cache_size=0)
+    X_check = X_all.iloc[:500]
+    reference = _as_class_tensor(shap.TreeExplainer(xgb_model, feature_perturbation='tree_path_dependent')
+                                 .shap_values(X_check, check_additivity=False), *X_check.shape)
+    values = explainer.contributions(X_check.to_numpy())[:, :, :-1].transpose(0, 2, 1)
+    print(f"max |ΔSHAP| έναντι shap.TreeExplainer: {np.abs(values - reference).max():.2e}")
+
+    def per_request_shap(X):
+        shap.TreeExplainer(xgb_model, feature_perturbation='tree_path_dependent').shap_values(X, check_additivity=False)
+
+    rng = np.random.default_rng(0)
+    print(f"\n{'rows':>6} {'TreeExplainer/request':>22} {'cold (no cache)':>18} {'warm (cache)':>16}   (ms ανά γραμμή)")
+    for size in (int(s) for s in args.sizes.split(',')):
+        idx = rng.integers(0, len(data), size)
+        batch = data.iloc[idx].reset_index(drop=True)
+        repeats = max(3, min(50, 5_000 // size))
+        baseline = _median_seconds(lambda: per_request_shap(pipeline.transform(batch)), min(repeats, 5))
+        cold = LocalExplainer(model, pipeline, cache_size=0)
+        cold_seconds = _median_seconds(lambda: cold.explain(batch, top_k=args.top_k), repeats)
+        warm = LocalExplainer(model, pipeline, cache_size=max(4096, size))
+        warm.explain(batch, top_k=args.top_k)
+        warm_seconds = _median_seconds(lambda: warm.explain(batch, top_k=args.top_k), repeats)
+        print(f"{size:>6} {1000 * baseline / size:>22.3f} {1000 * cold_seconds / size:>18.3f} "
+              f"{1000 * warm_seconds / size:>16.3f}")
+
+if __name__ == "__main__":
+    main()
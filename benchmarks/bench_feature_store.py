@@ -0,0 +1,111 @@
+# === benchmarks/bench_feature_store.py ===
+# OOF stacking (5 folds) με DataFrame ανά fold έναντι του κοινού FeatureStore (memmap + κοινά bins του
+# LightGBM): χρόνος fit ανά μοντέλο στα folds, συνολικός χρόνος και peak RSS, έξοδος σε JSON
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import PeakMemory
+from metrics import rss_mb
+
+MODES = ("dataframe", "store")
+
+def _run(mode, data_path, options, queue):
+    import numpy as np
+    import pandas as pd
+    from preprocessing import preprocess_data
+    from training_config import TrainingConfig, build_estimators
+    from modeling import OOFStackingClassifier
+    from feature_store import FeatureStore
+
+    data = pd.read_csv(data_path, nrows=options["rows"])
+    X_train, X_test, y_train, y_test, feature_names, _ = preprocess_data(data, resample=options["resample"])
+    del data
+    base_models, meta_model, _ = build_estimators(TrainingConfig(device='cpu', n_threads=options["threads"]))
+    stack = OOFStackingClassifier(estimators=base_models, final_estimator=meta_model, cv=options["cv"], n_jobs=1,
+                                  cache_dir=None)
+
+    result = {"mode": mode, "train_rows": len(X_train), "features": len(feature_names)}
+    store = None
+    if mode == "store":
+        start = time.perf_counter()
+        store = FeatureStore.build(X_train, y_train, X_test, y_test, cv=options["cv"], feature_names=feature_names,
+                                   root=options["store_root"])
+        result["store_seconds"] = time.perf_counter() - start
+        result["store_mb"] = sum(store.manifest["nbytes"].values()) / 1024 ** 2
+        # Το fit διαβάζει μόνο από το store: τα DataFrames του preprocessing δεν χρειάζονται
+        del X_train, X_test
+        X_train = X_test = None
+
+    baseline = rss_mb()
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        stack.fit(X_train, y_train, X_test, store=store)
+        result["fit_seconds"] = time.perf_counter() - start
+    result.update(baseline_rss_mb=baseline, peak_rss_mb=memory.peak, peak_delta_mb=memory.peak - baseline)
+
+    timings = {}
+    for t in stack.fit_timings_:
+        entry = timings.setdefault(t["name"], {"folds_seconds": 0.0, "final_seconds": 0.0})
+        entry["final_seconds" if t["fold"] is None else "folds_seconds"] += t["wall_seconds"]
+    result["models"] = timings
+    y_true = np.asarray(y_train)
+    result["oof_accuracy"] = {name: float((proba.argmax(axis=1) == y_true).mean())
+                              for name, proba in stack.oof_predictions_.items()}
+    queue.put(result)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: DataFrame ανά fold έναντι κοινού FeatureStore")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--rows', type=int, default=None, help="Πρώτες N γραμμές του CSV")
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--no-resample', action='store_true', help="Χωρίς SMOTE (μικρότερο training set)")
+    parser.add_argument('--output', default=None, help="default: results/benchmarks/feature_store_<ημερομηνία>.json")
+    args = parser.parse_args()
+
+    ctx = mp.get_context('spawn')
+    report = {"created": time.strftime('%Y-%m-%dT%H:%M:%S'), "config": vars(args), "results": []}
+    with tempfile.TemporaryDirectory(prefix='bench_feature_store_', dir=os.path.dirname(os.path.abspath(args.data))) as root:
+        options = {"rows": args.rows, "cv": args.cv, "threads": args.threads, "resample": not args.no_resample,
+                   "store_root": root}
+        for mode in MODES:
+            # Κάθε mode σε δικό του process, ώστε το peak RSS να μην επηρεάζεται από το προηγούμενο
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(mode, os.path.abspath(args.data), options, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+            report["results"].append(result)
+
+    print(f"\n{'mode':<10} {'fit (s)':>9} {'peak Δ (MB)':>12} " + " ".join(f"{m + ' folds':>12}" for m in ('xgb', 'lgbm', 'rf')))
+    for r in report["results"]:
+        print(f"{r['mode']:<10} {r['fit_seconds']:>9.1f} {r['peak_delta_mb']:>12.0f} "
+              + " ".join(f"{r['models'][m]['folds_seconds']:>12.1f}" for m in ('xgb', 'lgbm', 'rf')))
+    frame, store = report["results"]
+    report["savings"] = {
+        "fit_seconds": frame["fit_seconds"] - store["fit_seconds"],
+        "peak_delta_mb": frame["peak_delta_mb"] - store["peak_delta_mb"],
+        "folds_seconds": {m: frame["models"][m]["folds_seconds"] - store["models"][m]["folds_seconds"]
+                          for m in frame["models"]}
+    }
+    print(f"\nΕξοικονόμηση: fit {report['savings']['fit_seconds']:.1f}s, peak RSS {report['savings']['peak_delta_mb']:.0f} MB "
+          f"(store: {store['store_seconds']:.1f}s, {store['store_mb']:.0f} MB στον δίσκο)")
+
+    output = args.output or os.path.join('results', 'benchmarks', f"feature_store_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Αποτελέσματα: {output}")
+
+if __name__ == "__main__":
+    main()
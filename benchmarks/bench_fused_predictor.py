@@ -0,0 +1,64 @@
+# === benchmarks/bench_fused_predictor.py ===
+# Latency/throughput ανά μέγεθος batch: stacking μοντέλο (pickle, artifact) έναντι FusedStackPredictor
+
+import os
+import sys
+import time
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoder_utils import load_pipeline
+from model_artifact import load_artifact
+from fused_predictor import FusedStackPredictor, njit
+
+def _time_call(fn, X, repeats):
+    fn(X)  # warm-up (lazy loading, JIT)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fused tree-ensemble prediction")
+    parser.add_argument('--model', default='models/final_model.pkl')
+    parser.add_argument('--artifact', default='models/final_model')
+    parser.add_argument('--pipeline', default='models/preprocessing_pipeline.pkl')
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--sizes', default='1,10,100,1000,10000,100000')
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X_all = load_pipeline(args.pipeline).transform(pd.read_csv(args.data))
+
+    engines = {"sklearn stack": model.predict_proba}
+    if os.path.isdir(args.artifact):
+        engines["artifact"] = load_artifact(args.artifact).predict_proba
+    engines["fused numpy"] = FusedStackPredictor(model, backend='numpy').predict_proba
+    if njit is not None:
+        engines["fused numba"] = FusedStackPredictor(model, backend='numba').predict_proba
+
+    # Έλεγχος ισοδυναμίας με το sklearn stack
+    reference = model.predict_proba(X_all)
+    for name, fn in engines.items():
+        print(f"[{name}] max |Δp| = {np.abs(fn(X_all) - reference).max():.2e}")
+
+    rng = np.random.default_rng(0)
+    print(f"\n{'rows':>8} " + " ".join(f"{name:>22}" for name in engines))
+    for size in (int(s) for s in args.sizes.split(',')):
+        X = X_all.iloc[rng.integers(0, len(X_all), size)].reset_index(drop=True)
+        repeats = max(1, min(50, 20_000 // size))
+        cells = []
+        for fn in engines.values():
+            seconds = _time_call(fn, X, repeats)
+            cells.append(f"{1000 * seconds:9.2f} ms {size / seconds:8.0f}/s")
+        print(f"{size:>8} " + " ".join(f"{cell:>22}" for cell in cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# === benchmarks/bench_model_artifact.py ===
+# Pickle (joblib) έναντι native artifact: μέγεθος στο δίσκο, cold load, resident memory, πρώτη πρόβλεψη
+
+import os
+import sys
+import time
+import resource
+import argparse
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _rss_mb():
+    # Τρέχουσα resident memory (Linux), αλλιώς peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1024 ** 2
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1024 ** 2
+
+def _run(model_path, pipeline_path, data_path, n_rows, queue):
+    import joblib
+    import pandas as pd
+    import xgboost, lightgbm, sklearn.ensemble  # noqa: F401 (οι βιβλιοθήκες δεν μετρούν στο load)
+    from encoder_utils import load_pipeline
+    from model_artifact import is_artifact, load_artifact
+
+    pipeline = load_pipeline(pipeline_path)
+    X = pipeline.transform(pd.read_csv(data_path, nrows=n_rows))
+    rss_before = _rss_mb()
+
+    start = time.perf_counter()
+    model = load_artifact(model_path) if is_artifact(model_path) else joblib.load(model_path)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    start = time.perf_counter()
+    model.predict_proba(X)
+    first_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    model.predict_proba(X)
+    queue.put({"load_s": load_seconds, "first_predict_s": first_seconds, "predict_s": time.perf_counter() - start,
+               "load_mb": rss_loaded - rss_before, "total_mb": _rss_mb() - rss_before})
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark μορφών αποθήκευσης μοντέλου")
+    parser.add_argument('--pickle', default='models/final_model.pkl')
+    parser.add_argument('--artifact', default='models/final_model')
+    parser.add_argument('--pipeline', default='models/preprocessing_pipeline.pkl')
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    ctx = mp.get_context('spawn')
+    print(f"{'format':>10} {'disk MB':>8} {'load s':>8} {'RSS load MB':>12} {'1st pred s':>11} "
+          f"{'pred s':>8} {'RSS total MB':>13}")
+    for name, path in (('pickle', args.pickle), ('artifact', args.artifact)):
+        # Νέο process ανά μέτρηση: cold load χωρίς ήδη φορτωμένα αντικείμενα
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(path, args.pipeline, args.data, args.rows, queue))
+        proc.start()
+        r = queue.get()
+        proc.join()
+        print(f"{name:>10} {_size_mb(path):>8.1f} {r['load_s']:>8.3f} {r['load_mb']:>12.1f} "
+              f"{r['first_predict_s']:>11.3f} {r['predict_s']:>8.3f} {r['total_mb']:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# === benchmarks/bench_pipeline.py ===
+# Benchmark όλου του pipeline σε συνθετικά datasets (10k / 1M / 10M γραμμές): χρόνος και peak memory
+# ανά βήμα (load, preprocess, train, predict, SHAP, single/batch inference), έξοδος σε JSON
+# και σύγκριση με προηγούμενο run για εντοπισμό regressions
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing as mp
+from queue import Empty
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import write_heart_csv, _parse_rows
+from metrics import rss_mb
+
+STEPS = ("load", "load_cached", "preprocess", "train", "predict", "shap", "save_model", "inference_single",
+         "inference_batch")
+LABEL_NAMES = ['Arrhythmia', 'Diabetes', 'Healthy', 'Hypertension', 'Hypotension']
+
+# === Μέτρηση μνήμης ===
+class PeakMemory:
+    """
+    Peak resident memory του process κατά τη διάρκεια ενός βήματος (δειγματοληψία σε thread).
+    Δεν περιλαμβάνει worker processes (loky / process pools).
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+# === Εκτέλεση όλων των βημάτων για ένα μέγεθος (σε ξεχωριστό process) ===
+def _run_size(data_path, n_rows, steps, options, queue):
+    from data_loader import load_dataset, configure_logging as configure_data_logging
+    from preprocessing import preprocess_data
+    from training_config import TrainingConfig
+    from modeling import (configure_logging as configure_modeling_logging, train_model, explain_model,
+                          save_trained_model)
+    from inference import load_artifacts, predict_batch, score_file, configure_logging as configure_inference_logging
+
+    # Τα outputs (models/, results/, caches) γράφονται σε προσωρινό φάκελο
+    os.chdir(options["workdir"])
+    configure_modeling_logging()
+    data_logger = configure_data_logging(log_to_file=False)
+    results = {}
+
+    def step(name, fn, n=None):
+        if name not in steps:
+            return None
+        baseline = rss_mb()
+        with PeakMemory() as memory:
+            start = time.perf_counter()
+            value = fn()
+            seconds = time.perf_counter() - start
+        entry = {"seconds": seconds, "peak_rss_mb": memory.peak, "peak_delta_mb": memory.peak - baseline}
+        if n:
+            entry["rows_per_sec"] = n / seconds if seconds > 0 else 0.0
+        results[name] = entry
+        print(f"    {name:<18} {seconds:>9.2f}s {memory.peak:>9.0f} MB", flush=True)
+        return value
+
+    load = lambda cache: load_dataset(file_path=data_path, gui_fallback=False, logger=data_logger,
+                                      use_cache=cache, cache_dir=os.path.join(options["workdir"], 'data_cache'))[0]
+    data = step("load", lambda: load(False), n_rows)
+    if "load_cached" in steps:
+        load(True)  # η πρώτη ανάγνωση γράφει το Parquet cache
+    cached = step("load_cached", lambda: load(True), n_rows)
+    data = data if data is not None else (cached if cached is not None else load(True))
+
+    prepared = step("preprocess", lambda: preprocess_data(data, target='Heart_Condition'), n_rows)
+    if prepared is None:
+        prepared = preprocess_data(data, target='Heart_Condition')
+    X_train, X_test, y_train, y_test, _, pipeline = prepared
+    if options["max_train_rows"] and len(X_train) > options["max_train_rows"]:
+        idx = np.random.default_rng(0).choice(len(X_train), options["max_train_rows"], replace=False)
+        X_train, y_train = X_train.iloc[idx].reset_index(drop=True), y_train.iloc[idx].reset_index(drop=True)
+
+    config = TrainingConfig(device='cpu', n_threads=options["threads"])
+    if not {"train", "predict", "shap", "save_model", "inference_single", "inference_batch"} & set(steps):
+        queue.put(results)
+        return
+    model = step("train", lambda: train_model(X_train, y_train, X_test, cv_folds=options["cv_folds"],
+                                               config=config)[0], len(X_train))
+    if model is None:
+        model = train_model(X_train, y_train, X_test, cv_folds=options["cv_folds"], config=config)[0]
+    step("predict", lambda: model.predict_proba(X_test), len(X_test))
+    step("shap", lambda: explain_model(model, X_train, X_test, y_test, LABEL_NAMES,
+                                       shap_max_rows=options["shap_max_rows"]), None)
+
+    if {"save_model", "inference_single", "inference_batch"} & set(steps):
+        from encoder_utils import save_pipeline
+        save_pipeline(pipeline, 'models/preprocessing_pipeline.pkl')
+        step("save_model", lambda: save_trained_model(model, 'models/final_model.pkl'), None)
+        if "save_model" not in steps:
+            save_trained_model(model, 'models/final_model.pkl')
+
+    if "inference_single" in steps:
+        model_art, pipeline_art = load_artifacts()
+        records = data.drop(columns=['Heart_Condition']).iloc[:options["single_repeats"]]
+        predict_batch(model_art, pipeline_art, records.iloc[[0]])  # warm-up (lazy φόρτωση)
+
+        def _single():
+            latencies = []
+            for i in range(len(records)):
+                start = time.perf_counter()
+                predict_batch(model_art, pipeline_art, records.iloc[[i]])
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        latencies = step("inference_single", _single, None)
+        results["inference_single"].update(p50_ms=float(np.percentile(latencies, 50) * 1000),
+                                           p99_ms=float(np.percentile(latencies, 99) * 1000))
+
+    if "inference_batch" in steps:
+        summary = step("inference_batch", lambda: score_file(data_path, 'results/predictions.parquet',
+                                                             batch_size=options["batch_size"],
+                                                             logger=configure_inference_logging()), n_rows)
+        results["inference_batch"].update(p50_batch_ms=summary["p50_batch_ms"], p99_batch_ms=summary["p99_batch_ms"])
+
+    queue.put(results)
+
+def wait_result(proc, queue, poll_seconds=5.0):
+    """
+    Αποτέλεσμα του child process από το queue. Αν το process τερματίσει χωρίς αποτέλεσμα (exception,
+    OOM kill), RuntimeError με το exit code αντί για αναμονή για πάντα.
+    """
+    while True:
+        try:
+            return queue.get(timeout=poll_seconds)
+        except Empty:
+            if proc.is_alive():
+                continue
+        # Το αποτέλεσμα μπορεί να γράφτηκε ακριβώς πριν το exit
+        try:
+            return queue.get(timeout=1.0)
+        except Empty:
+            proc.join()
+            raise RuntimeError(f"Το benchmark process τερμάτισε χωρίς αποτέλεσμα (exit code {proc.exitcode})")
+
+# === Περιβάλλον & σύγκριση ===
+def environment():
+    versions = {}
+    for module in ("numpy", "pandas", "sklearn", "xgboost", "lightgbm", "shap", "pyarrow"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=30).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    from training_config import available_cpus
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": available_cpus(),
+            "git_commit": commit, "versions": versions}
+
+def compare(current, baseline, threshold=0.2, min_seconds=0.05):
+    """
+    Βήματα όπου χρόνος ή peak memory αυξήθηκαν πάνω από threshold σε σχέση με το baseline.
+    Πολύ σύντομα βήματα (< min_seconds) αγνοούνται στον χρόνο (θόρυβος).
+    """
+    previous = {run["rows"]: run["steps"] for run in baseline["results"] if "steps" in run}
+    regressions = []
+    for run in current["results"]:
+        for name, entry in run.get("steps", {}).items():
+            old = previous.get(run["rows"], {}).get(name)
+            if old is None:
+                continue
+            for metric in ("seconds", "peak_rss_mb"):
+                if metric == "seconds" and max(old[metric], entry[metric]) < min_seconds:
+                    continue
+                ratio = entry[metric] / old[metric] if old[metric] > 0 else 1.0
+                if ratio > 1 + threshold:
+                    regressions.append({"rows": run["rows"], "step": name, "metric": metric,
+                                        "baseline": old[metric], "current": entry[metric], "ratio": ratio})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ολόκληρου του pipeline σε συνθετικά δεδομένα")
+    parser.add_argument('--sizes', default='10k', help="Μεγέθη, π.χ. 10k,1m,10m")
+    parser.add_argument('--steps', nargs='*', default=list(STEPS), choices=STEPS)
+    parser.add_argument('--imbalance', type=float, default=10.0)
+    parser.add_argument('--data-dir', default='data/benchmarks', help="Cache των συνθετικών CSV")
+    parser.add_argument('--max-train-rows', type=int, default=None, help="Υποδείγμα για train/SHAP σε μεγάλα μεγέθη")
+    parser.add_argument('--cv-folds', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--shap-max-rows', type=int, default=500)
+    parser.add_argument('--single-repeats', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--output', default=None, help="default: results/benchmarks/pipeline_<ημερομηνία>.json")
+    parser.add_argument('--baseline', default=None, help="Προηγούμενο JSON για σύγκριση")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Ανοχή αύξησης χρόνου/μνήμης (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = {"created": time.strftime('%Y-%m-%dT%H:%M:%S'), "environment": environment(),
+              "config": {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}, "results": []}
+    ctx = mp.get_context('spawn')
+    for size in args.sizes.split(','):
+        n_rows = _parse_rows(size)
+        data_path = os.path.abspath(os.path.join(args.data_dir, f"synthetic_{n_rows}_imb{args.imbalance:g}.csv"))
+        if not os.path.isfile(data_path):
+            start = time.perf_counter()
+            write_heart_csv(data_path, n_rows, imbalance=args.imbalance)
+            print(f"Δημιουργία {data_path} σε {time.perf_counter() - start:.1f}s")
+
+        print(f"\n[{n_rows:,} γραμμές]")
+        with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as workdir:
+            options = {"workdir": workdir, "max_train_rows": args.max_train_rows, "cv_folds": args.cv_folds,
+                       "threads": args.threads, "shap_max_rows": args.shap_max_rows,
+                       "single_repeats": args.single_repeats, "batch_size": args.batch_size}
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run_size, args=(data_path, n_rows, args.steps, options, queue))
+            proc.start()
+            try:
+                steps = wait_result(proc, queue)
+            except RuntimeError as e:
+                print(f"❌ {n_rows:,} γραμμές: {e}")
+                report["results"].append({"rows": n_rows, "error": str(e), "exitcode": proc.exitcode})
+                continue
+            proc.join()
+        report["results"].append({"rows": n_rows, "steps": steps})
+
+    output = args.output or os.path.join('results', 'benchmarks', f"pipeline_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nΑποτελέσματα: {output}")
+
+    failed = [run["rows"] for run in report["results"] if "error" in run]
+    if failed:
+        print(f"\n❌ Απέτυχαν τα μεγέθη: {', '.join(f'{rows:,}' for rows in failed)}")
+    if report.get("regressions"):
+        print(f"\n⚠️ {len(report['regressions'])} regressions (> {args.threshold:.0%}):")
+        for r in report["regressions"]:
+            print(f"  {r['rows']:>10,} {r['step']:<18} {r['metric']:<12} {r['baseline']:.3f} -> {r['current']:.3f} "
+                  f"(x{r['ratio']:.2f})")
+    if failed or report.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# === benchmarks/bench_preprocessing.py ===
+# Throughput του PreprocessingPipeline.transform έναντι του παλιού per-column LabelEncoder + StandardScaler path
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_loader import load_dataset, configure_logging
+from preprocessing import PreprocessingPipeline
+
+# === Παλιό path: fit per-column encoders + scaler
+def fit_legacy(data, target):
+    data = data.drop(columns=['timestamp'], errors='ignore')
+    medians = data.median(numeric_only=True)
+    data = data.fillna(medians)
+    X = data.drop(columns=[target])
+    encoders = {}
+    for col in X.select_dtypes(include=['object', 'category']).columns:
+        le = LabelEncoder()
+        X[col] = le.fit_transform(X[col].astype(str))
+        encoders[col] = le
+    scaler = StandardScaler().fit(X)
+    return medians, encoders, scaler
+
+def transform_legacy(batch, medians, encoders, scaler, target):
+    batch = batch.drop(columns=['timestamp', target], errors='ignore').copy()
+    batch = batch.fillna(medians)
+    for col, le in encoders.items():
+        batch[col] = le.transform(batch[col].astype(str))
+    batch[batch.columns] = scaler.transform(batch)
+    return batch
+
+def _throughput(fn, batches, repeats):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch in batches:
+            fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return sum(len(b) for b in batches) / best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch transform throughput")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--target', default='Heart_Condition')
+    parser.add_argument('--batch-sizes', default='1,100,10000')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    data, _ = load_dataset(file_path=args.data, target=args.target, gui_fallback=False,
+                           logger=configure_logging(log_to_file=False))
+    pipeline = PreprocessingPipeline(target=args.target).fit(data)
+    medians, encoders, scaler = fit_legacy(data, args.target)
+
+    # Έλεγχος ισοδυναμίας των δύο paths
+    sample = data.head(1000)
+    diff = np.abs(pipeline.transform(sample).to_numpy() - transform_legacy(sample, medians, encoders, scaler, args.target).to_numpy())
+    print(f"max |pipeline - legacy| = {diff.max():.2e}")
+
+    print(f"{'batch':>8} {'legacy rows/s':>15} {'pipeline rows/s':>16} {'speedup':>8}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        n_batches = max(1, min(len(data) // batch_size, 200))
+        batches = [data.iloc[i * batch_size:(i + 1) * batch_size] for i in range(n_batches)]
+        legacy = _throughput(lambda b: transform_legacy(b, medians, encoders, scaler, args.target), batches, args.repeats)
+        fast = _throughput(pipeline.transform, batches, args.repeats)
+        print(f"{batch_size:>8} {legacy:>15,.0f} {fast:>16,.0f} {fast / legacy:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
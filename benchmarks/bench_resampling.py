@@ -0,0 +1,79 @@
+# === benchmarks/bench_resampling.py ===
+# Peak RSS και wall time: παλιό path (SMOTE σε όλο το dataset, float64) έναντι split-first float32 SMOTE
+
+import os
+import sys
+import time
+import resource
+import argparse
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# === Παλιό path: copy, encoding, scaling, SMOTE σε όλα τα δεδομένα, split
+def legacy_preprocess(data, target):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler, LabelEncoder
+    from imblearn.over_sampling import SMOTE
+
+    data = data.copy()
+    data.drop(columns=['timestamp'], errors='ignore', inplace=True)
+    data.fillna(data.median(numeric_only=True), inplace=True)
+    for col in data.select_dtypes(include=['object', 'category']).columns.drop(target, errors='ignore'):
+        data[col] = LabelEncoder().fit_transform(data[col].astype(str))
+    data[target] = LabelEncoder().fit_transform(data[target].astype(str))
+    X = data.drop(columns=[target])
+    y = data[target]
+    X[X.columns] = StandardScaler().fit_transform(X)
+    X_res, y_res = SMOTE(random_state=42).fit_resample(X, y)
+    return train_test_split(X_res, y_res, test_size=0.2, random_state=42)
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _run(mode, data_path, target, kwargs, queue):
+    from data_loader import load_dataset, configure_logging
+    from preprocessing import preprocess_data
+
+    data, _ = load_dataset(file_path=data_path, target=target, gui_fallback=False,
+                           logger=configure_logging(log_to_file=False))
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'legacy':
+        X_train = legacy_preprocess(data, target)[0]
+    else:
+        X_train = preprocess_data(data, target=target, **kwargs)[0]
+    queue.put({"mode": mode, "seconds": time.perf_counter() - start, "baseline_mb": baseline,
+               "peak_mb": _peak_rss_mb(), "train_rows": len(X_train)})
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SMOTE/split: legacy vs split-first float32")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--target', default='Heart_Condition')
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--max-synthetic-mb', type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [
+        ('legacy', {}),
+        ('split-first', {"n_jobs": args.jobs}),
+        ('split-first (approximate k-NN)', {"n_jobs": args.jobs, "nn_backend": 'approximate'}),
+    ]
+    if args.max_synthetic_mb is not None:
+        runs.append(('split-first (memory cap)', {"n_jobs": args.jobs, "max_synthetic_mb": args.max_synthetic_mb}))
+
+    ctx = mp.get_context('spawn')
+    print(f"{'mode':>32} {'seconds':>8} {'peak MB':>8} {'Δ MB':>8} {'train rows':>11}")
+    for name, kwargs in runs:
+        queue = ctx.Queue()
+        # Κάθε μέτρηση σε νέο process ώστε το peak RSS να μην επηρεάζεται από προηγούμενα runs
+        proc = ctx.Process(target=_run, args=('legacy' if name == 'legacy' else 'new', args.data, args.target,
+                                              kwargs, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        print(f"{name:>32} {result['seconds']:>8.2f} {result['peak_mb']:>8.0f} "
+              f"{result['peak_mb'] - result['baseline_mb']:>8.0f} {result['train_rows']:>11,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# === benchmarks/load_test.py ===
+# Load test του scoring service: micro-batching έναντι naive one-request-one-predict
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_loader import NA_VALUES
+from inference import load_artifacts, MODEL_PATH, PIPELINE_PATH
+from serving import ScoringServer
+
+async def _client(host, port, payloads, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in payloads:
+            start = time.perf_counter()
+            writer.write(
+                f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def run_load(model, pipeline, records, concurrency, requests_per_client, max_batch_size, max_wait_ms):
+    server = await ScoringServer(model, pipeline, host='127.0.0.1', port=0, max_batch_size=max_batch_size,
+                                 max_wait_ms=max_wait_ms).start()
+    rng = np.random.default_rng(0)
+    payloads = [
+        [json.dumps(records[i]).encode('utf-8') for i in rng.integers(0, len(records), requests_per_client)]
+        for _ in range(concurrency)
+    ]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client('127.0.0.1', server.port, p, latencies) for p in payloads))
+    elapsed = time.perf_counter() - start
+    metrics = server.metrics()
+    await server.stop()
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_batch_size": metrics["mean_batch_size"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test: micro-batching vs naive scoring")
+    parser.add_argument('--data', default='data/heart.csv', help="CSV με records για τα requests")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=50, help="Requests ανά client")
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--pipeline', default=PIPELINE_PATH)
+    args = parser.parse_args()
+
+    model, pipeline = load_artifacts(args.model, args.pipeline)
+    frame = pd.read_csv(args.data, na_values=NA_VALUES, nrows=10_000)
+    records = json.loads(frame.to_json(orient='records'))
+
+    modes = {
+        "naive": dict(max_batch_size=1, max_wait_ms=0.0),
+        "micro-batching": dict(max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    }
+    print(f"{'mode':>16} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch':>7}")
+    for name, config in modes.items():
+        stats = asyncio.run(run_load(model, pipeline, records, args.concurrency, args.requests, **config))
+        print(f"{name:>16} {stats['throughput_rps']:>9.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+              f"{stats['p99_ms']:>8.1f} {stats['mean_batch_size']:>7.1f}")
+
+if __name__ == "__main__":
+    main()
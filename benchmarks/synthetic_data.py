@@ -0,0 +1,122 @@
+# === benchmarks/synthetic_data.py ===
+# Συνθετικό dataset με το schema του heart.csv (αισθητήρες, κατηγορικές στήλες, 5 κλάσεις Heart_Condition)
+# σε οποιοδήποτε μέγεθος, με ρυθμιζόμενη ανισορροπία κλάσεων. Γράφεται σε chunks ώστε τα 10M γραμμές
+# να μη χρειάζονται όλες μαζί στη μνήμη.
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TARGET = "Heart_Condition"
+# Σειρά από την πιο συχνή στη σπανιότερη κλάση
+CLASSES = ("Healthy", "Hypertension", "Hypotension", "Arrhythmia", "Diabetes")
+
+CATEGORIES = {
+    "Gender": ("Male", "Female"),
+    "Smoking_Status": ("Never", "Former", "Current"),
+    "Activity_Type": ("Resting", "Walking", "Running", "Cycling"),
+    "Alcohol_Consumption": ("None", "Low", "Moderate", "High"),
+    "Diet_Type": ("Omnivore", "Vegetarian", "Vegan", "Keto"),
+    "Medication_Taken": ("No", "Yes")
+}
+
+# Μέση τιμή / τυπική απόκλιση ανά αισθητήρα και μετατόπιση ανά κλάση (σειρά CLASSES)
+SENSORS = {
+    "Blood_Glucose_mg_dL": (100, 15, (0, 5, -5, 0, 60)),
+    "Blood_Pressure_Systolic_mmHg": (120, 10, (0, 25, -22, 3, 5)),
+    "Blood_Pressure_Diastolic_mmHg": (80, 8, (0, 12, -12, 2, 3)),
+    "Heart_Rate_bpm": (72, 8, (0, 4, 8, 18, 2)),
+    "Heart_Rate_Variability_ms": (50, 10, (0, -5, -3, -18, -6)),
+    "Stress_Level": (5, 2, (0, 1.5, 0.5, 1, 0.5)),
+    "Calories_Burned_kcal": (2200, 300, (0, -50, -80, -30, -120)),
+    "ECG_Lead1_mV": (1.0, 0.2, (0, 0.05, -0.05, 0.3, 0)),
+    "ECG_Lead2_mV": (1.2, 0.2, (0, 0.05, -0.05, 0.25, 0))
+}
+
+def class_weights(imbalance=10.0):
+    """
+    Γεωμετρική κατανομή κλάσεων: η πιο συχνή είναι `imbalance` φορές συχνότερη από τη σπανιότερη.
+    """
+    weights = imbalance ** (-np.arange(len(CLASSES)) / (len(CLASSES) - 1))
+    return weights / weights.sum()
+
+def generate_heart_data(n_rows, imbalance=10.0, weights=None, missing_rate=0.01, n_patients=None, seed=0,
+                        start_row=0):
+    """
+    n_rows γραμμές με τις στήλες του heart.csv. Τα σήματα εξαρτώνται από την κλάση ώστε τα μοντέλα
+    να έχουν κάτι να μάθουν. start_row: θέση του chunk στο αρχείο (συνεχόμενα timestamps).
+    """
+    rng = np.random.default_rng([seed, start_row])
+    weights = class_weights(imbalance) if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    y = rng.choice(len(CLASSES), size=n_rows, p=weights)
+    n_patients = n_patients or max(1, (start_row + n_rows) // 200)
+
+    age = rng.integers(20, 90, n_rows)
+    bmi = rng.normal(26, 4, n_rows) + 1.5 * (y == 4) + 0.8 * (y == 1)
+    steps = np.clip(rng.normal(8000, 3500, n_rows) - 2500 * (y == 4), 0, None).astype(np.int64)
+    data = {
+        "timestamp": (pd.Timestamp('2024-01-01') + pd.to_timedelta(start_row + np.arange(n_rows), unit='min'))
+                     .strftime('%Y-%m-%d %H:%M:%S'),
+        "Patient_ID": rng.integers(0, n_patients, n_rows),
+        "Age": age,
+        "BMI": bmi.round(1),
+        "BMI_Category": np.select([bmi < 18.5, bmi < 25, bmi < 30], ["Underweight", "Normal", "Overweight"],
+                                  "Obese"),
+        "Steps_Taken": steps
+    }
+    for col, (mean, std, shifts) in SENSORS.items():
+        values = rng.normal(mean, std, n_rows) + np.asarray(shifts)[y]
+        data[col] = values.round(0 if col == "Stress_Level" else 2)
+    for col, categories in CATEGORIES.items():
+        data[col] = np.asarray(categories)[rng.integers(0, len(categories), n_rows)]
+    data[TARGET] = np.asarray(CLASSES)[y]
+    frame = pd.DataFrame(data)
+
+    # Τυχαία missing values (εκτός timestamp, ID και στόχου)
+    if missing_rate > 0:
+        for col in frame.columns.drop(["timestamp", "Patient_ID", TARGET]):
+            mask = rng.random(n_rows) < missing_rate
+            if mask.any():
+                frame[col] = frame[col].where(~mask)
+    return frame
+
+def write_heart_csv(path, n_rows, chunk_rows=1_000_000, **kwargs):
+    """
+    Γράφει n_rows γραμμές στο path σε chunks. Επιστρέφει το path.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    n_patients = kwargs.pop("n_patients", None) or max(1, n_rows // 200)
+    for start in range(0, n_rows, chunk_rows):
+        chunk = generate_heart_data(min(chunk_rows, n_rows - start), n_patients=n_patients, start_row=start,
+                                    **kwargs)
+        chunk.to_csv(tmp_path, mode='a' if start else 'w', header=not start, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+def _parse_rows(value):
+    value = value.lower().replace('_', '')
+    scale = {'k': 1_000, 'm': 1_000_000}.get(value[-1], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+def main():
+    parser = argparse.ArgumentParser(description="Συνθετικό heart.csv")
+    parser.add_argument('--rows', default='10k', help="Πλήθος γραμμών (π.χ. 10k, 1m, 10m)")
+    parser.add_argument('--output', default=None, help="default: data/synthetic_<rows>.csv")
+    parser.add_argument('--imbalance', type=float, default=10.0, help="Λόγος πιο συχνής / σπανιότερης κλάσης")
+    parser.add_argument('--missing-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    n_rows = _parse_rows(args.rows)
+    output = args.output or f"data/synthetic_{args.rows.lower()}.csv"
+    write_heart_csv(output, n_rows, imbalance=args.imbalance, missing_rate=args.missing_rate, seed=args.seed)
+    print(f"{n_rows:,} γραμμές -> {output} ({os.path.getsize(output) / 1024 ** 2:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
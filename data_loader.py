@@ -2,9 +2,15 @@
 # φόρτωση dataset με GUI ή direct path και logging σε αρχείο
 
 import pandas as pd
+import numpy as np
 import os
+import json
+import time
+import hashlib
 import logging
 
+from metrics import span
+
 # === Logging Configuration ===
 def configure_logging(log_to_file=True, log_file='logs/data_loader.log', level=logging.INFO):
     logger = logging.getLogger('data_loader')
@@ -29,14 +35,47 @@ def configure_logging(log_to_file=True, log_file='logs/data_loader.log', level=l
 
     return logger
 
-# === Dataset Loader ===
-def load_dataset(file_path=None, target='Heart_Condition', encoding='utf-8', sep=',', gui_fallback=True, logger=None):
+# === Κοινές ρυθμίσεις ανάγνωσης ===
+# "Κρυφές" missing values που αναγνωρίζονται κατά την ανάγνωση
+NA_VALUES = ["?", "na", "none", "None", "NaN", ""]
+
+# Στήλες αισθητήρων / αριθμητικές -> float32 στο streaming mode
+SENSOR_COLUMNS = [
+    "Age", "BMI", "Blood_Glucose_mg_dL",
+    "Blood_Pressure_Systolic_mmHg", "Blood_Pressure_Diastolic_mmHg",
+    "Heart_Rate_bpm", "Heart_Rate_Variability_ms", "Stress_Level",
+    "Steps_Taken", "Calories_Burned_kcal", "ECG_Lead1_mV", "ECG_Lead2_mV"
+]
+
+# Κατηγορικές στήλες -> category (με γνωστές κατηγορίες) ή str στο streaming mode
+CATEGORICAL_COLUMNS = [
+    "Activity_Type", "Alcohol_Consumption", "BMI_Category",
+    "Diet_Type", "Gender", "Medication_Taken", "Smoking_Status"
+]
+
+# Στήλες χρόνου -> datetime64 στο in-memory φόρτωμα (μοναδικές ανά γραμμή, όχι category)
+DATETIME_COLUMNS = ["timestamp"]
+
+# Object στήλες με έως τόσες μοναδικές τιμές ανά γραμμή γίνονται category
+CATEGORY_MAX_RATIO = 0.5
+
+def build_dtype_schema(columns, target='Heart_Condition', categories=None):
     """
-    Φορτώνει αρχείο CSV και επιστρέφει dataframe + στατιστικά.
+    Ρητό dtype schema για τις στήλες που υπάρχουν στο αρχείο.
+    Κατηγορικές στήλες (και στόχος): CategoricalDtype με τις σταθερές κατηγορίες του `categories`
+    ({στήλη: τιμές}, π.χ. από ένα πρώτο πέρασμα), ώστε όλα τα chunks να έχουν τις ίδιες κατηγορίες και codes.
+    Χωρίς γνωστές κατηγορίες διαβάζονται ως str: ένα σκέτο 'category' θα είχε άλλες κατηγορίες σε κάθε chunk.
     """
-    if logger is None:
-        logger = configure_logging()
+    categories = categories or {}
+    schema = {}
+    for col in columns:
+        if col in SENSOR_COLUMNS:
+            schema[col] = 'float32'
+        elif col in CATEGORICAL_COLUMNS or col == target:
+            schema[col] = pd.CategoricalDtype(sorted(categories[col])) if col in categories else str
+    return schema
 
+def _resolve_file_path(file_path, gui_fallback, logger):
     if file_path is None and gui_fallback:
         try:
             from tkinter import Tk, filedialog
@@ -50,14 +89,338 @@ def load_dataset(file_path=None, target='Heart_Condition', encoding='utf-8', sep
         logger.error("Μη έγκυρο path: %s", file_path)
         raise FileNotFoundError("Δεν δόθηκε έγκυρο path αρχείου.")
 
+    return file_path
+
+# === Running στατιστικά για streaming ===
+class StreamingStats:
+    """
+    Συσσωρευτές ενός περάσματος για το ίδιο `stats` dict με το load_dataset.
+    Τα quantiles είναι προσεγγιστικά (bottom-k δείγμα σταθερού μεγέθους ανά στήλη).
+    """
+
+    def __init__(self, file_path=None, target='Heart_Condition', quantile_sample_size=10_000, random_state=42):
+        self.file_path = file_path
+        self.target = target
+        self.quantile_sample_size = quantile_sample_size
+        self._rng = np.random.default_rng(random_state)
+        self.n_rows = 0
+        self.columns = None
+        self.dtypes = None
+        self.missing = {}
+        self._numeric = {}
+        self._counts = {}
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.dtypes = chunk.dtypes.to_dict()
+            self.missing = dict.fromkeys(self.columns, 0)
+
+        self.n_rows += len(chunk)
+        for col, n_missing in chunk.isnull().sum().items():
+            self.missing[col] += int(n_missing)
+
+        for col in self.columns:
+            series = chunk[col]
+            if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+                self._update_numeric(col, series.dropna().to_numpy(dtype=np.float64))
+            else:
+                counts = series.value_counts(dropna=True)
+                counts = counts[counts > 0]
+                acc = self._counts.setdefault(col, pd.Series(dtype='int64'))
+                self._counts[col] = acc.add(counts.astype('int64'), fill_value=0).astype('int64')
+
+    def _update_numeric(self, col, values):
+        acc = self._numeric.setdefault(col, {
+            "count": 0, "mean": 0.0, "m2": 0.0, "min": np.inf, "max": -np.inf,
+            "sample": np.empty(0), "keys": np.empty(0)
+        })
+        n_b = values.size
+        if n_b == 0:
+            return
+
+        # Συνδυασμός mean/variance με τον αλγόριθμο του Chan
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        n_a = acc["count"]
+        n = n_a + n_b
+        delta = mean_b - acc["mean"]
+        acc["mean"] += delta * n_b / n
+        acc["m2"] += m2_b + delta ** 2 * n_a * n_b / n
+        acc["count"] = n
+        acc["min"] = min(acc["min"], values.min())
+        acc["max"] = max(acc["max"], values.max())
+
+        # Bottom-k δείγμα: κρατάμε τις τιμές με τα k μικρότερα τυχαία κλειδιά
+        keys = np.concatenate([acc["keys"], self._rng.random(n_b)])
+        sample = np.concatenate([acc["sample"], values])
+        k = self.quantile_sample_size
+        if keys.size > k:
+            keep = np.argpartition(keys, k - 1)[:k]
+            keys, sample = keys[keep], sample[keep]
+        acc["keys"], acc["sample"] = keys, sample
+
+    def describe(self):
+        describe = {}
+        for col in self.columns or []:
+            if col in self._numeric:
+                acc = self._numeric[col]
+                n = acc["count"]
+                q25, q50, q75 = (np.quantile(acc["sample"], [0.25, 0.5, 0.75]) if n else (np.nan,) * 3)
+                describe[col] = {
+                    "count": float(n),
+                    "mean": acc["mean"] if n else np.nan,
+                    "std": np.sqrt(acc["m2"] / (n - 1)) if n > 1 else np.nan,
+                    "min": acc["min"] if n else np.nan,
+                    "25%": q25, "50%": q50, "75%": q75,
+                    "max": acc["max"] if n else np.nan,
+                }
+            elif col in self._counts:
+                counts = self._counts[col]
+                describe[col] = {
+                    "count": float(counts.sum()),
+                    "unique": int(counts.size),
+                    "top": counts.idxmax() if counts.size else np.nan,
+                    "freq": int(counts.max()) if counts.size else np.nan,
+                }
+        return describe
+
+    def target_distribution(self):
+        counts = self._counts.get(self.target, pd.Series(dtype='int64'))
+        return counts.sort_values(ascending=False).to_dict()
+
+    def to_dict(self):
+        return {
+            "file_path": self.file_path,
+            "shape": (self.n_rows, len(self.columns or [])),
+            "columns": list(self.columns or []),
+            "dtypes": dict(self.dtypes or {}),
+            "missing": dict(self.missing),
+            "describe": self.describe(),
+            "target_distribution": self.target_distribution()
+        }
+
+# === Streaming Loader ===
+def stream_dataset(file_path, target='Heart_Condition', chunksize=100_000, encoding='utf-8', sep=',',
+                   dtype=None, stats=None, logger=None):
+    """
+    Generator που διαβάζει το CSV σε chunks με ρητό dtype schema.
+    Αν δοθεί `stats` (StreamingStats), ενημερώνεται σε κάθε chunk.
+    """
+    if logger is None:
+        logger = logging.getLogger('data_loader')
+
     try:
-        # Ανίχνευση "κρυφών" missing values κατά την ανάγνωση
-        data = pd.read_csv(file_path, encoding=encoding, sep=sep, na_values=["?", "na", "none", "None", "NaN", ""])
-        logger.info("Φόρτωση αρχείου: %s", file_path)
+        reader = pd.read_csv(file_path, encoding=encoding, sep=sep, na_values=NA_VALUES,
+                             dtype=dtype, chunksize=chunksize)
     except Exception as e:
         logger.exception("Σφάλμα κατά τη φόρτωση CSV:")
         raise ValueError(f"Σφάλμα κατά τη φόρτωση αρχείου: {e}")
 
+    n_chunks = 0
+    with reader:
+        for chunk in reader:
+            if stats is not None:
+                stats.update(chunk)
+            n_chunks += 1
+            yield chunk
+
+    logger.info("Streaming ολοκληρώθηκε: %d chunks από %s", n_chunks, file_path)
+    if stats is not None:
+        logger.info("Σχήμα: %s", (stats.n_rows, len(stats.columns or [])))
+        logger.info("Στήλες: %s", stats.columns)
+        logger.info("Missing Values: %d", sum(stats.missing.values()))
+        logger.info("Κατανομή στόχου: %s", stats.target_distribution())
+
+# === Columnar cache (Parquet) ===
+CACHE_VERSION = 2
+
+# Τελευταίο fingerprint ανά απόλυτη διαδρομή, ώστε το αρχείο να γίνεται hash μία φορά ανά (size, mtime)
+_FINGERPRINTS = {}
+
+def _file_fingerprint(file_path, block_size=1 << 20):
+    """
+    sha256 περιεχομένου + μέγεθος + mtime του αρχείου πηγής (memoized όσο δεν αλλάζουν size/mtime).
+    """
+    st = os.stat(file_path)
+    path = os.path.abspath(file_path)
+    cached = _FINGERPRINTS.get(path)
+    if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+        return dict(cached)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    fingerprint = {"sha256": digest.hexdigest(), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    _FINGERPRINTS[path] = fingerprint
+    return dict(fingerprint)
+
+def _cache_key(fingerprint, encoding, sep, na_values):
+    payload = json.dumps({
+        "version": CACHE_VERSION,
+        "source": fingerprint,
+        "encoding": encoding,
+        "sep": sep,
+        "na_values": list(na_values)
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _cache_paths(file_path, cache_dir, key):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    base = os.path.join(cache_dir, f"{stem}-{key}")
+    return base + '.parquet', base + '.json'
+
+def _to_columnar_types(data):
+    # Ίδια dtypes με ή χωρίς cache: οι στήλες χρόνου γίνονται datetime64, οι γνωστές κατηγορικές και οι άλλες
+    # object στήλες χαμηλής πληθικότητας category (dictionary encoding στο Parquet). Στήλες με σχεδόν μοναδικές
+    # τιμές μένουν object, αφού ένα category ανά γραμμή μόνο επιβαρύνει την ανάγνωση
+    for col in DATETIME_COLUMNS:
+        if col in data.columns and data[col].dtype == object:
+            try:
+                data[col] = pd.to_datetime(data[col], infer_datetime_format=True)
+            except (ValueError, TypeError):
+                pass
+    max_categories = CATEGORY_MAX_RATIO * len(data)
+    for col in data.select_dtypes(include=['object']).columns:
+        if col in CATEGORICAL_COLUMNS or data[col].nunique(dropna=True) <= max_categories:
+            data[col] = data[col].astype('category')
+    return data
+
+def _read_cache(cache_path, columns, logger):
+    try:
+        with span('parquet_read'):
+            return pd.read_parquet(cache_path, engine='pyarrow', columns=columns, memory_map=True)
+    except Exception as e:
+        logger.warning("Αποτυχία ανάγνωσης cache %s: %s", cache_path, e)
+        return None
+
+def _write_cache(data, file_path, cache_dir, cache_path, manifest_path, manifest, logger):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Αφαίρεση παλιών (invalidated) cache αρχείων της ίδιας πηγής: ταίριασμα με την απόλυτη διαδρομή
+        # του manifest, όχι με το όνομα (heart.csv / heart-2023.csv, ίδιο όνομα σε άλλο φάκελο)
+        for name in os.listdir(cache_dir):
+            old_manifest = os.path.join(cache_dir, name)
+            if not name.endswith('.json') or old_manifest == manifest_path:
+                continue
+            try:
+                with open(old_manifest, encoding='utf-8') as f:
+                    source = json.load(f).get("source")
+            except (OSError, ValueError):
+                continue
+            if source == manifest["source"]:
+                for path in (old_manifest, os.path.splitext(old_manifest)[0] + '.parquet'):
+                    if os.path.isfile(path):
+                        os.remove(path)
+
+        tmp_path = cache_path + '.tmp'
+        data.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        os.replace(tmp_path, cache_path)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        logger.info("Cache αποθηκεύτηκε: %s", cache_path)
+    except Exception as e:
+        logger.warning("Αποτυχία εγγραφής cache %s: %s", cache_path, e)
+
+# === Dataset Loader ===
+def load_dataset(file_path=None, target='Heart_Condition', encoding='utf-8', sep=',', gui_fallback=True, logger=None,
+                 chunksize=None, use_cache=True, cache_dir='data/.cache', columns=None, categories=None):
+    """
+    Φορτώνει αρχείο CSV και επιστρέφει dataframe + στατιστικά.
+    Με `chunksize` (streaming mode) επιστρέφει generator από chunks + StreamingStats,
+    που συμπληρώνεται καθώς καταναλώνονται τα chunks (βλ. StreamingStats.to_dict()). Οι κατηγορικές
+    στήλες των chunks είναι category μόνο αν δοθούν όλες οι κατηγορίες τους (`categories`), αλλιώς str.
+    Με `use_cache` η πρώτη ανάγνωση αποθηκεύεται σε Parquet στο `cache_dir` και οι επόμενες
+    διαβάζουν (memory-mapped) μόνο τις `columns` που ζητούνται.
+    """
+    if logger is None:
+        logger = configure_logging()
+
+    file_path = _resolve_file_path(file_path, gui_fallback, logger)
+
+    if chunksize is not None:
+        try:
+            header = pd.read_csv(file_path, encoding=encoding, sep=sep, nrows=0).columns
+        except Exception as e:
+            logger.exception("Σφάλμα κατά τη φόρτωση CSV:")
+            raise ValueError(f"Σφάλμα κατά τη φόρτωση αρχείου: {e}")
+
+        if target not in header:
+            logger.error("Απουσιάζει η στήλη στόχου '%s'", target)
+            raise ValueError(f"Η στήλη στόχου '{target}' δεν υπάρχει στο dataset.")
+
+        logger.info("Streaming φόρτωση αρχείου: %s (chunksize=%d)", file_path, chunksize)
+        stats = StreamingStats(file_path=file_path, target=target)
+        chunks = stream_dataset(file_path, target=target, chunksize=chunksize, encoding=encoding, sep=sep,
+                                dtype=build_dtype_schema(header, target, categories), stats=stats, logger=logger)
+        return chunks, stats
+
+    if columns is not None and target not in columns:
+        columns = list(columns) + [target]
+
+    cache_path = manifest_path = None
+    data = None
+    if use_cache:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("Το pyarrow δεν είναι εγκατεστημένο. Η cache απενεργοποιείται.")
+            use_cache = False
+
+    if use_cache:
+        start = time.perf_counter()
+        fingerprint = _file_fingerprint(file_path)
+        key = _cache_key(fingerprint, encoding, sep, NA_VALUES)
+        cache_path, manifest_path = _cache_paths(file_path, cache_dir, key)
+        hash_seconds = time.perf_counter() - start
+
+        if os.path.isfile(cache_path):
+            data = _read_cache(cache_path, columns, logger)
+        if data is not None:
+            warm_seconds = time.perf_counter() - start
+            cold_seconds = None
+            if os.path.isfile(manifest_path):
+                with open(manifest_path, encoding='utf-8') as f:
+                    cold_seconds = json.load(f).get("parse_seconds")
+            logger.info("Φόρτωση αρχείου (cache hit): %s -> %s", file_path, cache_path)
+            if cold_seconds:
+                logger.info("Cache timing: cold parse %.3fs -> warm %.3fs (hash %.3fs, speedup x%.1f)",
+                            cold_seconds, warm_seconds, hash_seconds, cold_seconds / max(warm_seconds, 1e-9))
+            else:
+                logger.info("Cache timing: warm %.3fs (hash %.3fs)", warm_seconds, hash_seconds)
+
+    if data is None:
+        try:
+            # Ανίχνευση "κρυφών" missing values κατά την ανάγνωση
+            start = time.perf_counter()
+            with span('csv_parse'):
+                data = pd.read_csv(file_path, encoding=encoding, sep=sep, na_values=NA_VALUES)
+            parse_seconds = time.perf_counter() - start
+            logger.info("Φόρτωση αρχείου: %s (parse %.3fs)", file_path, parse_seconds)
+        except Exception as e:
+            logger.exception("Σφάλμα κατά τη φόρτωση CSV:")
+            raise ValueError(f"Σφάλμα κατά τη φόρτωση αρχείου: {e}")
+
+        data = _to_columnar_types(data)
+        if use_cache:
+            if target in data.columns:
+                manifest = {
+                    "source": os.path.abspath(file_path),
+                    "fingerprint": fingerprint,
+                    "encoding": encoding,
+                    "sep": sep,
+                    "na_values": NA_VALUES,
+                    "parse_seconds": parse_seconds
+                }
+                _write_cache(data, file_path, cache_dir, cache_path, manifest_path, manifest, logger)
+                logger.info("Cache timing: cold parse %.3fs (cache miss)", parse_seconds)
+
+        if columns is not None:
+            missing_cols = [col for col in columns if col not in data.columns]
+            if target in data.columns and missing_cols:
+                raise ValueError(f"Οι στήλες {missing_cols} δεν υπάρχουν στο dataset.")
+            data = data[[col for col in columns if col in data.columns]]
+
     if target not in data.columns:
         logger.error("Απουσιάζει η στήλη στόχου '%s'", target)
         raise ValueError(f"Η στήλη στόχου '{target}' δεν υπάρχει στο dataset.")
@@ -69,7 +432,7 @@ def load_dataset(file_path=None, target='Heart_Condition', encoding='utf-8', sep
         "columns": list(data.columns),
         "dtypes": data.dtypes.to_dict(),
         "missing": data.isnull().sum().to_dict(),
-        "describe": data.describe(include='all').to_dict()
+        "describe": data.describe(include='all', datetime_is_numeric=True).to_dict()
     }
 
     logger.info("Σχήμα: %s", data.shape)
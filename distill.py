@@ -0,0 +1,313 @@
+# === distill.py ===
+# Συμπίεση του stacking για edge deployment: distillation των πιθανοτήτων του (teacher) σε ένα ρηχό
+# LightGBM (student) με soft cross-entropy, κβαντισμός thresholds (codebook ανά feature, uint8 codes)
+# και φύλλων (int8 ή float16) και export σε artifact που αξιολογείται μόνο με numpy (edge_model.py)
+
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from edge_model import EdgeModel, MANIFEST_NAME, ARRAYS_NAME, EDGE_FORMAT, EDGE_VERSION, _softmax
+from evaluation import compute_metrics
+from fused_predictor import _parse_lightgbm, _lightgbm_trees
+
+DISTILLED_PATH = "models/distilled"
+REPORT_PATH = "results/distillation_report.json"
+LEAF_DTYPES = ('int8', 'float16', 'float32')
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/distill.log', level=logging.INFO):
+    logger = logging.getLogger('distill')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Δεδομένα distillation ===
+def augment(X, categorical_idx=(), n_copies=1, noise=0.1, random_state=42):
+    """
+    Αντίγραφα του X με Gaussian θόρυβο (noise x std ανά αριθμητικό feature, τα κατηγορικά μένουν ίδια),
+    ώστε ο student να βλέπει τον teacher και γύρω από τα σημεία εκπαίδευσης.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if not n_copies:
+        return X
+    rng = np.random.default_rng(random_state)
+    std = X.std(axis=0)
+    std[list(categorical_idx)] = 0.0
+    copies = [X + rng.standard_normal(X.shape, dtype=np.float32) * (noise * std) for _ in range(n_copies)]
+    return np.concatenate([X, *copies])
+
+def soft_cross_entropy(targets):
+    """
+    Custom objective του LightGBM: cross-entropy ως προς τις πιθανότητες του teacher (όχι hard labels).
+    Το LightGBM 3.x δίνει/δέχεται τα multiclass margins ομαδοποιημένα ανά κλάση.
+    """
+    n_rows, n_classes = targets.shape
+
+    def objective(preds, dataset):
+        proba = _softmax(preds.reshape(n_classes, n_rows).T.astype(np.float64))
+        grad = proba - targets
+        hess = np.maximum(proba * (1.0 - proba), 1e-6)
+        return grad.T.ravel(), hess.T.ravel()
+
+    return objective
+
+def train_student(X, soft_targets, n_rounds=150, num_leaves=8, max_depth=3, learning_rate=0.1, max_bin=63,
+                  n_threads=None, random_state=42):
+    """
+    Ένας multiclass LightGBM με ρηχά δέντρα. max_bin <= 256: κάθε feature έχει το πολύ 255
+    thresholds, οπότε τα codes χωρούν σε uint8.
+    """
+    import lightgbm as lgb
+    n_classes = soft_targets.shape[1]
+    dataset = lgb.Dataset(X, label=soft_targets.argmax(axis=1), params={"max_bin": max_bin, "verbose": -1},
+                          free_raw_data=True)
+    params = {"num_class": n_classes, "num_leaves": num_leaves, "max_depth": max_depth,
+              "learning_rate": learning_rate, "min_data_in_leaf": 20, "lambda_l2": 1.0, "seed": random_state,
+              "verbose": -1, "num_threads": n_threads or 0}
+    return lgb.train(params, dataset, num_boost_round=n_rounds, fobj=soft_cross_entropy(soft_targets))
+
+# === Μεταγλώττιση + κβαντισμός ===
+def _depth(tree):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [child for node in frontier if tree["left"][node] != -1
+                    for child in (tree["left"][node], tree["right"][node])]
+        if not frontier:
+            return depth
+        depth += 1
+
+def _round_down_float32(values):
+    # Μεγαλύτερο float32 <= τιμή: για float32 εισόδους, x <= t32 ισοδυναμεί με x <= t
+    rounded = values.astype(np.float32)
+    return np.where(rounded > values, np.nextafter(rounded, np.float32(-np.inf)), rounded).astype(np.float32)
+
+def compile_student(booster, n_features, leaf_dtype='int8'):
+    """
+    Επίπεδοι πίνακες κόμβων του student (ίδια μορφή με το fused_predictor) με κβαντισμένα thresholds
+    (θέση στο codebook του feature) και φύλλα. Επιστρέφει (arrays, max_depth, n_outputs).
+    """
+    if leaf_dtype not in LEAF_DTYPES:
+        raise ValueError(f"leaf_dtype πρέπει να είναι ένα από {LEAF_DTYPES}.")
+    header, raw_trees = _parse_lightgbm(booster.model_to_string())
+    n_outputs = int(header.get("num_tree_per_iteration", 1))
+    trees = _lightgbm_trees(raw_trees, n_outputs)
+    if any(tree["zero_missing"].any() for tree in trees):
+        raise ValueError("Δεν υποστηρίζεται zero_as_missing στον student.")
+
+    sizes = [len(tree["left"]) for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    node_ids = np.arange(offsets[-1])
+    left = np.concatenate([np.where(t["left"] == -1, -1, t["left"] + o) for t, o in zip(trees, offsets)])
+    right = np.concatenate([np.where(t["right"] == -1, -1, t["right"] + o) for t, o in zip(trees, offsets)])
+    is_leaf = left == -1
+    # Τα φύλλα δείχνουν στον εαυτό τους: σταθερός αριθμός βημάτων (max_depth) για όλα τα δέντρα
+    left = np.where(is_leaf, node_ids, left)
+    right = np.where(is_leaf, node_ids, right)
+    feature = np.concatenate([t["feature"] for t in trees])
+    threshold = _round_down_float32(np.concatenate([t["threshold"] for t in trees]))
+    node_output = np.concatenate([np.full(size, t["output"]) for t, size in zip(trees, sizes)])
+    leaf = np.concatenate([t["leaf"] for t in trees])
+
+    # Codebook ανά feature: τα ταξινομημένα μοναδικά thresholds, ο κόμβος κρατά τη θέση του
+    codebooks, codes = [], np.zeros(len(left), dtype=np.int64)
+    for j in range(n_features):
+        mask = ~is_leaf & (feature == j)
+        codebook = np.unique(threshold[mask])
+        codes[mask] = np.searchsorted(codebook, threshold[mask])
+        codebooks.append(codebook)
+    code_dtype = np.uint8 if max(len(c) for c in codebooks) <= 256 else np.uint16
+
+    arrays = {
+        "feature": np.where(is_leaf, 0, feature).astype(np.min_scalar_type(max(n_features - 1, 0))),
+        "threshold": codes.astype(code_dtype),
+        "left": left.astype(np.min_scalar_type(len(left))),
+        "right": right.astype(np.min_scalar_type(len(left))),
+        "default_left": np.concatenate([t["default_left"] for t in trees]),
+        "roots": offsets[:-1].astype(np.min_scalar_type(len(left))),
+        "codebook": np.concatenate(codebooks).astype(np.float32),
+        "codebook_offsets": np.concatenate([[0], np.cumsum([len(c) for c in codebooks])]).astype(np.int32)
+    }
+    if leaf_dtype == 'int8':
+        scale = np.array([np.abs(leaf[is_leaf & (node_output == k)]).max() / 127.0 or 1.0
+                          for k in range(n_outputs)], dtype=np.float32)
+        arrays["leaf"] = np.where(is_leaf, np.round(leaf / scale[node_output]), 0).astype(np.int8)
+        arrays["leaf_scale"] = scale
+        arrays["node_output"] = node_output.astype(np.uint8)
+    else:
+        arrays["leaf"] = np.where(is_leaf, leaf, 0.0).astype(leaf_dtype)
+    return arrays, max(_depth(tree) for tree in trees), n_outputs
+
+def _preprocessing_params(pipeline):
+    """
+    Οι παράμετροι του PreprocessingPipeline σε JSON, για κωδικοποίηση raw records στο gateway.
+    """
+    return {
+        "feature_names": list(pipeline.feature_names_),
+        "fill_values": {col: float(v) for col, v in zip(pipeline.numeric_cols_, pipeline.fill_values_)},
+        "categories": {col: {str(c): i for i, c in enumerate(cats)} for col, cats in pipeline.categories_.items()},
+        "unknown_codes": {col: int(code) for col, code in pipeline.unknown_codes_.items()},
+        "mean": None if pipeline.mean_ is None else pipeline.mean_.tolist(),
+        "scale": None if pipeline.scale_ is None else pipeline.scale_.tolist()
+    }
+
+def build_edge_model(booster, teacher, pipeline, feature_names, leaf_dtype='int8'):
+    arrays, max_depth, n_outputs = compile_student(booster, len(feature_names), leaf_dtype)
+    classes = np.asarray(teacher.classes_)
+    manifest = {
+        "format": EDGE_FORMAT,
+        "version": EDGE_VERSION,
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "classes": classes.tolist(),
+        "labels": [str(label) for label in pipeline.decode_target(classes)],
+        "feature_names": list(feature_names),
+        "n_outputs": n_outputs,
+        "n_trees": len(arrays["roots"]),
+        "n_nodes": len(arrays["left"]),
+        "max_depth": max_depth,
+        "leaf_dtype": leaf_dtype,
+        "base_margin": [0.0] * n_outputs,
+        "preprocessing": _preprocessing_params(pipeline)
+    }
+    return manifest, arrays
+
+def save_edge_model(manifest, arrays, path=DISTILLED_PATH):
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.savez_compressed(os.path.join(tmp_path, ARRAYS_NAME), **arrays)
+    with open(os.path.join(tmp_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return path
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+# === Distillation ===
+def distill_model(teacher, pipeline, X_train, X_test, y_test, label_names=None, path=DISTILLED_PATH,
+                  leaf_dtype='int8', n_rounds=150, num_leaves=8, max_depth=3, n_augment=1, noise=0.1,
+                  n_threads=None, report_path=REPORT_PATH, random_state=42, logger=None):
+    """
+    Εκπαιδεύει τον student στις πιθανότητες του teacher (X_train + n_augment θορυβώδη αντίγραφα),
+    συγκρίνει teacher, student και κάθε κβαντισμό των φύλλων στο X_test (accuracy, ROC AUC, συμφωνία
+    με τον teacher) και αποθηκεύει τον student με leaf_dtype. Επιστρέφει (EdgeModel, report).
+    """
+    logger = logger or logging.getLogger('distill')
+    feature_names = list(getattr(X_train, 'columns', pipeline.feature_names_))
+    categorical_idx = [feature_names.index(col) for col in pipeline.categorical_cols_ if col in feature_names]
+    start = time.perf_counter()
+
+    X_distill = augment(X_train, categorical_idx, n_copies=n_augment, noise=noise, random_state=random_state)
+    soft_targets = teacher.predict_proba(pd.DataFrame(X_distill, columns=feature_names))
+    teacher_seconds = time.perf_counter() - start
+    booster = train_student(X_distill, soft_targets, n_rounds=n_rounds, num_leaves=num_leaves, max_depth=max_depth,
+                            n_threads=n_threads, random_state=random_state)
+    train_seconds = time.perf_counter() - start - teacher_seconds
+    logger.info("[distill] Student: %d γραμμές (%d αντίγραφα), %d rounds, teacher %.1fs, fit %.1fs",
+                len(X_distill), n_augment, n_rounds, teacher_seconds, train_seconds)
+
+    y_test = np.asarray(y_test)
+    X_test_frame = X_test if hasattr(X_test, 'columns') else pd.DataFrame(X_test, columns=feature_names)
+    teacher_proba = teacher.predict_proba(X_test_frame)
+    teacher_metrics = compute_metrics(y_test, teacher_proba, label_names)
+    results = {"teacher": {"accuracy": teacher_metrics["accuracy"], "roc_auc_macro": teacher_metrics["roc_auc_macro"]}}
+    models = {}
+    for dtype in LEAF_DTYPES:
+        manifest, arrays = build_edge_model(booster, teacher, pipeline, feature_names, leaf_dtype=dtype)
+        model = EdgeModel(manifest, arrays)
+        proba = model.predict_proba(X_test_frame)
+        metrics = compute_metrics(y_test, proba, label_names)
+        results[dtype] = {
+            "accuracy": metrics["accuracy"],
+            "roc_auc_macro": metrics["roc_auc_macro"],
+            "accuracy_delta": metrics["accuracy"] - teacher_metrics["accuracy"],
+            "roc_auc_delta": metrics["roc_auc_macro"] - teacher_metrics["roc_auc_macro"],
+            "agreement": float((proba.argmax(axis=1) == teacher_proba.argmax(axis=1)).mean()),
+            "mean_abs_proba_diff": float(np.abs(proba - teacher_proba).mean()),
+            "arrays_bytes": int(sum(a.nbytes for a in arrays.values()))
+        }
+        models[dtype] = (manifest, arrays, model)
+        logger.info("[distill] %-7s accuracy %.4f (Δ %+.4f), ROC AUC %.4f (Δ %+.4f), συμφωνία με teacher %.3f",
+                    dtype, metrics["accuracy"], results[dtype]["accuracy_delta"], metrics["roc_auc_macro"],
+                    results[dtype]["roc_auc_delta"], results[dtype]["agreement"])
+
+    manifest, arrays, model = models[leaf_dtype]
+    manifest["metrics"] = results
+    save_edge_model(manifest, arrays, path)
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "path": path,
+        "leaf_dtype": leaf_dtype,
+        "student": {"n_rounds": n_rounds, "num_leaves": num_leaves, "max_depth": max_depth, "n_trees": manifest["n_trees"],
+                    "n_nodes": manifest["n_nodes"], "distill_rows": len(X_distill), "n_augment": n_augment,
+                    "noise": noise},
+        "disk_bytes": _dir_size(path),
+        "teacher_seconds": teacher_seconds,
+        "train_seconds": train_seconds,
+        "test_rows": len(y_test),
+        "results": results
+    }
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info("[distill] Αποθηκεύτηκε στο %s (%.1f KB, %d δέντρα, %s φύλλα)", path, report["disk_bytes"] / 1024,
+                manifest["n_trees"], leaf_dtype)
+    return model, report
+
+# === CLI ===
+def main(argv=None):
+    from sklearn.model_selection import train_test_split
+    from inference import load_artifacts, MODEL_PATH, PIPELINE_PATH
+    from data_loader import NA_VALUES
+
+    parser = argparse.ArgumentParser(description="Distillation του stacking σε συμπαγές μοντέλο για edge deployment")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--model', default=MODEL_PATH, help="Teacher (artifact ή .pkl)")
+    parser.add_argument('--pipeline', default=PIPELINE_PATH)
+    parser.add_argument('--output', default=DISTILLED_PATH)
+    parser.add_argument('--leaf-dtype', choices=LEAF_DTYPES, default='int8')
+    parser.add_argument('--rounds', type=int, default=150)
+    parser.add_argument('--num-leaves', type=int, default=8)
+    parser.add_argument('--max-depth', type=int, default=3)
+    parser.add_argument('--augment', type=int, default=1, help="Θορυβώδη αντίγραφα του train set")
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    logger = configure_logging()
+    teacher, pipeline = load_artifacts(args.model, args.pipeline)
+    data = pd.read_csv(args.data, na_values=NA_VALUES)
+    data = data[data[pipeline.target].notna()]
+    X = pipeline.transform(data)
+    y = pipeline.encode_target(data[pipeline.target]).to_numpy()
+    # Ίδιο stratified split με το preprocess_data: το test set δεν χρησιμοποιείται στο distillation
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    return distill_model(teacher, pipeline, X_train, X_test, y_test, label_names=list(pipeline.classes_),
+                         path=args.output, leaf_dtype=args.leaf_dtype, n_rounds=args.rounds,
+                         num_leaves=args.num_leaves, max_depth=args.max_depth, n_augment=args.augment,
+                         n_threads=args.threads, logger=logger)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+# === drift.py ===
+# Validation και drift monitoring: συμπαγές προφίλ των δεδομένων εκπαίδευσης (quantile histograms για τα
+# αριθμητικά features, πίνακες συχνοτήτων για τα κατηγορικά, priors κλάσεων) και streaming σύγκριση των
+# batches του scoring με αυτό (PSI, KS, schema/range violations) με σταθερή μνήμη
+
+import os
+import json
+import time
+import logging
+import threading
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.special import kolmogorov
+
+from data_loader import StreamingStats, NA_VALUES
+
+PROFILE_PATH = "models/data_profile.json"
+REPORT_PATH = "results/drift_report.json"
+# Συνήθη όρια του PSI: < 0.1 σταθερό, 0.1-0.25 μέτρια μετατόπιση, > 0.25 σημαντική
+PSI_WARN = 0.1
+PSI_DRIFT = 0.25
+# Μικρή πιθανότητα για κενά bins (αλλιώς το PSI απειρίζεται)
+PSI_EPS = 1e-4
+MAX_UNSEEN_EXAMPLES = 10
+
+class DriftError(RuntimeError):
+    """
+    Το scoring σταμάτησε επειδή τα δεδομένα παραβιάζουν το schema ή απέχουν πολύ από την εκπαίδευση.
+    """
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/drift.log', level=logging.INFO):
+    logger = logging.getLogger('drift')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Προφίλ εκπαίδευσης ===
+class DataProfiler(StreamingStats):
+    """
+    Συσσωρεύει (ανά chunk ή σε ένα DataFrame) τα ίδια στατιστικά με το StreamingStats και τα συμπυκνώνει
+    σε προφίλ: n_bins quantile bins ανά αριθμητική στήλη (από το bottom-k δείγμα), συχνότητες των έως
+    max_categories πιο συχνών κατηγοριών, ποσοστά missing, εύρος τιμών και priors του target.
+    Τα αναγνωριστικά (Patient_ID) εξαιρούνται: νέες τιμές τους είναι αναμενόμενες, όχι drift.
+    """
+
+    def __init__(self, target='Heart_Condition', n_bins=10, sample_size=20_000, max_categories=50,
+                 drop_columns=('timestamp', 'Patient_ID'), random_state=42):
+        super().__init__(target=target, quantile_sample_size=sample_size, random_state=random_state)
+        self.n_bins = n_bins
+        self.max_categories = max_categories
+        self.drop_columns = tuple(drop_columns)
+
+    def update(self, chunk):
+        super().update(chunk.drop(columns=list(self.drop_columns), errors='ignore'))
+        return self
+
+    def profile(self):
+        columns = {}
+        for col in self.columns or []:
+            if col == self.target:
+                continue
+            missing_rate = self.missing[col] / self.n_rows if self.n_rows else 0.0
+            if col in self._numeric:
+                acc = self._numeric[col]
+                sample = acc["sample"]
+                n = acc["count"]
+                # Εσωτερικά όρια από quantiles. Σε διακριτές στήλες πολλά συμπίπτουν, οπότε μένουν λιγότερα bins
+                edges = np.unique(np.quantile(sample, np.arange(1, self.n_bins) / self.n_bins)) if n else np.empty(0)
+                counts = np.bincount(np.searchsorted(edges, sample, side='right'), minlength=len(edges) + 1)
+                columns[col] = {
+                    "kind": "numeric",
+                    "dtype": str(self.dtypes[col]),
+                    "count": int(n),
+                    "missing_rate": missing_rate,
+                    "min": float(acc["min"]) if n else None,
+                    "max": float(acc["max"]) if n else None,
+                    "mean": float(acc["mean"]) if n else None,
+                    "std": float(np.sqrt(acc["m2"] / (n - 1))) if n > 1 else None,
+                    "edges": edges.tolist(),
+                    "proportions": (counts / max(counts.sum(), 1)).tolist()
+                }
+            else:
+                counts = self._counts.get(col, pd.Series(dtype='int64')).sort_values(ascending=False)
+                total = int(counts.sum())
+                top = counts.iloc[:self.max_categories]
+                columns[col] = {
+                    "kind": "categorical",
+                    "dtype": str(self.dtypes[col]),
+                    "count": total,
+                    "missing_rate": missing_rate,
+                    # Κατηγορίες εκτός top: ως ομάδα "other" (αναγνωρισμένες, όχι unseen)
+                    "known": [str(c) for c in counts.index],
+                    "frequencies": {str(c): int(v) / total for c, v in top.items()} if total else {},
+                    "other": float(counts.iloc[self.max_categories:].sum() / total) if total else 0.0
+                }
+        target_counts = self._counts.get(self.target, pd.Series(dtype='int64'))
+        total = int(target_counts.sum())
+        return {
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "target": self.target,
+            "n_rows": self.n_rows,
+            "n_bins": self.n_bins,
+            "drop_columns": list(self.drop_columns),
+            "columns": columns,
+            "priors": {str(c): int(v) / total for c, v in target_counts.sort_index().items()} if total else {}
+        }
+
+def build_profile(data, target='Heart_Condition', chunksize=100_000, **kwargs):
+    """
+    Προφίλ από DataFrame ή iterable από chunks (π.χ. stream_dataset).
+    """
+    profiler = DataProfiler(target=target, **kwargs)
+    chunks = (data.iloc[i:i + chunksize] for i in range(0, len(data), chunksize)) if hasattr(data, 'iloc') else data
+    for chunk in chunks:
+        profiler.update(chunk)
+    return profiler.profile()
+
+def save_profile(profile, path=PROFILE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=1, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+    return path
+
+def load_profile(path=PROFILE_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+# === Μετρικές drift ===
+def psi(expected, actual, eps=PSI_EPS):
+    """
+    Population Stability Index μεταξύ δύο κατανομών (πιθανότητες ή counts ανά bin).
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.clip(expected / max(expected.sum(), eps), eps, None)
+    actual = np.clip(actual / max(actual.sum(), eps), eps, None)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
+
+def binned_ks(expected, counts, n_expected):
+    """
+    KS στατιστικό στα όρια των bins (κάτω φράγμα του ακριβούς KS) και ασυμπτωτικό p-value.
+    """
+    n_actual = counts.sum()
+    if n_actual == 0 or n_expected == 0:
+        return None, None
+    statistic = float(np.abs(np.cumsum(expected) - np.cumsum(counts / n_actual)).max())
+    n_effective = n_expected * n_actual / (n_expected + n_actual)
+    return statistic, float(kolmogorov(np.sqrt(n_effective) * statistic))
+
+def _status(value, warn=PSI_WARN, drift=PSI_DRIFT):
+    if value is None:
+        return "n/a"
+    return "drift" if value > drift else ("warn" if value > warn else "ok")
+
+# === Streaming monitor ===
+class DriftMonitor:
+    """
+    Σύγκριση των batches του scoring με το προφίλ. Κρατά μόνο counts ανά bin/κατηγορία (σταθερή μνήμη,
+    ανεξάρτητη από τον αριθμό γραμμών). Violations: στήλες που λείπουν, μη αριθμητικές τιμές σε αριθμητικές
+    στήλες, τιμές εκτός του εύρους της εκπαίδευσης, άγνωστες κατηγορίες. Drift: PSI/KS ανά feature,
+    μεταβολή του ποσοστού missing και PSI των προβλέψεων ως προς τα priors.
+    block=True: check() σηκώνει DriftError σε schema violations (αμέσως) ή σε drift (μετά από min_rows).
+    """
+
+    def __init__(self, profile, block=False, min_rows=1000, psi_drift=PSI_DRIFT, range_tolerance=0.01,
+                 missing_tolerance=0.05):
+        self.profile = profile
+        self.block = block
+        self.min_rows = min_rows
+        self.psi_drift = psi_drift
+        self.range_tolerance = range_tolerance
+        self.missing_tolerance = missing_tolerance
+        self.n_rows = 0
+        self.seconds = 0.0
+        self.extra_columns = set()
+        # update() από το thread του scoring, report() π.χ. από το GET /drift
+        self._lock = threading.RLock()
+        self._edges, self._lookup, self._counts, self._acc = {}, {}, {}, {}
+        for col, ref in profile["columns"].items():
+            self._acc[col] = {"missing": 0, "invalid": 0, "below": 0, "above": 0, "unseen": 0, "absent": 0}
+            if ref["kind"] == "numeric":
+                self._edges[col] = np.asarray(ref["edges"], dtype=np.float64)
+                self._counts[col] = np.zeros(len(ref["edges"]) + 1, dtype=np.int64)
+            else:
+                top = list(ref["frequencies"])
+                # Θέσεις: top κατηγορίες, μετά "other" (γνωστές εκτός top), μετά unseen
+                self._lookup[col] = (pd.Index(top), pd.Index(ref["known"]))
+                self._counts[col] = np.zeros(len(top) + 1, dtype=np.int64)
+                self._acc[col]["unseen_examples"] = []
+        priors = profile.get("priors") or {}
+        self._classes = pd.Index(list(priors))
+        self._predictions = np.zeros(len(priors) + 1, dtype=np.int64)
+
+    def update(self, batch):
+        with self._lock:
+            start = time.perf_counter()
+            n = len(batch)
+            self.n_rows += n
+            self.extra_columns.update(c for c in batch.columns if c not in self.profile["columns"]
+                                      and c != self.profile["target"] and c not in self.profile.get("drop_columns", ()))
+            for col, ref in self.profile["columns"].items():
+                acc = self._acc[col]
+                if col not in batch.columns:
+                    acc["absent"] += n
+                    continue
+                series = batch[col]
+                if ref["kind"] == "numeric":
+                    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+                    missing = np.isnan(values)
+                    acc["missing"] += int(series.isna().sum())
+                    acc["invalid"] += int(missing.sum()) - int(series.isna().sum())
+                    values = values[~missing]
+                    acc["below"] += int((values < ref["min"]).sum()) if ref["min"] is not None else 0
+                    acc["above"] += int((values > ref["max"]).sum()) if ref["max"] is not None else 0
+                    self._counts[col] += np.bincount(np.searchsorted(self._edges[col], values, side='right'),
+                                                     minlength=len(self._counts[col]))
+                else:
+                    present = series.dropna()
+                    acc["missing"] += n - len(present)
+                    # Μέτρηση ανά μοναδική τιμή του batch (λίγες), όχι ανά γραμμή
+                    counts = present.astype(str).value_counts()
+                    top, known = self._lookup[col]
+                    positions = top.get_indexer(counts.index)
+                    in_top = positions >= 0
+                    np.add.at(self._counts[col], positions[in_top], counts.to_numpy()[in_top])
+                    is_known = known.get_indexer(counts.index) >= 0
+                    self._counts[col][-1] += int(counts.to_numpy()[~in_top & is_known].sum())
+                    unseen = counts[~is_known]
+                    acc["unseen"] += int(unseen.sum())
+                    examples = acc["unseen_examples"]
+                    examples += [v for v in unseen.index[:MAX_UNSEEN_EXAMPLES] if v not in examples]
+                    del examples[MAX_UNSEEN_EXAMPLES:]
+            self.seconds += time.perf_counter() - start
+            return self
+
+    def update_predictions(self, labels):
+        with self._lock:
+            start = time.perf_counter()
+            counts = pd.Series(labels).astype(str).value_counts()
+            positions = self._classes.get_indexer(counts.index)
+            np.add.at(self._predictions, np.where(positions >= 0, positions, len(self._classes)), counts.to_numpy())
+            self.seconds += time.perf_counter() - start
+            return self
+
+    # === Αναφορά ===
+    def report(self):
+        with self._lock:
+            features, violations = {}, []
+            n = self.n_rows
+            missing_columns = [col for col, acc in self._acc.items() if n and acc["absent"] == n]
+            for col in missing_columns:
+                violations.append({"column": col, "type": "missing_column"})
+
+            for col, ref in self.profile["columns"].items():
+                acc = self._acc[col]
+                seen = n - acc["absent"]
+                counts = self._counts[col]
+                entry = {"kind": ref["kind"], "rows": int(seen),
+                         "missing_rate": acc["missing"] / seen if seen else None,
+                         "reference_missing_rate": ref["missing_rate"]}
+                if ref["kind"] == "numeric":
+                    expected = np.asarray(ref["proportions"])
+                    entry["psi"] = psi(expected, counts) if counts.sum() else None
+                    entry["ks"], entry["ks_pvalue"] = binned_ks(expected, counts, ref["count"])
+                    valid = max(int(counts.sum()), 1)
+                    entry.update(invalid=acc["invalid"], below_min=acc["below"], above_max=acc["above"],
+                                 out_of_range_rate=(acc["below"] + acc["above"]) / valid)
+                    if acc["invalid"]:
+                        violations.append({"column": col, "type": "non_numeric", "count": acc["invalid"]})
+                    if entry["out_of_range_rate"] > self.range_tolerance:
+                        violations.append({"column": col, "type": "out_of_range", "rate": entry["out_of_range_rate"],
+                                           "min": ref["min"], "max": ref["max"]})
+                else:
+                    expected = list(ref["frequencies"].values()) + [ref["other"]]
+                    entry["psi"] = psi(expected, counts) if counts.sum() else None
+                    entry.update(unseen=acc["unseen"], unseen_examples=list(acc["unseen_examples"]))
+                    if acc["unseen"]:
+                        violations.append({"column": col, "type": "unseen_category", "count": acc["unseen"],
+                                           "examples": list(acc["unseen_examples"])})
+                entry["status"] = _status(entry["psi"], drift=self.psi_drift)
+                if (entry["missing_rate"] is not None
+                        and entry["missing_rate"] - ref["missing_rate"] > self.missing_tolerance):
+                    entry["status"] = "drift"
+                    entry["missing_drift"] = True
+                features[col] = entry
+
+            prediction = None
+            if self._predictions.sum():
+                expected = list(self.profile["priors"].values()) + [0.0]
+                value = psi(expected, self._predictions)
+                prediction = {"psi": value, "status": _status(value, drift=self.psi_drift),
+                              "distribution": {str(c): int(v) for c, v in zip(self._classes, self._predictions)},
+                              "priors": self.profile["priors"]}
+
+            drifted = sorted((col for col, e in features.items() if e["status"] == "drift"),
+                             key=lambda col: -(features[col]["psi"] or 0.0))
+            enough = n >= self.min_rows
+            warned = drifted or any(e["status"] == "warn" for e in features.values())
+            status = "violation" if violations else ("drift" if drifted and enough else ("warn" if warned else "ok"))
+            return {
+                "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "rows": n,
+                "status": status,
+                "enough_rows": enough,
+                "violations": violations,
+                "extra_columns": sorted(self.extra_columns),
+                "drifted_features": drifted,
+                "features": features,
+                "prediction": prediction,
+                "monitor_seconds": self.seconds
+            }
+
+    def check(self):
+        """
+        Με block=True σηκώνει DriftError αν υπάρχει violation ή (μετά από min_rows) σημαντικό drift.
+        """
+        if not self.block:
+            return None
+        report = self.report()
+        if report["violations"]:
+            raise DriftError(f"Schema/range violations: {report['violations'][:3]}", report)
+        if report["status"] == "drift":
+            raise DriftError(f"Σημαντικό drift (PSI > {self.psi_drift}) στα: {', '.join(report['drifted_features'])}",
+                             report)
+        return report
+
+def save_report(report, path=REPORT_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=float)
+    return path
+
+def log_report(report, logger=None):
+    logger = logger or logging.getLogger('drift')
+    logger.info("[drift] %d γραμμές, status %s, %d violations, drift σε %d features (%.3fs monitor)", report["rows"],
+                report["status"], len(report["violations"]), len(report["drifted_features"]), report["monitor_seconds"])
+    for col in report["drifted_features"][:5]:
+        entry = report["features"][col]
+        logger.warning("[drift] %s: PSI %.3f, KS %s", col, entry["psi"],
+                       f"{entry['ks']:.3f}" if entry.get("ks") is not None else "-")
+    for violation in report["violations"][:5]:
+        logger.warning("[drift] Violation: %s", violation)
+
+# === CLI ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Προφίλ δεδομένων εκπαίδευσης και έλεγχος drift νέων δεδομένων")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('profile', help="Προφίλ από τα δεδομένα εκπαίδευσης")
+    build.add_argument('--data', default='data/heart.csv')
+    build.add_argument('--target', default='Heart_Condition')
+    build.add_argument('--bins', type=int, default=10)
+    build.add_argument('--output', default=PROFILE_PATH)
+    check = sub.add_parser('check', help="Drift report για CSV/Parquet (χωρίς scoring)")
+    check.add_argument('--input', required=True)
+    check.add_argument('--profile', default=PROFILE_PATH)
+    check.add_argument('--batch-size', type=int, default=50_000)
+    check.add_argument('--report', default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    logger = configure_logging()
+    if args.command == 'profile':
+        chunks = pd.read_csv(args.data, na_values=NA_VALUES, chunksize=100_000)
+        profile = build_profile(chunks, target=args.target, n_bins=args.bins)
+        save_profile(profile, args.output)
+        logger.info("Προφίλ %d γραμμών, %d στηλών στο %s", profile["n_rows"], len(profile["columns"]), args.output)
+        return profile
+
+    from inference import iter_batches
+    monitor = DriftMonitor(load_profile(args.profile))
+    for batch in iter_batches(args.input, args.batch_size):
+        monitor.update(batch)
+    report = monitor.report()
+    save_report(report, args.report)
+    log_report(report, logger)
+    return report
+
+if __name__ == "__main__":
+    main()
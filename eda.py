@@ -1,9 +1,15 @@
 # === eda.py ===
 # Καθαρό και modular Exploratory Data Analysis για thesisbeta pipeline
+# (vectorized aggregation ανά κλάση, παράλληλο rendering, παράλειψη αμετάβλητων γραφημάτων)
 
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from metrics import METRICS, span
 
 # === Παλέτα για συνεπή χρωματισμό κλάσεων
 palette = {
@@ -14,66 +20,225 @@ palette = {
     "Diabetes": "#9467bd"
 }
 
+# === Επιλεγμένα χρήσιμα χαρακτηριστικά
+important_numeric = [
+    "Age", "BMI", "Blood_Glucose_mg_dL",
+    "Blood_Pressure_Systolic_mmHg", "Blood_Pressure_Diastolic_mmHg",
+    "Heart_Rate_bpm", "Heart_Rate_Variability_ms", "Stress_Level",
+    "Steps_Taken", "Calories_Burned_kcal", "ECG_Lead1_mV", "ECG_Lead2_mV"
+]
+
+important_categorical = [
+    "Activity_Type", "Alcohol_Consumption", "BMI_Category",
+    "Diet_Type", "Gender", "Medication_Taken", "Smoking_Status"
+]
+
+# Αλλάζει όταν αλλάζει η εμφάνιση των γραφημάτων, ώστε να ξαναδημιουργηθούν
+EDA_VERSION = 2
+MANIFEST_NAME = "eda_manifest.json"
+
+# === Vectorized aggregation ανά κλάση ===
+def aggregate_stats(data, target, numeric_cols, categorical_cols, bins=30, kde_sample=5000, random_state=42):
+    """
+    Υπολογίζει σε ένα groupby πέρασμα τα quartiles/whiskers, τα binned histograms
+    και τα counts ανά κλάση. Το KDE υπολογίζεται σε δείγμα έως kde_sample γραμμών ανά κλάση.
+    """
+    # Missing στόχος μένει NaN (code -1), όχι η συμβολοσειρά 'nan' ως επιπλέον κλάση
+    y = data[target].astype(str).where(data[target].notna())
+    classes = sorted(y.dropna().unique())
+    codes = pd.Categorical(y, categories=classes).codes
+    valid_class = codes >= 0
+    n_classes = len(classes)
+    stats = {"classes": classes, "numeric": {}, "categorical": {}}
+
+    if numeric_cols:
+        values = data[numeric_cols].to_numpy(dtype=np.float64)
+        grouped = pd.DataFrame(values, columns=numeric_cols).groupby(codes)
+        quartiles = grouped.quantile([0.25, 0.5, 0.75])
+        q1 = quartiles.xs(0.25, level=1).reindex(range(n_classes)).to_numpy()
+        q3 = quartiles.xs(0.75, level=1).reindex(range(n_classes)).to_numpy()
+        med = quartiles.xs(0.5, level=1).reindex(range(n_classes)).to_numpy()
+
+        # Whiskers (1.5 IQR) όπως στο boxplot χωρίς outliers, για όλες τις στήλες μαζί
+        iqr = q3 - q1
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        row_lower = np.where(valid_class[:, None], lower[np.clip(codes, 0, None)], np.nan)
+        row_upper = np.where(valid_class[:, None], upper[np.clip(codes, 0, None)], np.nan)
+        whislo = pd.DataFrame(np.where(values >= row_lower, values, np.nan)).groupby(codes).min()
+        whishi = pd.DataFrame(np.where(values <= row_upper, values, np.nan)).groupby(codes).max()
+        whislo = whislo.reindex(range(n_classes)).to_numpy()
+        whishi = whishi.reindex(range(n_classes)).to_numpy()
+
+        rng = np.random.default_rng(random_state)
+        for j, col in enumerate(numeric_cols):
+            column = values[:, j]
+            finite = np.isfinite(column) & valid_class
+            lo, hi = (column[finite].min(), column[finite].max()) if finite.any() else (0.0, 1.0)
+            edges = np.linspace(lo, hi if hi > lo else lo + 1.0, bins + 1)
+            width = edges[1] - edges[0]
+            bin_idx = np.clip(((column[finite] - edges[0]) / width).astype(np.int64), 0, bins - 1)
+            hist = np.bincount(codes[finite] * bins + bin_idx, minlength=n_classes * bins).reshape(n_classes, bins)
+
+            # KDE σε δείγμα ανά κλάση, κλιμακωμένο σε counts όπως στο histplot(kde=True)
+            grid = np.linspace(edges[0], edges[-1], 200)
+            kde = np.full((n_classes, grid.size), np.nan)
+            for k in range(n_classes):
+                class_values = column[finite & (codes == k)]
+                if class_values.size > kde_sample:
+                    class_values = rng.choice(class_values, kde_sample, replace=False)
+                if class_values.size > 1 and np.ptp(class_values) > 0:
+                    from scipy.stats import gaussian_kde
+                    kde[k] = gaussian_kde(class_values)(grid) * hist[k].sum() * width
+
+            stats["numeric"][col] = {
+                "box": np.column_stack([whislo[:, j], q1[:, j], med[:, j], q3[:, j], whishi[:, j]]),
+                "edges": edges, "hist": hist, "grid": grid, "kde": kde
+            }
+
+    for col in categorical_cols:
+        present = data[col].notna()
+        counts = pd.crosstab(data[col][present].astype(str), y[present]).reindex(columns=classes, fill_value=0)
+        stats["categorical"][col] = {"levels": counts.index.tolist(), "counts": counts.to_numpy()}
+
+    return stats
+
+# === Fingerprint εισόδου κάθε γραφήματος ===
+def _fingerprint(spec):
+    digest = hashlib.sha256(f"v{EDA_VERSION}:{spec['kind']}:{spec['col']}:{spec['target']}".encode('utf-8'))
+    digest.update(json.dumps(spec["classes"]).encode('utf-8'))
+    for key in sorted(spec["payload"]):
+        value = spec["payload"][key]
+        if isinstance(value, np.ndarray):
+            digest.update(np.ascontiguousarray(np.round(value, 10)).tobytes())
+        else:
+            digest.update(json.dumps(value, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+# === Rendering (τρέχει σε worker process με Agg backend) ===
+def _render(spec):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    kind, col, target, classes, payload = spec["kind"], spec["col"], spec["target"], spec["classes"], spec["payload"]
+    colors = [palette.get(c, "#7f7f7f") for c in classes]
+
+    if kind == "boxplot":
+        fig, ax = plt.subplots(figsize=(10, 4))
+        box_stats = [
+            {"label": c, "whislo": b[0], "q1": b[1], "med": b[2], "q3": b[3], "whishi": b[4]}
+            for c, b in zip(classes, payload["box"]) if not np.isnan(b).any()
+        ]
+        artists = ax.bxp(box_stats, showfliers=False, patch_artist=True)
+        for patch, c in zip(artists["boxes"], [s["label"] for s in box_stats]):
+            patch.set_facecolor(palette.get(c, "#7f7f7f"))
+        ax.set_xlabel(target)
+        ax.set_ylabel(col)
+        ax.set_title(f"Boxplot του {col} ανά {target}")
+        plt.xticks(rotation=30)
+    elif kind == "countplot":
+        fig, ax = plt.subplots(figsize=(12, 4))
+        levels, counts = payload["levels"], payload["counts"]
+        x = np.arange(len(levels))
+        width = 0.8 / max(len(classes), 1)
+        for k, (c, color) in enumerate(zip(classes, colors)):
+            ax.bar(x - 0.4 + (k + 0.5) * width, counts[:, k], width=width, color=color, label=c)
+        ax.set_xticks(x)
+        ax.set_xticklabels(levels)
+        ax.set_xlabel(col)
+        ax.set_ylabel("count")
+        ax.legend(title=target)
+        ax.set_title(f"Κατηγορικό χαρακτηριστικό: {col}")
+        plt.xticks(rotation=45)
+    else:
+        fig, ax = plt.subplots(figsize=(10, 4))
+        edges, hist = payload["edges"], payload["hist"]
+        bottom = np.zeros(hist.shape[1])
+        for k, (c, color) in enumerate(zip(classes, colors)):
+            ax.bar(edges[:-1], hist[k], width=np.diff(edges), bottom=bottom, align='edge',
+                   color=color, alpha=0.6, edgecolor='white', label=c)
+            # Stacked KDE όπως στο histplot(multiple="stack", kde=True)
+            if not np.isnan(payload["kde"][k]).all():
+                ax.plot(payload["grid"], payload["kde"][k] + np.interp(payload["grid"], edges[:-1] + np.diff(edges) / 2, bottom),
+                        color=color)
+            bottom = bottom + hist[k]
+        ax.set_xlabel(col)
+        ax.set_ylabel("Count")
+        ax.legend(title=target)
+        ax.set_title(f"Κατανομή του {col} ανά {target}")
+
+    plt.tight_layout()
+    fig.savefig(spec["path"])
+    plt.close(fig)
+    return spec["path"], time.perf_counter() - start
+
 # === Κύρια Συνάρτηση EDA ===
-def run_eda(data, target="Heart_Condition", save_dir="results"):
+def run_eda(data, target="Heart_Condition", save_dir="results", n_jobs=None, force=False, bins=30, kde_sample=5000):
     print("\n[EDA] Εκκίνηση καθαρής ανάλυσης δεδομένων...")
+    eda_start = time.perf_counter()
 
-    X = data.drop(columns=[target])
-    y = data[target]
-    numeric_cols = X.select_dtypes(include=['int64', 'float64']).columns
-    categorical_cols = X.select_dtypes(include=['object', 'category']).columns
+    numeric_cols = [col for col in important_numeric if col in data.columns]
+    categorical_cols = [col for col in important_categorical if col in data.columns]
 
     # === Δημιουργία φακέλων
     folders = ["boxplots", "counts", "distributions"]
     for folder in folders:
         os.makedirs(os.path.join(save_dir, folder), exist_ok=True)
 
-    # === Συνάρτηση Αποθήκευσης
-    def plot_and_save(path, show=False):
-        if show:
-            plt.show()
-        else:
-            plt.savefig(path)
-            plt.close()
-
-    # === Επιλεγμένα χρήσιμα χαρακτηριστικά
-    important_numeric = [
-        "Age", "BMI", "Blood_Glucose_mg_dL",
-        "Blood_Pressure_Systolic_mmHg", "Blood_Pressure_Diastolic_mmHg",
-        "Heart_Rate_bpm", "Heart_Rate_Variability_ms", "Stress_Level",
-        "Steps_Taken", "Calories_Burned_kcal", "ECG_Lead1_mV", "ECG_Lead2_mV"
-    ]
-
-    important_categorical = [
-        "Activity_Type", "Alcohol_Consumption", "BMI_Category",
-        "Diet_Type", "Gender", "Medication_Taken", "Smoking_Status"
-    ]
-
-    # === Boxplots ===
-    for col in important_numeric:
-        plt.figure(figsize=(10, 4))
-        sns.boxplot(x=target, y=col, data=data, palette=palette, showfliers=False)
-        plt.title(f"Boxplot του {col} ανά {target}")
-        plt.xticks(rotation=30)
-        plt.tight_layout()
-        plot_and_save(f"{save_dir}/boxplots/boxplot_{col}.png")
-
-    # === Countplots ===
-    for col in important_categorical:
-        plt.figure(figsize=(12, 4))
-        sns.countplot(x=col, hue=target, data=data, palette=palette)
-        plt.title(f"Κατηγορικό χαρακτηριστικό: {col}")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plot_and_save(f"{save_dir}/counts/category_{col}.png")
+    # === Aggregation (ένα vectorized πέρασμα)
+    agg_start = time.perf_counter()
+    with span('aggregation'):
+        stats = aggregate_stats(data, target, numeric_cols, categorical_cols, bins=bins, kde_sample=kde_sample)
+    agg_seconds = time.perf_counter() - agg_start
+    print(f"[EDA] Aggregation: {agg_seconds:.2f}s")
+
+    specs = []
+    for col in numeric_cols:
+        specs.append({"kind": "boxplot", "col": col, "payload": {"box": stats["numeric"][col]["box"]},
+                      "path": f"{save_dir}/boxplots/boxplot_{col}.png"})
+    for col in categorical_cols:
+        specs.append({"kind": "countplot", "col": col, "payload": stats["categorical"][col],
+                      "path": f"{save_dir}/counts/category_{col}.png"})
+    for col in numeric_cols:
+        payload = {key: stats["numeric"][col][key] for key in ("edges", "hist", "grid", "kde")}
+        specs.append({"kind": "distribution", "col": col, "payload": payload,
+                      "path": f"{save_dir}/distributions/distribution_{col}.png"})
+    for spec in specs:
+        spec.update(target=target, classes=stats["classes"])
+        spec["fingerprint"] = _fingerprint(spec)
+
+    # === Παράλειψη γραφημάτων με ίδιο fingerprint εισόδου
+    manifest_path = os.path.join(save_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.isfile(manifest_path) and not force:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f).get("plots", {})
+    todo = [s for s in specs if force or manifest.get(s["path"]) != s["fingerprint"] or not os.path.isfile(s["path"])]
+    skipped = len(specs) - len(todo)
+
+    # === Παράλληλο rendering
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, len(todo)))
+    rendered = Parallel(n_jobs=n_jobs, backend='loky' if n_jobs > 1 else 'sequential')(
+        delayed(_render)(spec) for spec in todo
+    )
+
+    plot_timings = {}
+    for path, seconds in rendered:
+        plot_timings[path] = seconds
+        METRICS.record(f"plot/{os.path.basename(path)}", seconds)
+        print(f"[EDA] {path}: {seconds:.2f}s")
+    total_seconds = time.perf_counter() - eda_start
 
-    # === Distributions ===
-    for col in important_numeric:
-        plt.figure(figsize=(10, 4))
-        sns.histplot(data=data, x=col, hue=target, kde=True, multiple="stack", palette=palette)
-        plt.title(f"Κατανομή του {col} ανά {target}")
-        plt.tight_layout()
-        plot_and_save(f"{save_dir}/distributions/distribution_{col}.png")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "plots": {s["path"]: s["fingerprint"] for s in specs},
+            "timings": {"total_seconds": total_seconds, "aggregation_seconds": agg_seconds,
+                        "rendered": len(rendered), "skipped": skipped, "plots": plot_timings}
+        }, f, indent=2, ensure_ascii=False)
 
+    print(f"[EDA] {len(rendered)} γραφήματα, {skipped} αμετάβλητα (παράλειψη), σύνολο {total_seconds:.2f}s")
     print("[EDA] Ολοκλήρωση. Τα διαγράμματα αποθηκεύτηκαν στο:", save_dir)
     return None
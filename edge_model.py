@@ -0,0 +1,142 @@
+# === edge_model.py ===
+# Runtime του distilled μοντέλου (distill.py) μόνο με numpy, για sensor gateways: κωδικοποίηση raw
+# records με τις παραμέτρους του preprocessing, binning στα κβαντισμένα thresholds και διάσχιση όλων
+# των δέντρων ταυτόχρονα, ένα επίπεδο τη φορά
+
+import os
+import json
+
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+ARRAYS_NAME = "model.npz"
+EDGE_FORMAT = "distilled-model"
+EDGE_VERSION = 1
+# Code για NaN: ακολουθεί την default κατεύθυνση του κόμβου
+NAN_CODE = np.iinfo(np.uint16).max
+
+def _softmax(margin):
+    margin = margin - margin.max(axis=1, keepdims=True)
+    np.exp(margin, out=margin)
+    margin /= margin.sum(axis=1, keepdims=True)
+    return margin
+
+class EdgeModel:
+    """
+    Ίδιο API πρόβλεψης με το stacking (classes_, predict_proba, predict) πάνω στο κωδικοποιημένο X του
+    pipeline, και predict_records για raw records (dicts) χωρίς pandas/sklearn.
+    Τα thresholds κάθε feature είναι codebook (float32) και οι κόμβοι συγκρίνουν integer codes. Τα
+    φύλλα αποθηκεύονται int8 (με κλίμακα ανά κλάση), float16 ή float32 και αποκβαντίζονται στη φόρτωση.
+    Τα φύλλα δείχνουν στον εαυτό τους, οπότε max_depth βήματα φτάνουν για όλα τα δέντρα.
+    """
+
+    def __init__(self, manifest, arrays, chunk_size=4096):
+        if manifest.get("format") != EDGE_FORMAT or manifest.get("version") != EDGE_VERSION:
+            raise ValueError("Μη υποστηριζόμενο distilled artifact")
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        self.classes_ = np.asarray(manifest["classes"])
+        self.labels_ = np.asarray(manifest["labels"], dtype=object)
+        self.feature_names_in_ = np.asarray(manifest["feature_names"], dtype=object)
+        self.n_outputs = manifest["n_outputs"]
+        self.max_depth = manifest["max_depth"]
+
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"].astype(np.uint16)
+        self.left = arrays["left"].astype(np.intp)
+        self.right = arrays["right"].astype(np.intp)
+        self.default_left = arrays["default_left"]
+        self.roots = arrays["roots"].astype(np.intp)
+        offsets = arrays["codebook_offsets"]
+        self.codebooks = [arrays["codebook"][offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        # Αποκβαντισμός μία φορά: τιμή φύλλου ανά κόμβο σε float32
+        leaf = arrays["leaf"].astype(np.float32)
+        if "leaf_scale" in arrays:
+            leaf *= arrays["leaf_scale"][arrays["node_output"]]
+        self.leaf = leaf
+        self.base_margin = np.asarray(manifest["base_margin"], dtype=np.float32)
+        self.preprocessing = manifest.get("preprocessing")
+
+    @classmethod
+    def load(cls, path, chunk_size=4096):
+        with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+        with np.load(os.path.join(path, ARRAYS_NAME), allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls(manifest, arrays, chunk_size=chunk_size)
+
+    # === Raw records -> κωδικοποιημένο X (ίδιοι υπολογισμοί με το PreprocessingPipeline) ===
+    def transform_records(self, records):
+        if self.preprocessing is None:
+            raise ValueError("Το artifact δεν περιέχει παραμέτρους preprocessing.")
+        if isinstance(records, dict):
+            records = [records]
+        p = self.preprocessing
+        out = np.empty((len(records), len(p["feature_names"])), dtype=np.float64)
+        for j, col in enumerate(p["feature_names"]):
+            if col in p["categories"]:
+                lookup = p["categories"][col]
+                unknown = p["unknown_codes"][col]
+                # Όπως το astype(str) του pipeline: missing -> 'nan' (κατηγορία του fit, αν υπήρχαν κενά)
+                out[:, j] = [lookup.get(str(r[col]) if r.get(col) is not None else 'nan', unknown)
+                             for r in records]
+            else:
+                fill = p["fill_values"][col]
+                values = np.array([r.get(col) if r.get(col) is not None else np.nan for r in records],
+                                  dtype=np.float64)
+                out[:, j] = np.where(np.isnan(values), fill, values)
+        if p["mean"] is not None:
+            out -= np.asarray(p["mean"])
+            out /= np.asarray(p["scale"])
+        return out
+
+    # === Πρόβλεψη ===
+    def _codes(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        codes = np.empty(X.shape, dtype=np.uint16)
+        for j, codebook in enumerate(self.codebooks):
+            codes[:, j] = np.searchsorted(codebook, X[:, j], side='left')
+        nan = np.isnan(X)
+        if nan.any():
+            codes[nan] = NAN_CODE
+        return codes, bool(nan.any())
+
+    def decision_function(self, X):
+        X = X.to_numpy() if hasattr(X, 'to_numpy') else np.asarray(X)
+        margin = np.empty((len(X), self.n_outputs), dtype=np.float32)
+        for start in range(0, len(X), self.chunk_size):
+            codes, has_nan = self._codes(X[start:start + self.chunk_size])
+            rows = np.arange(len(codes))[:, None]
+            node = np.broadcast_to(self.roots, (len(codes), len(self.roots)))
+            for _ in range(self.max_depth):
+                code = codes[rows, self.feature[node]]
+                go_left = code <= self.threshold[node]
+                if has_nan:
+                    go_left = np.where(code == NAN_CODE, self.default_left[node], go_left)
+                node = np.where(go_left, self.left[node], self.right[node])
+            # Δέντρα με τη σειρά των iterations: (γραμμές, iterations, κλάσεις)
+            margin[start:start + len(codes)] = self.leaf[node].reshape(len(codes), -1, self.n_outputs).sum(axis=1)
+        return margin + self.base_margin
+
+    def predict_proba(self, X):
+        return _softmax(self.decision_function(X))
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def predict_records(self, records):
+        """
+        Raw records -> (ετικέτες κλάσεων, πιθανότητες).
+        """
+        proba = self.predict_proba(self.transform_records(records))
+        return self.labels_[proba.argmax(axis=1)], proba
+
+def load_edge_model(path, chunk_size=4096):
+    return EdgeModel.load(path, chunk_size=chunk_size)
+
+def is_edge_model(path):
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return False
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f).get("format") == EDGE_FORMAT
@@ -1,17 +1,15 @@
 # === encoder_utils.py ===
-# Αποθήκευση και φόρτωση των encoders (target + features)
+# Αποθήκευση και φόρτωση του preprocessing pipeline
 
 import joblib
 import os
 
-def save_encoders(feature_encoders, target_encoder, path='models/encoders'):
-    os.makedirs(path, exist_ok=True)
-    joblib.dump(feature_encoders, os.path.join(path, 'feature_encoders.pkl'))
-    joblib.dump(target_encoder, os.path.join(path, 'target_encoder.pkl'))
-    print(f"[Encoders] Αποθηκεύτηκαν στο {path}")
+def save_pipeline(pipeline, path='models/preprocessing_pipeline.pkl'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(pipeline, path)
+    print(f"[Pipeline] Αποθηκεύτηκε στο {path}")
 
-def load_encoders(path='models/encoders'):
-    feature_encoders = joblib.load(os.path.join(path, 'feature_encoders.pkl'))
-    target_encoder = joblib.load(os.path.join(path, 'target_encoder.pkl'))
-    print(f"[Encoders] Φορτώθηκαν από {path}")
-    return feature_encoders, target_encoder
+def load_pipeline(path='models/preprocessing_pipeline.pkl'):
+    pipeline = joblib.load(path)
+    print(f"[Pipeline] Φορτώθηκε από {path}")
+    return pipeline
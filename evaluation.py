@@ -0,0 +1,393 @@
+# === evaluation.py ===
+# Repeated stratified K-fold αξιολόγηση: folds παράλληλα, μία κλήση predict_proba ανά μοντέλο και fold,
+# όλες οι μετρικές από ένα vectorized πέρασμα (confusion matrix + πιθανότητες) και bootstrap
+# διαστήματα εμπιστοσύνης με πίνακα βαρών (bootstrap replicates x γραμμές) αντί για loop
+
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import rankdata
+from joblib import Parallel, delayed
+from sklearn.model_selection import RepeatedStratifiedKFold
+
+from metrics import METRICS
+
+RESULTS_DIR = "results"
+EPS = np.finfo(np.float64).eps  # όπως το log_loss του sklearn
+# Βαθμωτές μετρικές που συνοψίζονται ανά μοντέλο (mean/std στα folds, CI με bootstrap)
+SUMMARY_METRICS = ("accuracy", "balanced_accuracy", "macro_f1", "weighted_f1", "roc_auc_macro", "log_loss",
+                   "brier", "ece")
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/evaluation.log', level=logging.INFO):
+    logger = logging.getLogger('evaluation')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Μετρικές από confusion matrix (vectorized και πάνω σε bootstrap άξονα) ===
+def _scores_from_confusion(cm):
+    """
+    cm: (..., K, K) με γραμμές = πραγματική κλάση. Όλες οι μετρικές του classification report
+    (zero_division=0 όπως το sklearn), για οσοδήποτε leading άξονες.
+    """
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    total = support.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    share = support / total[..., None]
+    return {
+        "precision": precision, "recall": recall, "f1": f1, "support": support,
+        "accuracy": tp.sum(axis=-1) / total,
+        "balanced_accuracy": recall.mean(axis=-1),
+        "macro_precision": precision.mean(axis=-1), "macro_recall": recall.mean(axis=-1),
+        "macro_f1": f1.mean(axis=-1),
+        "weighted_precision": (precision * share).sum(axis=-1), "weighted_recall": (recall * share).sum(axis=-1),
+        "weighted_f1": (f1 * share).sum(axis=-1)
+    }
+
+def roc_auc_ovr(y_true, proba):
+    """
+    ROC AUC ανά κλάση (one-vs-rest) για όλες τις κλάσεις μαζί, μέσω Mann-Whitney U
+    (μέσες τάξεις για ισοβαθμίες). Ο μέσος όρος ισούται με roc_auc_score(multi_class='ovr').
+    """
+    n_classes = proba.shape[1]
+    ranks = rankdata(proba, axis=0)
+    positive = y_true[:, None] == np.arange(n_classes)
+    n_pos = positive.sum(axis=0)
+    n_neg = len(y_true) - n_pos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        auc = (np.where(positive, ranks, 0.0).sum(axis=0) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+    return np.where((n_pos > 0) & (n_neg > 0), auc, np.nan)
+
+def calibration_table(y_true, proba, n_bins=10):
+    """
+    Reliability ανά κλάση σε n_bins ίσου πλάτους: πλήθος, μέση πρόβλεψη και παρατηρούμενη συχνότητα.
+    Όλες οι κλάσεις με τρία bincount.
+    """
+    n_classes = proba.shape[1]
+    flat = (np.minimum((proba * n_bins).astype(np.int64), n_bins - 1) + np.arange(n_classes) * n_bins).ravel()
+    size = n_classes * n_bins
+    count = np.bincount(flat, minlength=size).reshape(n_classes, n_bins)
+    sum_proba = np.bincount(flat, weights=proba.ravel(), minlength=size).reshape(n_classes, n_bins)
+    sum_true = np.bincount(flat, weights=(y_true[:, None] == np.arange(n_classes)).ravel(),
+                           minlength=size).reshape(n_classes, n_bins)
+    return count, sum_proba, sum_true
+
+def compute_metrics(y_true, proba, label_names=None, n_bins=10):
+    """
+    Όλες οι μετρικές από ένα πέρασμα: confusion matrix με ένα bincount, report/accuracy/F1 από αυτόν,
+    ROC AUC ανά κλάση, log loss, Brier και calibration (ECE, reliability) από τον πίνακα πιθανοτήτων.
+    y_true: codes 0..K-1 (στήλες του proba).
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    n_rows, n_classes = proba.shape
+    label_names = list(label_names) if label_names is not None else [str(c) for c in range(n_classes)]
+    y_pred = proba.argmax(axis=1)
+
+    cm = np.bincount(y_true * n_classes + y_pred, minlength=n_classes ** 2).reshape(n_classes, n_classes)
+    scores = _scores_from_confusion(cm)
+    auc = roc_auc_ovr(y_true, proba)
+    p_true = proba[np.arange(n_rows), y_true]
+    count, sum_proba, sum_true = calibration_table(y_true, proba, n_bins)
+
+    # Top-label ECE: |ακρίβεια - confidence| ανά bin confidence, σταθμισμένο με το πλήθος
+    confidence = proba[np.arange(n_rows), y_pred]
+    conf_bin = np.minimum((confidence * n_bins).astype(np.int64), n_bins - 1)
+    gap = (np.bincount(conf_bin, weights=(y_pred == y_true), minlength=n_bins)
+           - np.bincount(conf_bin, weights=confidence, minlength=n_bins))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reliability = {
+            label: {"count": count[c].tolist(), "mean_predicted": (sum_proba[c] / count[c]).tolist(),
+                    "observed": (sum_true[c] / count[c]).tolist()}
+            for c, label in enumerate(label_names)
+        }
+    return {
+        "n": int(n_rows),
+        **{name: float(scores[name]) for name in ("accuracy", "balanced_accuracy", "macro_precision", "macro_recall",
+                                                   "macro_f1", "weighted_precision", "weighted_recall",
+                                                   "weighted_f1")},
+        "roc_auc_macro": float(np.nanmean(auc)),
+        "roc_auc_weighted": float(np.nansum(auc * scores["support"]) / n_rows),
+        "log_loss": float(-np.log(np.clip(p_true, EPS, 1.0)).mean()),
+        "brier": float(((proba - (y_true[:, None] == np.arange(n_classes))) ** 2).sum(axis=1).mean()),
+        "ece": float(np.abs(gap).sum() / n_rows),
+        "classwise_ece": float(np.abs(sum_true - sum_proba).sum() / (n_rows * n_classes)),
+        "per_class": {
+            label: {"precision": float(scores["precision"][c]), "recall": float(scores["recall"][c]),
+                    "f1": float(scores["f1"][c]), "support": int(scores["support"][c]), "roc_auc": float(auc[c])}
+            for c, label in enumerate(label_names)
+        },
+        "confusion_matrix": cm.tolist(),
+        "label_names": label_names,
+        "calibration": {"n_bins": n_bins, "classes": reliability}
+    }
+
+def classification_report_frame(result):
+    """
+    Το αποτέλεσμα του compute_metrics στη μορφή του sklearn classification_report(output_dict=True).
+    """
+    rows = {label: {"precision": v["precision"], "recall": v["recall"], "f1-score": v["f1"], "support": v["support"]}
+            for label, v in result["per_class"].items()}
+    rows["accuracy"] = dict.fromkeys(("precision", "recall", "f1-score", "support"), result["accuracy"])
+    for avg in ("macro", "weighted"):
+        rows[f"{avg} avg"] = {"precision": result[f"{avg}_precision"], "recall": result[f"{avg}_recall"],
+                              "f1-score": result[f"{avg}_f1"], "support": result["n"]}
+    return pd.DataFrame(rows).transpose()
+
+# === Bootstrap CIs ===
+def bootstrap_ci(y_true, proba, n_boot=1000, alpha=0.05, groups=None, n_bins=10, random_state=42, max_memory_mb=256):
+    """
+    Percentile CIs των SUMMARY_METRICS και του F1/ROC AUC ανά κλάση. Poisson bootstrap: κάθε replicate
+    είναι ένα διάνυσμα βαρών ανά γραμμή, οπότε confusion matrices, log loss/Brier και weighted AUC
+    όλων των replicates βγαίνουν με πολλαπλασιασμούς πινάκων (σε chunks replicates μέσα στο max_memory_mb).
+    groups: ομάδα κάθε γραμμής (π.χ. η αρχική γραμμή σε pooled repeats), που ξαναδειγματοληπτείται ολόκληρη.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    n_rows, n_classes = proba.shape
+    groups = np.arange(n_rows) if groups is None else np.asarray(groups)
+    n_groups = int(groups.max()) + 1
+    rng = np.random.default_rng(random_state)
+    y_pred = proba.argmax(axis=1)
+    rows = np.arange(n_rows)
+
+    # Σταθεροί (n_rows x ...) πίνακες: κελί confusion matrix, ανά-γραμμή loss και θέσεις για το AUC
+    cells = sparse.csr_matrix((np.ones(n_rows), (rows, y_true * n_classes + y_pred)), shape=(n_rows, n_classes ** 2))
+    confidence = proba[rows, y_pred]
+    conf_bin = np.minimum((confidence * n_bins).astype(np.int64), n_bins - 1)
+    per_row = np.column_stack([
+        -np.log(np.clip(proba[rows, y_true], EPS, 1.0)),
+        ((proba - (y_true[:, None] == np.arange(n_classes))) ** 2).sum(axis=1)
+    ])
+    ece_cells = sparse.csr_matrix((np.concatenate([(y_pred == y_true).astype(float), confidence]),
+                                   (np.concatenate([rows, rows]), np.concatenate([conf_bin, conf_bin + n_bins]))),
+                                  shape=(n_rows, 2 * n_bins))
+    auc_index = []
+    for c in range(n_classes):
+        # Ισοβαθμίες: ίδιο score -> ίδια στήλη. Θετικές και αρνητικές γραμμές σε ξεχωριστά blocks
+        _, tie = np.unique(proba[:, c], return_inverse=True)
+        n_ties = tie.max() + 1
+        positive = y_true == c
+        auc_index.append((n_ties, sparse.csr_matrix((np.ones(n_rows), (rows, tie + n_ties * ~positive)),
+                                                    shape=(n_rows, 2 * n_ties))))
+
+    chunk = max(1, int(max_memory_mb * 1024 ** 2 // (8 * max(n_rows, n_groups) * 2)))
+    samples = {name: [] for name in SUMMARY_METRICS}
+    samples.update({"f1": [], "roc_auc": []})
+    for start in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - start)
+        weights = rng.poisson(1.0, size=(size, n_groups)).astype(np.float64)[:, groups]
+        total = weights.sum(axis=1)
+
+        cm = np.asarray((cells.T @ weights.T).T).reshape(size, n_classes, n_classes)
+        scores = _scores_from_confusion(cm)
+        for name in ("accuracy", "balanced_accuracy", "macro_f1", "weighted_f1"):
+            samples[name].append(scores[name])
+        samples["f1"].append(scores["f1"])
+        losses = weights @ per_row
+        samples["log_loss"].append(losses[:, 0] / total)
+        samples["brier"].append(losses[:, 1] / total)
+        ece = np.asarray((ece_cells.T @ weights.T).T)
+        samples["ece"].append(np.abs(ece[:, :n_bins] - ece[:, n_bins:]).sum(axis=1) / total)
+
+        auc = np.empty((size, n_classes))
+        for c, (n_ties, index) in enumerate(auc_index):
+            counts = np.asarray((index.T @ weights.T).T)
+            pos, neg = counts[:, :n_ties], counts[:, n_ties:]
+            # P(score θετικής > score αρνητικής) + 0.5 P(ισοβαθμία)
+            below = np.cumsum(neg, axis=1) - neg
+            with np.errstate(divide='ignore', invalid='ignore'):
+                auc[:, c] = (pos * (below + 0.5 * neg)).sum(axis=1) / (pos.sum(axis=1) * neg.sum(axis=1))
+        samples["roc_auc"].append(auc)
+        samples["roc_auc_macro"].append(np.nanmean(auc, axis=1))
+
+    quantiles = (100 * alpha / 2, 100 * (1 - alpha / 2))
+    intervals = {}
+    for name, values in samples.items():
+        low, high = np.nanpercentile(np.concatenate(values), quantiles, axis=0)
+        intervals[name] = (low.tolist(), high.tolist()) if np.ndim(low) else (float(low), float(high))
+    return intervals
+
+# === Repeated stratified K-fold ===
+def _fold_task(repeat, fold, data, target, train_idx, val_idx, config, inner_cv, resample, smote_k):
+    from preprocessing import PreprocessingPipeline
+    from resampling import SMOTESampler
+    from modeling import OOFStackingClassifier
+    from training_config import build_estimators
+    from feature_store import FeatureStore, FEATURE_STORE_DIR
+
+    start = time.perf_counter()
+    pipeline = PreprocessingPipeline(target=target).fit(data.iloc[train_idx])
+    X_train = pipeline.transform_array(data.iloc[train_idx], dtype=np.float32)
+    y_train = pipeline.encode_target(data[target].iloc[train_idx]).to_numpy()
+    X_val = pd.DataFrame(pipeline.transform_array(data.iloc[val_idx], dtype=np.float32),
+                         columns=pipeline.feature_names_)
+    y_val = pipeline.encode_target(data[target].iloc[val_idx]).to_numpy()
+    if resample:
+        X_train, y_train = SMOTESampler(k_neighbors=smote_k, random_state=42).fit_resample(X_train, y_train)
+    X_train = pd.DataFrame(X_train, columns=pipeline.feature_names_, copy=False)
+
+    # Εσωτερικό OOF για το meta-model, χωρίς cache (κάθε fold έχει άλλα δεδομένα). Προσωρινό feature store
+    # ανά fold: τα εσωτερικά folds διαβάζουν από το memmap του και μοιράζονται τα bins του LightGBM
+    base_models, meta_model, _ = build_estimators(config)
+    os.makedirs(FEATURE_STORE_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='cv_', dir=FEATURE_STORE_DIR) as root:
+        store = FeatureStore.build(X_train, y_train, cv=inner_cv, root=root)
+        stack = OOFStackingClassifier(estimators=base_models, final_estimator=meta_model, cv=inner_cv, n_jobs=1,
+                                      cache_dir=None).fit(X_train, y_train, store=store)
+    # Ένα predict_proba ανά base μοντέλο, το stack από τις ίδιες πιθανότητες
+    probas = stack.base_predict_proba(X_val)
+    probas["stack"] = stack.predict_proba_from_base(probas)
+    return {"repeat": repeat, "fold": fold, "val_idx": val_idx, "y_val": y_val, "probas": probas,
+            "classes": list(pipeline.classes_), "seconds": time.perf_counter() - start}
+
+def cross_validate(data, target='Heart_Condition', n_splits=5, n_repeats=2, inner_cv=3, n_jobs=None,
+                   threads_per_fold=None, resample=True, smote_k=5, n_boot=1000, alpha=0.05, n_bins=10,
+                   config=None, output_dir=RESULTS_DIR, random_state=42, logger=None):
+    """
+    Repeated stratified K-fold εκτίμηση του stack και των base μοντέλων. Κάθε fold (preprocessing fit,
+    SMOTE, stacking με εσωτερικό OOF) τρέχει σε δικό του worker. Γράφει στο output_dir:
+    cv_metrics.json (ανά fold, pooled, CIs), cv_summary.csv και cv_calibration.csv.
+    """
+    from training_config import TrainingConfig, available_cpus
+
+    logger = logger or logging.getLogger('evaluation')
+    n_cpus = available_cpus()
+    n_jobs = max(1, min(n_jobs or n_cpus, n_splits * n_repeats))
+    threads_per_fold = threads_per_fold or max(1, n_cpus // n_jobs)
+    config = config or TrainingConfig.from_tuned(device='cpu', n_threads=threads_per_fold, stack_n_jobs=1)
+
+    labels = data[target].astype(str).to_numpy()
+    splitter = RepeatedStratifiedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=random_state)
+    splits = list(splitter.split(np.zeros(len(data)), labels))
+    logger.info("[CV] %d repeats x %d folds (%d γραμμές), %d workers x %d threads", n_repeats, n_splits, len(data),
+                n_jobs, threads_per_fold)
+
+    start = time.perf_counter()
+    folds = Parallel(n_jobs=n_jobs, backend='loky' if n_jobs > 1 else 'sequential')(
+        delayed(_fold_task)(i // n_splits, i % n_splits, data, target, train_idx, val_idx, config, inner_cv,
+                            resample, smote_k)
+        for i, (train_idx, val_idx) in enumerate(splits)
+    )
+    cv_seconds = time.perf_counter() - start
+    label_names = folds[0]["classes"]
+    models = list(folds[0]["probas"])
+
+    # === Μετρικές ανά fold και pooled OOF ανά repeat
+    per_fold = []
+    pooled = {name: np.zeros((n_repeats, len(data), len(label_names))) for name in models}
+    y_true = np.zeros(len(data), dtype=np.int64)
+    for result in folds:
+        METRICS.record(f"cv/repeat{result['repeat']}/fold{result['fold']}", result["seconds"])
+        y_true[result["val_idx"]] = result["y_val"]
+        for name, proba in result["probas"].items():
+            pooled[name][result["repeat"], result["val_idx"]] = proba
+            metrics = compute_metrics(result["y_val"], proba, label_names, n_bins)
+            per_fold.append({"model": name, "repeat": result["repeat"], "fold": result["fold"],
+                             "seconds": result["seconds"],
+                             **{metric: metrics[metric] for metric in SUMMARY_METRICS}})
+    fold_frame = pd.DataFrame(per_fold)
+
+    # Pooled: όλα τα repeats μαζί, με bootstrap ανά αρχική γραμμή (ομάδα = γραμμή του dataset)
+    groups = np.tile(np.arange(len(data)), n_repeats)
+    y_pooled = np.tile(y_true, n_repeats)
+    report, summary_rows, calibration_rows = {}, [], []
+    boot_start = time.perf_counter()
+    for name in models:
+        proba = pooled[name].reshape(-1, len(label_names))
+        overall = compute_metrics(y_pooled, proba, label_names, n_bins)
+        intervals = bootstrap_ci(y_pooled, proba, n_boot=n_boot, alpha=alpha, groups=groups, n_bins=n_bins,
+                                 random_state=random_state)
+        folds_of_model = fold_frame[fold_frame["model"] == name]
+        for metric in SUMMARY_METRICS:
+            summary_rows.append({"model": name, "metric": metric, "mean": folds_of_model[metric].mean(),
+                                 "std": folds_of_model[metric].std(ddof=1), "pooled": overall[metric],
+                                 "ci_low": intervals[metric][0], "ci_high": intervals[metric][1]})
+        for c, label in enumerate(label_names):
+            overall["per_class"][label]["f1_ci"] = [intervals["f1"][0][c], intervals["f1"][1][c]]
+            overall["per_class"][label]["roc_auc_ci"] = [intervals["roc_auc"][0][c], intervals["roc_auc"][1][c]]
+            cal = overall["calibration"]["classes"][label]
+            calibration_rows += [{"model": name, "class": label, "bin": b, "count": cal["count"][b],
+                                  "mean_predicted": cal["mean_predicted"][b], "observed": cal["observed"][b]}
+                                 for b in range(n_bins)]
+        overall["ci"] = {metric: intervals[metric] for metric in SUMMARY_METRICS}
+        report[name] = overall
+    boot_seconds = time.perf_counter() - boot_start
+
+    summary = pd.DataFrame(summary_rows)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "cv_metrics.json"), 'w', encoding='utf-8') as f:
+        json.dump({
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "config": {"n_splits": n_splits, "n_repeats": n_repeats, "inner_cv": inner_cv, "resample": resample,
+                       "n_boot": n_boot, "alpha": alpha, "bootstrap": "poisson, grouped by row", "n_rows": len(data),
+                       "n_jobs": n_jobs, "threads_per_fold": threads_per_fold},
+            "timings": {"cv_seconds": cv_seconds, "bootstrap_seconds": boot_seconds},
+            "folds": per_fold,
+            "pooled": report
+        }, f, indent=2, ensure_ascii=False, default=float)
+    summary.to_csv(os.path.join(output_dir, "cv_summary.csv"), index=False)
+    pd.DataFrame(calibration_rows).to_csv(os.path.join(output_dir, "cv_calibration.csv"), index=False)
+
+    for name in models:
+        row = summary[(summary["model"] == name) & (summary["metric"] == "roc_auc_macro")].iloc[0]
+        acc = summary[(summary["model"] == name) & (summary["metric"] == "accuracy")].iloc[0]
+        logger.info("[CV] %-5s accuracy %.4f ± %.4f [%.4f, %.4f]  ROC AUC %.4f ± %.4f [%.4f, %.4f]", name,
+                    acc["mean"], acc["std"], acc["ci_low"], acc["ci_high"],
+                    row["mean"], row["std"], row["ci_low"], row["ci_high"])
+    logger.info("[CV] folds σε %.1fs, bootstrap (%d replicates) σε %.2fs -> %s/cv_*.{json,csv}", cv_seconds,
+                n_boot, boot_seconds, output_dir)
+    return summary, report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Repeated stratified K-fold αξιολόγηση με bootstrap CIs")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--target', default='Heart_Condition')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=2)
+    parser.add_argument('--inner-cv', type=int, default=3, help="Folds του εσωτερικού OOF για το meta-model")
+    parser.add_argument('--jobs', type=int, default=None, help="Folds που τρέχουν παράλληλα")
+    parser.add_argument('--threads-per-fold', type=int, default=None)
+    parser.add_argument('--no-resample', action='store_true', help="Χωρίς SMOTE στα training folds")
+    parser.add_argument('--bootstrap', type=int, default=1000, help="Πλήθος bootstrap replicates")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    from data_loader import load_dataset
+    logger = configure_logging()
+    data, _ = load_dataset(file_path=args.data, target=args.target, gui_fallback=False)
+    cross_validate(data, target=args.target, n_splits=args.folds, n_repeats=args.repeats, inner_cv=args.inner_cv,
+                   n_jobs=args.jobs, threads_per_fold=args.threads_per_fold, resample=not args.no_resample,
+                   n_boot=args.bootstrap, alpha=args.alpha, output_dir=args.output_dir, logger=logger)
+
+if __name__ == "__main__":
+    main()
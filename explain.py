@@ -0,0 +1,320 @@
+# === explain.py ===
+# SHAP ερμηνεία: TreeExplainer (με δειγματοληπτικό background ή path-dependent), παράλληλα ανά μοντέλο,
+# αποθήκευση των SHAP τιμών ως .npy (memory-mapped) και αναπαραγωγή γραφημάτων χωρίς επανυπολογισμό.
+# LocalExplainer: top-k συνεισφορές για μεμονωμένες προβλέψεις σε χιλιοστά του δευτερολέπτου
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from metrics import METRICS
+
+SHAP_DIR = "results/shap"
+VALUES_DIR = os.path.join(SHAP_DIR, "values")
+DEFAULT_TOP_K = 5
+
+# === Δειγματοληψία ===
+def sample_background(X, n_samples=100, random_state=42):
+    """
+    Τυχαίο background set για τον interventional TreeExplainer.
+    """
+    if len(X) <= n_samples:
+        return X
+    idx = np.random.default_rng(random_state).choice(len(X), size=n_samples, replace=False)
+    return X.iloc[np.sort(idx)]
+
+def select_rows_stratified(X, y, max_rows=2000, random_state=42):
+    """
+    Επιλέγει έως max_rows γραμμές προς ερμηνεία, ισομερώς ανά κλάση.
+    """
+    y = np.asarray(y)
+    if max_rows is None or len(X) <= max_rows:
+        return np.arange(len(X))
+    rng = np.random.default_rng(random_state)
+    classes = np.unique(y)
+    per_class = max(1, max_rows // len(classes))
+    idx = [rng.choice(np.flatnonzero(y == c), size=min(per_class, int((y == c).sum())), replace=False) for c in classes]
+    return np.sort(np.concatenate(idx))
+
+# === Υπολογισμός SHAP ===
+def _as_class_tensor(values, n_rows, n_features):
+    # shap επιστρέφει λίστα ανά κλάση ή (rows, features, classes) ανάλογα με μοντέλο/έκδοση
+    if isinstance(values, list):
+        values = np.stack(values, axis=-1)
+    values = np.asarray(values)
+    if values.ndim == 2:
+        values = values.reshape(n_rows, n_features, 1)
+    return values.astype(np.float32)
+
+def _explain_model(name, estimator, background, X_explain, feature_perturbation):
+    import shap
+
+    start = time.perf_counter()
+    if feature_perturbation == 'interventional':
+        explainer = shap.TreeExplainer(estimator, data=background, feature_perturbation='interventional')
+    else:
+        # Path-dependent: χρησιμοποιεί τα cover statistics των δέντρων, χωρίς background
+        explainer = shap.TreeExplainer(estimator, feature_perturbation='tree_path_dependent')
+    values = _as_class_tensor(explainer.shap_values(X_explain, check_additivity=False), *X_explain.shape)
+    base_values = np.atleast_1d(np.asarray(explainer.expected_value, dtype=np.float32))
+    return name, values, base_values, time.perf_counter() - start
+
+def compute_shap_values(named_estimators, X_train, X_explain, models=('xgb', 'lgbm', 'rf'), n_background=100,
+                        feature_perturbation='interventional', n_jobs=1, values_dir=VALUES_DIR,
+                        label_names=None, random_state=42, logger=None):
+    """
+    Υπολογίζει SHAP (TreeExplainer) για κάθε μοντέλο παράλληλα και αποθηκεύει στο values_dir:
+    shap_<model>.npy (rows, features, classes), shap_<model>_base.npy, explained_X.npy και metadata.json.
+    feature_perturbation='interventional' (default) εξηγεί ως προς background n_background γραμμών από το
+    X_train. 'tree_path_dependent' είναι αρκετά ταχύτερο, αλλά αγνοεί το background και βασίζεται στα cover
+    statistics των δέντρων (άλλη σημασία τιμών). Το mode γράφεται στο metadata και στους τίτλους των γραφημάτων.
+    """
+    if feature_perturbation not in ('tree_path_dependent', 'interventional'):
+        raise ValueError("feature_perturbation πρέπει να είναι 'tree_path_dependent' ή 'interventional'.")
+    logger = logger or logging.getLogger('modeling')
+    os.makedirs(values_dir, exist_ok=True)
+    background = sample_background(X_train, n_background, random_state)
+
+    results = Parallel(n_jobs=min(n_jobs, len(models)), backend='loky' if n_jobs > 1 else 'sequential')(
+        delayed(_explain_model)(name, named_estimators[name], background, X_explain, feature_perturbation)
+        for name in models
+    )
+
+    np.save(os.path.join(values_dir, "explained_X.npy"), X_explain.to_numpy(dtype=np.float32))
+    timings = {}
+    for name, values, base_values, seconds in results:
+        np.save(os.path.join(values_dir, f"shap_{name}.npy"), values)
+        np.save(os.path.join(values_dir, f"shap_{name}_base.npy"), base_values)
+        timings[name] = seconds
+        METRICS.record(f"shap/{name}", seconds, rows=len(X_explain))
+        logger.info("[SHAP] %s: %d γραμμές σε %.2fs (%.2f s / 1k γραμμές)", name, len(X_explain), seconds,
+                    1000 * seconds / max(len(X_explain), 1))
+
+    metadata = {
+        "models": list(models),
+        "feature_names": list(X_explain.columns),
+        "label_names": list(label_names) if label_names is not None else None,
+        "n_rows": len(X_explain),
+        "feature_perturbation": feature_perturbation,
+        "n_background": len(background) if feature_perturbation == 'interventional' else 0,
+        "seconds": timings,
+        "seconds_per_1k_rows": {name: 1000 * s / max(len(X_explain), 1) for name, s in timings.items()}
+    }
+    with open(os.path.join(values_dir, "metadata.json"), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    return metadata
+
+def load_shap_values(model='xgb', values_dir=VALUES_DIR):
+    """
+    Φορτώνει (memory-mapped) τις αποθηκευμένες SHAP τιμές ενός μοντέλου.
+    """
+    with open(os.path.join(values_dir, "metadata.json"), encoding='utf-8') as f:
+        metadata = json.load(f)
+    values = np.load(os.path.join(values_dir, f"shap_{model}.npy"), mmap_mode='r')
+    base_values = np.load(os.path.join(values_dir, f"shap_{model}_base.npy"))
+    data = np.load(os.path.join(values_dir, "explained_X.npy"), mmap_mode='r')
+    return values, base_values, data, metadata
+
+# === Γραφήματα & σύνοψη από αποθηκευμένες τιμές ===
+def _render_plot(kind, class_idx, label, model, values_dir, out_dir, shap_max):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import shap
+
+    start = time.perf_counter()
+    values, base_values, data, metadata = load_shap_values(model, values_dir)
+    explanation = shap.Explanation(
+        values=np.asarray(values[:, :, class_idx]),
+        base_values=np.full(len(data), base_values[min(class_idx, len(base_values) - 1)]),
+        data=np.asarray(data),
+        feature_names=metadata["feature_names"]
+    )
+
+    plt.figure()
+    if kind == 'beeswarm':
+        shap.plots.beeswarm(explanation, max_display=shap_max, show=False)
+        plt.title(f'SHAP Beeswarm - Κλάση: {label} ({metadata["feature_perturbation"]})')
+    else:
+        shap.plots.bar(explanation, max_display=shap_max, show=False)
+        plt.title(f'SHAP Feature Importance - Κλάση: {label} ({metadata["feature_perturbation"]})')
+    plt.tight_layout()
+    suffix = "" if model == 'xgb' else f"_{model}"
+    path = os.path.join(out_dir, f"shap_{kind}_{label}{suffix}.png")
+    plt.savefig(path)
+    plt.close()
+    return path, time.perf_counter() - start
+
+def shap_summary(model='xgb', values_dir=VALUES_DIR, shap_max=15, label_names=None):
+    values, _, _, metadata = load_shap_values(model, values_dir)
+    label_names = label_names or metadata["label_names"]
+    # mean |SHAP| για όλες τις κλάσεις σε ένα πέρασμα
+    mean_abs = np.abs(values).mean(axis=0)
+    summary_data = []
+    for i, name in enumerate(label_names):
+        summary_data.append(pd.DataFrame({
+            'Feature': metadata["feature_names"],
+            'MeanAbsSHAP': mean_abs[:, i],
+            'Class': name
+        }).sort_values(by='MeanAbsSHAP', ascending=False).head(shap_max))
+    return pd.concat(summary_data, axis=0)
+
+def render_shap_outputs(model='xgb', values_dir=VALUES_DIR, out_dir=SHAP_DIR, shap_max=15, label_names=None,
+                        n_jobs=1, logger=None):
+    """
+    Beeswarm/bar ανά κλάση + shap_top_features_summary.csv από τις αποθηκευμένες τιμές (χωρίς επανυπολογισμό).
+    """
+    logger = logger or logging.getLogger('modeling')
+    os.makedirs(out_dir, exist_ok=True)
+    metadata = load_shap_values(model, values_dir)[3]
+    label_names = label_names or metadata["label_names"]
+
+    rendered = Parallel(n_jobs=n_jobs, backend='loky' if n_jobs > 1 else 'sequential')(
+        delayed(_render_plot)(kind, i, label, model, values_dir, out_dir, shap_max)
+        for i, label in enumerate(label_names) for kind in ('beeswarm', 'bar')
+    )
+    paths = []
+    for path, seconds in rendered:
+        METRICS.record(f"plot/{os.path.basename(path)}", seconds)
+        logger.info(f"Αποθηκεύτηκε: {path}")
+        paths.append(path)
+
+    suffix = "" if model == 'xgb' else f"_{model}"
+    summary_path = os.path.join(out_dir, f"shap_top_features_summary{suffix}.csv")
+    shap_summary(model, values_dir, shap_max, label_names).to_csv(summary_path, index=False)
+    logger.info(f"Αποθηκεύτηκε {os.path.basename(summary_path)}")
+    return paths + [summary_path]
+
+# === Ερμηνεία μεμονωμένων προβλέψεων ===
+def base_booster(model, name='xgb'):
+    """
+    Ο xgboost Booster ενός base μοντέλου από artifact, pickle (OOFStackingClassifier) ή FusedStackPredictor.
+    """
+    if hasattr(model, 'manifest'):
+        estimator = model.base_estimator(name)
+        return estimator.booster if hasattr(estimator, 'booster') else estimator.estimator.get_booster()
+    if hasattr(model, 'named_estimators_'):
+        return model.named_estimators_[name].get_booster()
+    if hasattr(model, 'model'):
+        return base_booster(model.model, name)
+    raise ValueError(f"Δεν βρέθηκε base μοντέλο '{name}' στο {type(model).__name__}")
+
+class LocalExplainer:
+    """
+    SHAP ανά πρόβλεψη για το xgb base μοντέλο: το ακριβές path-dependent TreeSHAP του xgboost
+    (pred_contribs, ίδιες τιμές με shap.TreeExplainer) πάνω σε booster που μένει φορτωμένος, οπότε
+    δεν χτίζεται explainer ανά request. Οι συνεισφορές είναι στο margin (log-odds) του xgb ανά κλάση.
+    LRU cache με κλειδί την κωδικοποιημένη γραμμή (float32 bytes): επαναλαμβανόμενες γραμμές δεν
+    ξαναϋπολογίζονται. Thread-safe (Streamlit/serving).
+    """
+
+    def __init__(self, model, pipeline, cache_size=4096, n_threads=1):
+        # Αντίγραφο, ώστε το nthread της ερμηνείας να μην αλλάζει τις προβλέψεις του μοντέλου
+        self.booster = base_booster(model, 'xgb').copy()
+        if n_threads:
+            self.booster.set_param({"nthread": n_threads})
+        self.pipeline = pipeline
+        self.feature_names = list(self.booster.feature_names or pipeline.feature_names_)
+        self.classes_ = np.asarray(model.classes_)
+        self.labels = pipeline.decode_target(self.classes_)
+        self.n_outputs = len(self.classes_) if len(self.classes_) > 2 else 1
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _compute(self, X):
+        import xgboost as xgb
+        dmatrix = xgb.DMatrix(X, feature_names=self.feature_names, missing=np.nan)
+        values = self.booster.predict(dmatrix, pred_contribs=True)
+        return values.reshape(len(X), self.n_outputs, len(self.feature_names) + 1).astype(np.float32)
+
+    def contributions(self, X):
+        """
+        SHAP τιμές (rows, classes, features + 1) για κωδικοποιημένες γραμμές. Η τελευταία στήλη είναι
+        το bias (expected value), οπότε το άθροισμα ανά κλάση δίνει το margin του xgb.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        keys = [row.tobytes() for row in X]
+        out = np.empty((len(X), self.n_outputs, len(self.feature_names) + 1), dtype=np.float32)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                values = self._cache.get(key)
+                if values is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    out[i] = values
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            # Όλες οι γραμμές που λείπουν σε μία κλήση του booster
+            computed = self._compute(X[missing])
+            out[missing] = computed
+            with self._lock:
+                for i, values in zip(missing, computed):
+                    self._cache[keys[i]] = values.copy()
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    def explain(self, batch, top_k=DEFAULT_TOP_K, class_idx=None, X=None):
+        """
+        Top-k χαρακτηριστικά (κατά |SHAP|) ανά γραμμή του batch (raw δεδομένα) για την κλάση class_idx
+        (θέση στο classes_, π.χ. η πρόβλεψη του stacking). Χωρίς class_idx: η κλάση με το μέγιστο margin
+        του xgb. X: ήδη κωδικοποιημένο batch, αν υπάρχει. Επιστρέφει DataFrame σε long μορφή
+        (Row, Class, Rank, Feature, Value, SHAP, BaseValue).
+        """
+        if X is None:
+            X = self.pipeline.transform(batch)
+        values = self.contributions(X)
+        n_rows, n_features = len(values), len(self.feature_names)
+        if class_idx is None:
+            class_idx = values.sum(axis=2).argmax(axis=1)
+        class_idx = np.asarray(class_idx) if self.n_outputs > 1 else np.zeros(n_rows, dtype=int)
+        selected = values[np.arange(n_rows), class_idx]
+        top_k = min(top_k, n_features)
+        order = np.argsort(-np.abs(selected[:, :-1]), axis=1, kind='stable')[:, :top_k]
+        rows = np.repeat(np.arange(n_rows), top_k)
+        features = order.ravel()
+        raw = batch.reindex(columns=self.feature_names).to_numpy(dtype=object)
+        labels = self.labels[class_idx] if self.n_outputs > 1 else np.repeat(self.labels[-1], n_rows)
+        return pd.DataFrame({
+            "Row": np.asarray(batch.index)[rows],
+            "Class": labels[rows],
+            "Rank": np.tile(np.arange(1, top_k + 1), n_rows),
+            "Feature": np.asarray(self.feature_names, dtype=object)[features],
+            "Value": raw[rows, features],
+            "SHAP": selected[rows, features],
+            "BaseValue": selected[rows, -1]
+        })
+
+    def cache_info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "max_size": self.cache_size}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Αναπαραγωγή SHAP γραφημάτων από αποθηκευμένες τιμές")
+    parser.add_argument('--model', default='xgb')
+    parser.add_argument('--values-dir', default=VALUES_DIR)
+    parser.add_argument('--out-dir', default=SHAP_DIR)
+    parser.add_argument('--shap-max', type=int, default=15)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] %(message)s')
+    render_shap_outputs(args.model, args.values_dir, args.out_dir, args.shap_max, n_jobs=args.jobs,
+                        logger=logging.getLogger('explain'))
+
+if __name__ == "__main__":
+    main()
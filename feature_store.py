@@ -0,0 +1,245 @@
+# === feature_store.py ===
+# Κοινός πίνακας χαρακτηριστικών για training, CV και SHAP: X (float32, C-contiguous), y και fold ids
+# γράφονται μία φορά ως .npy και ανοίγουν memory-mapped σε κάθε worker. Το LightGBM Dataset (bins) του
+# πλήρους X_train αποθηκεύεται ως .bin και τα folds είναι subsets του που μοιράζονται τα ίδια bins
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold
+
+FEATURE_STORE_DIR = "data/.cache/feature_store"
+# Stores που κρατούνται στο root (τα πιο πρόσφατα), όπως στο ArtifactStore
+STORE_KEEP = 3
+# Παράμετροι που καθορίζουν τα bins του LightGBM Dataset (και το feature_pre_filter μέσω min_data_in_leaf)
+_LGBM_BIN_PARAMS = ('max_bin', 'min_data_in_bin', 'bin_construct_sample_cnt', 'subsample_for_bin', 'min_child_samples',
+                    'min_data_in_leaf', 'use_missing', 'zero_as_missing', 'feature_pre_filter', 'random_state')
+# Παράμετροι του sklearn wrapper που δεν είναι παράμετροι του lgb.train
+_LGBM_WRAPPER_ONLY = {'n_estimators', 'class_weight', 'importance_type', 'silent', 'objective'}
+
+def _values(X):
+    return X.to_numpy() if hasattr(X, 'to_numpy') else np.asarray(X)
+
+def _hash_arrays(*arrays):
+    digest = hashlib.sha256()
+    for values in arrays:
+        if values is None:
+            digest.update(b'none')
+            continue
+        digest.update(str((values.shape, values.dtype.str)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest
+
+# === Store ===
+class FeatureStore:
+    """
+    Φάκελος <root>/<key> με X_train.npy, y_train.npy, fold.npy (StratifiedKFold χωρίς shuffle, όπως το
+    OOFStackingClassifier), προαιρετικά X_test.npy/y_test.npy και manifest.json. Τα arrays ανοίγουν
+    lazily ως read-only memmaps και το pickle κρατά μόνο το path, οπότε οι workers δεν παίρνουν αντίγραφα.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.key = self.manifest["key"]
+        self.cv = self.manifest["cv"]
+        self.feature_names = self.manifest["feature_names"]
+        self._arrays = {}
+
+    @classmethod
+    def build(cls, X_train, y_train, X_test=None, y_test=None, cv=5, feature_names=None, root=FEATURE_STORE_DIR,
+              keep=STORE_KEEP, logger=None):
+        """
+        Γράφει το store (ή επαναχρησιμοποιεί υπάρχον με το ίδιο content key) και κρατά στο root
+        μόνο τα keep πιο πρόσφατα stores.
+        """
+        logger = logger or logging.getLogger('modeling')
+        feature_names = list(feature_names if feature_names is not None else X_train.columns)
+        X = np.ascontiguousarray(_values(X_train), dtype=np.float32)
+        y = np.asarray(y_train)
+        X_te = None if X_test is None else np.ascontiguousarray(_values(X_test), dtype=np.float32)
+        y_te = None if y_test is None else np.asarray(y_test)
+
+        digest = _hash_arrays(X, y, X_te, y_te)
+        digest.update(json.dumps({"cv": cv, "features": feature_names}).encode('utf-8'))
+        key = digest.hexdigest()[:16]
+        path = os.path.join(root, key)
+        if os.path.isfile(os.path.join(path, "manifest.json")):
+            logger.info("[feature store] Επαναχρησιμοποίηση %s", path)
+            os.utime(path)
+            prune_stores(root, keep)
+            return cls(path)
+
+        fold = np.empty(len(y), dtype=np.int8)
+        for k, (_, val_idx) in enumerate(StratifiedKFold(n_splits=cv).split(np.zeros(len(y)), y)):
+            fold[val_idx] = k
+
+        # Εγγραφή σε προσωρινό φάκελο και rename, ώστε ένα μισογραμμένο store να μη διαβαστεί ποτέ
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key}_", dir=root)
+        arrays = {"X_train": X, "y_train": y, "fold": fold, "X_test": X_te, "y_test": y_te}
+        for name, values in arrays.items():
+            if values is not None:
+                np.save(os.path.join(tmp, f"{name}.npy"), values)
+        manifest = {"key": key, "cv": cv, "feature_names": feature_names, "n_train": len(y),
+                    "n_classes": int(len(np.unique(y))),
+                    "n_test": None if X_te is None else len(X_te),
+                    "nbytes": {name: int(v.nbytes) for name, v in arrays.items() if v is not None}}
+        with open(os.path.join(tmp, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Άλλο process έγραψε το ίδιο store στο μεταξύ
+            shutil.rmtree(tmp, ignore_errors=True)
+        logger.info("[feature store] %s: %d x %d float32 (%.1f MB)", path, X.shape[0], X.shape[1], X.nbytes / 1024 ** 2)
+        prune_stores(root, keep)
+        return cls(path)
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def array(self, name):
+        if name not in self._arrays:
+            file_path = os.path.join(self.path, f"{name}.npy")
+            self._arrays[name] = np.load(file_path, mmap_mode='r') if os.path.isfile(file_path) else None
+        return self._arrays[name]
+
+    @property
+    def X_train(self):
+        return self.array("X_train")
+
+    @property
+    def y_train(self):
+        return self.array("y_train")
+
+    @property
+    def X_test(self):
+        return self.array("X_test")
+
+    def frame(self, which='train'):
+        """
+        DataFrame πάνω στο memmap (χωρίς αντίγραφο), π.χ. για SHAP.
+        """
+        return pd.DataFrame(self.array(f"X_{which}"), columns=self.feature_names, copy=False)
+
+    def fold_indices(self, k):
+        fold = self.array("fold")
+        return np.flatnonzero(fold != k), np.flatnonzero(fold == k)
+
+    # === Κοινά δεδομένα των boosters ===
+    def lgbm_dataset(self, estimator, fold=None):
+        """
+        LightGBM Dataset του πλήρους X_train (fold=None) ή subset των γραμμών εκπαίδευσης ενός fold. Τα bins
+        χτίζονται μία φορά από όλες τις γραμμές του X_train (χωρίς labels) και αποθηκεύονται ως .bin ανά σύνολο
+        bin παραμέτρων, οπότε τα folds, το τελικό fit και επόμενα fits (άλλες υπερπαράμετροι) δεν ξανακάνουν binning.
+        """
+        import lightgbm as lgb
+        params = lgbm_train_params(estimator)
+        bin_params = {k: params[k] for k in _LGBM_BIN_PARAMS if k in params}
+        tag = hashlib.sha256(json.dumps(bin_params, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+        binary_path = os.path.join(self.path, f"lgbm_{tag}.bin")
+        dataset_params = dict(bin_params, verbose=-1)
+        if os.path.isfile(binary_path):
+            dataset = lgb.Dataset(binary_path, params=dataset_params).construct()
+        else:
+            dataset = lgb.Dataset(self.X_train, label=self.y_train, feature_name=self.feature_names,
+                                  params=dataset_params, free_raw_data=True).construct()
+            tmp = f"{binary_path}.{os.getpid()}.tmp"
+            dataset.save_binary(tmp)
+            os.replace(tmp, binary_path)
+        if fold is None:
+            return dataset
+        return dataset.subset(self.fold_indices(fold)[0]).construct()
+
+def prune_stores(root=FEATURE_STORE_DIR, keep=STORE_KEEP):
+    """
+    Αφαιρεί τα παλαιότερα stores του root. Μόνο φάκελοι με manifest.json: οι προσωρινοί (.<key>_*) και
+    τα stores των folds του CV (cv_*/) δεν αγγίζονται.
+    """
+    entries = [os.path.join(root, d) for d in os.listdir(root)
+               if not d.startswith('.') and os.path.isfile(os.path.join(root, d, "manifest.json"))]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+# === Εκπαίδευση πάνω στο store ===
+def lgbm_train_params(estimator, n_classes=None):
+    params = {k: v for k, v in estimator.get_params().items() if k not in _LGBM_WRAPPER_ONLY and v is not None}
+    if n_classes:
+        params.update(objective='multiclass', num_class=n_classes)
+    return params
+
+def xgb_train_params(estimator, n_classes):
+    params = estimator.get_xgb_params()
+    params.update(objective='multi:softprob', num_class=n_classes)
+    return params
+
+def wrap_booster(estimator, booster, classes):
+    """
+    sklearn wrapper γύρω από booster που εκπαιδεύτηκε απευθείας (multiclass objective, όπως τα *_train_params),
+    με τα fitted attributes που θα έθετε το fit, ώστε pickle/artifact/SHAP να τον χειρίζονται όπως πάντα.
+    Τα feature names έρχονται από τον booster.
+    """
+    wrapper = clone(estimator)
+    classes = np.asarray(classes)
+    wrapper._Booster = booster
+    if hasattr(booster, 'num_boosted_rounds'):
+        wrapper.classes_ = classes
+        wrapper.n_classes_ = len(classes)
+        wrapper.objective = 'multi:softprob'
+        wrapper.n_estimators = booster.num_boosted_rounds()
+        return wrapper
+    from lightgbm.sklearn import _LGBMLabelEncoder
+    wrapper._le = _LGBMLabelEncoder().fit(classes)
+    wrapper._class_map = dict(zip(wrapper._le.classes_, wrapper._le.transform(wrapper._le.classes_)))
+    wrapper._classes = wrapper._le.classes_
+    wrapper._n_classes = len(classes)
+    wrapper._objective = 'multiclass'
+    wrapper._n_features = wrapper._n_features_in = booster.num_feature()
+    wrapper._best_iteration = None
+    wrapper._best_score = booster.best_score
+    wrapper._evals_result = None
+    wrapper.fitted_ = True
+    wrapper.n_estimators = booster.current_iteration()
+    return wrapper
+
+def fit_from_store(name, estimator, store, fold=None):
+    """
+    Fit ενός base μοντέλου σε όλο το X_train του store (fold=None) ή στις γραμμές εκπαίδευσης ενός fold.
+    xgb: DMatrix από τις float32 γραμμές, lgbm: subset του κοινού Dataset (store.lgbm_dataset),
+    άλλα μοντέλα: fit στις γραμμές του memmap.
+    """
+    X, y = store.X_train, store.y_train
+    train_idx = None if fold is None else store.fold_indices(fold)[0]
+    n_classes = store.manifest["n_classes"]
+    classes = np.arange(n_classes)
+    if name == 'xgb':
+        # Το xgboost 1.6 δεν έχει QuantileDMatrix για CPU (ούτε κοινό sketch μεταξύ DMatrix): τα bins χτίζονται
+        # ανά fold, αλλά από float32 γραμμές του memmap (χωρίς DataFrame και μετατροπή τύπων)
+        import xgboost as xgb
+        dtrain = xgb.DMatrix(X if train_idx is None else X[train_idx], label=y if train_idx is None else y[train_idx],
+                             missing=np.nan, feature_names=store.feature_names,
+                             nthread=estimator.get_params().get('n_jobs') or -1)
+        booster = xgb.train(xgb_train_params(estimator, n_classes), dtrain, num_boost_round=estimator.n_estimators)
+        return wrap_booster(estimator, booster, classes)
+    if name == 'lgbm':
+        import lightgbm as lgb
+        dtrain = store.lgbm_dataset(estimator, fold)
+        booster = lgb.train(lgbm_train_params(estimator, n_classes), dtrain, num_boost_round=estimator.n_estimators)
+        return wrap_booster(estimator, booster, classes)
+    est = clone(estimator)
+    if train_idx is None:
+        return est.fit(store.frame('train'), np.asarray(y))
+    return est.fit(pd.DataFrame(X[train_idx], columns=store.feature_names, copy=False), y[train_idx])
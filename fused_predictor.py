@@ -0,0 +1,385 @@
+# === fused_predictor.py ===
+# Ενιαία μηχανή πρόβλεψης για το stacking: τα δέντρα των XGBoost/LightGBM/RandomForest μεταγλωττίζονται
+# σε κοινούς πίνακες κόμβων και αξιολογούνται μαζί σε ένα πέρασμα (numba αν υπάρχει, αλλιώς numpy),
+# μαζί με το γραμμικό meta-model + softmax
+
+import json
+import logging
+
+import numpy as np
+
+from model_artifact import StackedModelArtifact, forest_arrays, linear_predict_proba, uses_softmax
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# LightGBM: |x| <= kZeroThreshold θεωρείται μηδέν
+_LGBM_ZERO = 1e-35
+
+# === Πυρήνας διάσχισης ===
+# Έξοδος: out[γραμμή, δέντρο] = φύλλο. Οι κόμβοι για το numba είναι πακεταρισμένοι ανά γραμμή
+# (left, right, feature, default_left, zero_missing) ώστε κάθε βήμα να διαβάζει μία cache line.
+if njit is not None:
+    @njit(parallel=True, cache=True, nogil=True)
+    def _leaves_numba(X, nodes, threshold, roots, out):
+        for i in prange(X.shape[0]):
+            for t in range(roots.shape[0]):
+                node = roots[t]
+                while nodes[node, 0] != -1:
+                    x = X[i, nodes[node, 2]]
+                    if nodes[node, 4] and abs(x) <= _LGBM_ZERO:
+                        node = nodes[node, 0] if nodes[node, 3] else nodes[node, 1]
+                    elif x <= threshold[node]:
+                        node = nodes[node, 0]
+                    elif x > threshold[node]:
+                        node = nodes[node, 1]
+                    else:
+                        # NaN: κατεύθυνση missing του κόμβου
+                        node = nodes[node, 0] if nodes[node, 3] else nodes[node, 1]
+                out[i, t] = node
+
+def _leaves_numpy(X, feature, threshold, left, right, default_left, zero_missing, roots, out):
+    """
+    Όλα τα (γραμμή, δέντρο) προχωρούν μαζί ένα επίπεδο τη φορά, μόνο όσα δεν έφτασαν σε φύλλο.
+    """
+    n_rows, width = X.shape
+    X_flat = X.ravel()
+    node = np.tile(roots, n_rows)
+    offset = np.repeat(np.arange(n_rows, dtype=np.int64) * width, len(roots))
+    check_missing = np.isnan(X_flat).any() or zero_missing.any()
+    active = np.flatnonzero(left[node] != -1)
+    while active.size:
+        current = node[active]
+        x = X_flat.take(offset[active] + feature[current])
+        go_left = x <= threshold[current]
+        if check_missing:
+            missing = np.isnan(x) | (zero_missing[current] & (np.abs(x) <= _LGBM_ZERO))
+            go_left = np.where(missing, default_left[current], go_left)
+        nxt = np.where(go_left, left[current], right[current])
+        node[active] = nxt
+        active = active[left[nxt] != -1]
+    out[:] = node.reshape(n_rows, len(roots))
+
+# === Μεταγλώττιση δέντρων ===
+# Κάθε δέντρο: dict με feature, threshold, left, right (τοπικοί δείκτες, -1 για φύλλα),
+# default_left, zero_missing και leaf (τιμή φύλλου ή πίνακας πιθανοτήτων για RF).
+# Η είσοδος της μηχανής έχει 2F στήλες: [X σε float64 | X στρογγυλεμένο σε float32]. Τα XGBoost/sklearn
+# συγκρίνουν σε float32, οπότε οι κόμβοι τους δείχνουν στο δεύτερο μισό (feature + F).
+
+def _compile_xgboost(booster, n_features):
+    model = json.loads(booster.save_raw('json'))
+    learner = model["learner"]
+    objective = learner["objective"]["name"]
+    base_score = float(learner["learner_model_param"]["base_score"])
+    gbtree = learner["gradient_booster"]["model"]
+    if int(gbtree["gbtree_model_param"]["num_parallel_tree"]) != 1:
+        raise ValueError("Δεν υποστηρίζεται num_parallel_tree > 1.")
+
+    n_outputs = int(learner["learner_model_param"]["num_class"]) or 1
+    best_iteration = booster.attr('best_iteration')
+    n_trees = len(gbtree["trees"]) if best_iteration is None else (int(best_iteration) + 1) * n_outputs
+
+    trees = []
+    for tree, output in zip(gbtree["trees"][:n_trees], gbtree["tree_info"][:n_trees]):
+        if any(tree["split_type"]):
+            raise ValueError("Δεν υποστηρίζονται categorical splits του XGBoost.")
+        left = np.asarray(tree["left_children"], dtype=np.int32)
+        split = np.asarray(tree["split_conditions"], dtype=np.float32)
+        is_leaf = left == -1
+        # x < s (float32) <=> x <= το αμέσως μικρότερο float32 του s
+        threshold = np.nextafter(split, np.float32(-np.inf)).astype(np.float64)
+        trees.append({
+            "feature": np.where(is_leaf, 0, np.asarray(tree["split_indices"]) + n_features).astype(np.int32),
+            "threshold": threshold, "left": left,
+            "right": np.asarray(tree["right_children"], dtype=np.int32),
+            "default_left": np.asarray(tree["default_left"], dtype=bool),
+            "zero_missing": np.zeros(len(left), dtype=bool),
+            "leaf": np.where(is_leaf, split, 0.0).astype(np.float64),
+            "output": int(output)
+        })
+
+    if objective in ('multi:softprob', 'multi:softmax'):
+        transform, base_margin = 'softmax', base_score
+    elif objective == 'binary:logistic':
+        transform, base_margin = 'sigmoid', float(np.log(base_score / (1.0 - base_score)))
+    else:
+        raise ValueError(f"Μη υποστηριζόμενο XGBoost objective: {objective}")
+    return trees, {"kind": "boosted", "n_outputs": n_outputs, "transform": transform, "base_margin": base_margin}
+
+def _parse_lightgbm(model_string):
+    header, trees, current = {}, [], None
+    for line in model_string.splitlines():
+        if line.startswith('Tree='):
+            current = {}
+            trees.append(current)
+        elif line.startswith('end of trees'):
+            break
+        elif '=' in line:
+            key, value = line.split('=', 1)
+            (current if current is not None else header)[key] = value
+    return header, trees
+
+def _lightgbm_trees(raw_trees, n_outputs):
+    trees = []
+    for i, raw in enumerate(raw_trees):
+        n_leaves = int(raw["num_leaves"])
+        leaf_values = np.asarray(raw["leaf_value"].split(), dtype=np.float64)
+        n_internal = n_leaves - 1
+        # Κόμβοι: πρώτα οι εσωτερικοί (0..n_internal-1), μετά τα φύλλα (n_internal + leaf)
+        feature = np.zeros(n_internal + n_leaves, dtype=np.int32)
+        threshold = np.zeros(n_internal + n_leaves)
+        left = np.full(n_internal + n_leaves, -1, dtype=np.int32)
+        right = np.full(n_internal + n_leaves, -1, dtype=np.int32)
+        default_left = np.zeros(n_internal + n_leaves, dtype=bool)
+        zero_missing = np.zeros(n_internal + n_leaves, dtype=bool)
+        leaf = np.zeros(n_internal + n_leaves)
+        leaf[n_internal:] = leaf_values
+
+        if n_internal:
+            decision = np.asarray(raw["decision_type"].split(), dtype=np.int32)
+            if (decision & 1).any():
+                raise ValueError("Δεν υποστηρίζονται categorical splits του LightGBM.")
+            missing_type = (decision >> 2) & 3
+            children = [np.asarray(raw[k].split(), dtype=np.int32) for k in ('left_child', 'right_child')]
+            # Αρνητικός δείκτης παιδιού = φύλλο ~child
+            left[:n_internal], right[:n_internal] = [np.where(c < 0, n_internal + ~c, c) for c in children]
+            feature[:n_internal] = np.asarray(raw["split_feature"].split(), dtype=np.int32)
+            threshold[:n_internal] = np.asarray(raw["threshold"].split(), dtype=np.float64)
+            default_left[:n_internal] = (decision & 2).astype(bool)
+            zero_missing[:n_internal] = missing_type == 1
+            # missing_type None: το NaN μετατρέπεται σε 0 πριν τη σύγκριση
+            none_type = missing_type == 0
+            default_left[:n_internal][none_type] = 0.0 <= threshold[:n_internal][none_type]
+
+        trees.append({"feature": feature, "threshold": threshold, "left": left, "right": right,
+                      "default_left": default_left, "zero_missing": zero_missing, "leaf": leaf,
+                      "output": i % n_outputs})
+    return trees
+
+def _compile_lightgbm(model_string):
+    header, raw_trees = _parse_lightgbm(model_string)
+    objective = header["objective"].split()
+    n_outputs = int(header.get("num_tree_per_iteration", 1))
+    trees = _lightgbm_trees(raw_trees, n_outputs)
+
+    if objective[0] in ('multiclass', 'softmax'):
+        transform = 'softmax'
+    elif objective[0] == 'binary':
+        sigmoid = [float(o.split(':')[1]) for o in objective[1:] if o.startswith('sigmoid:')]
+        if sigmoid and sigmoid[0] != 1.0:
+            raise ValueError("Δεν υποστηρίζεται binary objective με sigmoid != 1.")
+        transform = 'sigmoid'
+    else:
+        raise ValueError(f"Μη υποστηριζόμενο LightGBM objective: {header['objective']}")
+    return trees, {"kind": "boosted", "n_outputs": n_outputs, "transform": transform, "base_margin": 0.0}
+
+def _compile_forest(arrays, n_features):
+    roots = np.asarray(arrays["roots"])
+    bounds = list(roots) + [len(arrays["feature"])]
+    trees = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        left = np.asarray(arrays["left"][start:end])
+        is_leaf = left == -1
+        trees.append({
+            "feature": np.where(is_leaf, 0, np.asarray(arrays["feature"][start:end]) + n_features).astype(np.int32),
+            "threshold": np.asarray(arrays["threshold"][start:end], dtype=np.float64),
+            "left": np.where(is_leaf, -1, left - start).astype(np.int32),
+            "right": np.where(is_leaf, -1, np.asarray(arrays["right"][start:end]) - start).astype(np.int32),
+            "default_left": np.zeros(end - start, dtype=bool),
+            "zero_missing": np.zeros(end - start, dtype=bool),
+            "leaf": np.asarray(arrays["value"][start:end], dtype=np.float64)
+        })
+    return trees, {"kind": "forest", "n_outputs": arrays["value"].shape[1]}
+
+def _base_models(model):
+    """
+    (name, compile_fn) για κάθε base estimator του OOFStackingClassifier/StackingClassifier ή του artifact.
+    """
+    if isinstance(model, StackedModelArtifact):
+        model.warm()
+        for entry in model.manifest["estimators"]:
+            native = model._estimator(entry)
+            if entry["kind"] == 'xgboost':
+                yield entry["name"], lambda F, b=native.booster: _compile_xgboost(b, F)
+            elif entry["kind"] == 'lightgbm':
+                yield entry["name"], lambda F, b=native.booster: _compile_lightgbm(b.model_to_string())
+            elif entry["kind"] == 'random_forest':
+                yield entry["name"], lambda F, a=native.arrays: _compile_forest(a, F)
+            else:
+                raise ValueError(f"Ο estimator '{entry['name']}' ({entry['kind']}) δεν υποστηρίζεται.")
+        return
+    for name, est in model.named_estimators_.items():
+        kind = type(est).__name__
+        if kind == 'XGBClassifier':
+            yield name, lambda F, e=est: _compile_xgboost(e.get_booster(), F)
+        elif kind == 'LGBMClassifier':
+            yield name, lambda F, e=est: _compile_lightgbm(e.booster_.model_to_string())
+        elif kind == 'RandomForestClassifier':
+            yield name, lambda F, e=est: _compile_forest(forest_arrays(e)[0], F)
+        else:
+            raise ValueError(f"Ο estimator '{name}' ({kind}) δεν υποστηρίζεται.")
+
+# === Μηχανή πρόβλεψης ===
+class FusedStackPredictor:
+    """
+    Ίδιο API με το stacking μοντέλο (classes_, predict_proba, predict). Όλα τα δέντρα όλων των base
+    μοντέλων διασχίζονται σε ένα πέρασμα ανά chunk γραμμών και οι πιθανότητες περνούν κατευθείαν
+    από το γραμμικό meta-model, χωρίς pandas ή ενδιάμεσες κλήσεις στις βιβλιοθήκες.
+    backend: 'auto' (numba αν είναι εγκατεστημένο), 'numba' ή 'numpy'.
+    max_rows: batches με περισσότερες γραμμές πηγαίνουν στο αρχικό μοντέλο (οι native βιβλιοθήκες
+    είναι ταχύτερες σε μεγάλα batches, η ενιαία μηχανή στα μικρά). None: πάντα ενιαία μηχανή.
+    """
+
+    def __init__(self, model, backend='auto', chunk_size=None, max_rows=None):
+        if backend not in ('auto', 'numba', 'numpy'):
+            raise ValueError("backend πρέπει να είναι 'auto', 'numba' ή 'numpy'.")
+        if backend == 'numba' and njit is None:
+            raise ImportError("Το numba δεν είναι εγκατεστημένο.")
+        self.backend = 'numba' if backend == 'auto' and njit is not None else ('numpy' if backend == 'auto' else backend)
+
+        self.model = model
+        self.max_rows = max_rows
+        self.classes_ = np.asarray(model.classes_)
+        names = getattr(model, 'feature_names_in_', None)
+        self.feature_names_in_ = np.asarray(names, dtype=object) if names is not None else None
+        if isinstance(model, StackedModelArtifact):
+            self.coef_, self.intercept_ = model.coef_, model.intercept_
+            self.softmax_ = model.manifest["meta"]["softmax"]
+        else:
+            self.coef_, self.intercept_ = model.final_estimator_.coef_, model.final_estimator_.intercept_
+            self.softmax_ = uses_softmax(model.final_estimator_)
+        self._compile(model)
+        # Chunk γραμμών ώστε ο πίνακας (δέντρα x γραμμές) να μένει μικρός
+        self.chunk_size = chunk_size or max(1, (1 << 21) // len(self.roots_))
+        if self.backend == 'numba':
+            # JIT compile (ή φόρτωση από το cache του numba) εδώ, όχι στο πρώτο request
+            self.base_predict_proba(np.zeros((1, self.n_features_)))
+
+    def _compile(self, model):
+        n_features = len(self.feature_names_in_) if self.feature_names_in_ is not None else None
+        if n_features is None:
+            n_features = int(getattr(model, 'n_features_in_', 0)) or None
+        if n_features is None:
+            raise ValueError("Απαιτείται γνωστός αριθμός features (feature_names_in_).")
+        self.n_features_ = n_features
+
+        scalar, forest, self.blocks_ = [], [], []
+        n_columns = 0
+        for name, compile_fn in _base_models(model):
+            trees, info = compile_fn(n_features)
+            info["name"] = name
+            if info["kind"] == 'boosted':
+                info["columns"] = (n_columns, n_columns + info["n_outputs"])
+                for tree in trees:
+                    tree["output"] += n_columns
+                n_columns += info["n_outputs"]
+                scalar += trees
+            else:
+                info["trees"] = (len(forest), len(forest) + len(trees))
+                forest += trees
+            self.blocks_.append(info)
+        self.n_margin_columns_ = n_columns
+
+        # Τα scalar δέντρα ταξινομούνται ανά στήλη εξόδου ώστε κάθε στήλη να είναι συνεχές τμήμα
+        scalar.sort(key=lambda tree: tree["output"])
+        outputs = np.asarray([tree["output"] for tree in scalar], dtype=np.int64)
+        self.column_bounds_ = np.searchsorted(outputs, np.arange(n_columns + 1))
+        self.n_scalar_trees_ = len(scalar)
+
+        trees = scalar + forest
+        sizes = np.asarray([len(tree["left"]) for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.roots_ = offsets.astype(np.int64)
+
+        def stacked(key):
+            return np.concatenate([tree[key] for tree in trees])
+
+        def children(key):
+            return np.concatenate([np.where(tree[key] == -1, -1, tree[key] + off)
+                                   for tree, off in zip(trees, offsets)]).astype(np.int64)
+
+        self.feature_ = stacked("feature").astype(np.int64)
+        self.threshold_ = stacked("threshold").astype(np.float64)
+        self.left_, self.right_ = children("left"), children("right")
+        self.default_left_ = stacked("default_left").astype(np.bool_)
+        self.zero_missing_ = stacked("zero_missing").astype(np.bool_)
+        if len(self.left_) >= np.iinfo(np.int32).max:
+            raise ValueError("Πάρα πολλοί κόμβοι για int32 δείκτες.")
+        self.nodes_ = np.stack([self.left_, self.right_, self.feature_, self.default_left_, self.zero_missing_],
+                               axis=1).astype(np.int32)
+        self.leaf_ = np.concatenate([tree["leaf"] for tree in scalar]) if scalar else np.zeros(0)
+        # Πίνακας πιθανοτήτων των φύλλων RF, με δείκτη (κόμβος - αρχή του τμήματος RF)
+        self.forest_start_ = int(offsets[len(scalar)]) if forest else 0
+        self.forest_leaf_ = (np.concatenate([tree["leaf"] for tree in forest]) if forest
+                             else np.zeros((0, 0)))
+        logging.getLogger('inference').debug("[fused] %d δέντρα, %d κόμβοι, backend %s", len(trees),
+                                             len(self.left_), self.backend)
+
+    def _prepare(self, X):
+        if hasattr(X, 'columns'):
+            if self.feature_names_in_ is not None:
+                X = X[list(self.feature_names_in_)]
+            X = X.to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_:
+            raise ValueError(f"Αναμένονταν {self.n_features_} features, δόθηκαν {X.shape[1]}.")
+        # [float64 | float32 -> float64]: κάθε κόμβος συγκρίνει με την ακρίβεια του μοντέλου του
+        return np.ascontiguousarray(np.hstack([X, X.astype(np.float32).astype(np.float64)]))
+
+    def base_predict_proba(self, X):
+        X = self._prepare(X)
+        n_rows = len(X)
+        margins = np.zeros((n_rows, self.n_margin_columns_))
+        forests = [block for block in self.blocks_ if block["kind"] == 'forest']
+        forest_sums = {block["name"]: np.zeros((n_rows, block["n_outputs"])) for block in forests}
+
+        for start in range(0, n_rows, self.chunk_size):
+            X_chunk = X[start:start + self.chunk_size]
+            if self.backend == 'numba':
+                leaves = np.empty((len(X_chunk), len(self.roots_)), dtype=np.int32)
+                _leaves_numba(X_chunk, self.nodes_, self.threshold_, self.roots_.astype(np.int32), leaves)
+            else:
+                leaves = np.empty((len(X_chunk), len(self.roots_)), dtype=np.int64)
+                _leaves_numpy(X_chunk, self.feature_, self.threshold_, self.left_, self.right_,
+                              self.default_left_, self.zero_missing_, self.roots_, leaves)
+            scalar_leaves = leaves[:, :self.n_scalar_trees_]
+            for c in range(self.n_margin_columns_):
+                lo, hi = self.column_bounds_[c], self.column_bounds_[c + 1]
+                margins[start:start + len(X_chunk), c] = self.leaf_[scalar_leaves[:, lo:hi]].sum(axis=1)
+            forest_nodes = leaves[:, self.n_scalar_trees_:] - self.forest_start_
+            for block in forests:
+                lo, hi = block["trees"]
+                forest_sums[block["name"]][start:start + len(X_chunk)] = \
+                    self.forest_leaf_[forest_nodes[:, lo:hi]].sum(axis=1)
+
+        probas = {}
+        for block in self.blocks_:
+            if block["kind"] == 'forest':
+                lo, hi = block["trees"]
+                probas[block["name"]] = forest_sums[block["name"]] / (hi - lo)
+                continue
+            lo, hi = block["columns"]
+            margin = margins[:, lo:hi] + block["base_margin"]
+            if block["transform"] == 'softmax':
+                margin = np.exp(margin - margin.max(axis=1, keepdims=True))
+                probas[block["name"]] = margin / margin.sum(axis=1, keepdims=True)
+            else:
+                p = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+                probas[block["name"]] = np.column_stack([1.0 - p, p])
+        return probas
+
+    def predict_proba_from_base(self, base_probas):
+        stacked = np.hstack([base_probas[block["name"]] for block in self.blocks_])
+        return linear_predict_proba(stacked, self.coef_, self.intercept_, self.softmax_)
+
+    def predict_proba(self, X):
+        if self.max_rows is not None and len(X) > self.max_rows:
+            return self.model.predict_proba(X)
+        return self.predict_proba_from_base(self.base_predict_proba(X))
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
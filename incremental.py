@@ -0,0 +1,363 @@
+# === incremental.py ===
+# Incremental επανεκπαίδευση σε νέο batch μετρήσεων: νέοι boosting γύροι στους XGB/LGBM boosters,
+# ανανέωση μέρους των δέντρων του RF (warm_start), refit μόνο του meta-model σε OOF προβλέψεις,
+# guard μετρικές για αποδοχή ή fallback σε πλήρη επανεκπαίδευση και αναφορά χρόνων
+
+import os
+import json
+import copy
+import time
+import hashlib
+import logging
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from data_loader import load_dataset
+from resampling import SMOTESampler
+from training_config import TrainingConfig
+from encoder_utils import load_pipeline, save_pipeline
+from model_artifact import ARTIFACT_PATH
+from modeling import train_model, save_trained_model, configure_logging as configure_modeling_logging
+
+MODEL_PATH = "models/final_model.pkl"
+PIPELINE_PATH = "models/preprocessing_pipeline.pkl"
+REPORT_PATH = "results/incremental_report.json"
+
+# Aliases του αριθμού γύρων στο LightGBM: αν μείνουν στα params υπερισχύουν του num_boost_round
+_LGBM_ROUND_ALIASES = ('num_iterations', 'num_iteration', 'n_iter', 'num_tree', 'num_trees', 'num_round',
+                       'num_rounds', 'num_boost_round', 'n_estimators', 'early_stopping_round')
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/incremental.log', level=logging.INFO):
+    logger = logging.getLogger('incremental')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Ενημέρωση base μοντέλων (αντίγραφα, το αρχικό μοντέλο δεν αλλάζει) ===
+def _update_xgb(estimator, X, y, rounds, n_threads=None):
+    import xgboost as xgb
+    params = estimator.get_xgb_params()
+    if n_threads:
+        params["n_jobs"] = n_threads
+    booster = xgb.train(params, xgb.DMatrix(X, label=y, nthread=n_threads or -1), num_boost_round=rounds,
+                        xgb_model=estimator.get_booster())
+    # Το best_iteration του αρχικού fit θα έκοβε τους νέους γύρους στο predict
+    booster.set_attr(best_iteration=None, best_ntree_limit=None, best_score=None)
+    updated = copy.copy(estimator)
+    updated._Booster = booster
+    updated.n_estimators = booster.num_boosted_rounds()
+    return updated
+
+def _update_lgbm(estimator, X, y, rounds, n_threads=None):
+    import lightgbm as lgb
+    params = {k: v for k, v in estimator.booster_.params.items() if k not in _LGBM_ROUND_ALIASES}
+    if n_threads:
+        params["n_jobs"] = n_threads
+    booster = lgb.train(params, lgb.Dataset(X, y), num_boost_round=rounds, init_model=estimator.booster_,
+                        keep_training_booster=True)
+    updated = copy.copy(estimator)
+    updated._Booster = booster
+    updated._best_iteration = None
+    updated.n_estimators = booster.current_iteration()
+    return updated
+
+def _update_rf(estimator, X, y, fraction, mode='refresh'):
+    """
+    mode='refresh': τα παλαιότερα fraction δέντρα αντικαθίστανται από νέα στο batch (σταθερό μέγεθος).
+    mode='grow': προστίθενται fraction * n_trees νέα δέντρα.
+    """
+    if not np.array_equal(np.unique(y), estimator.classes_):
+        return None
+    n_new = max(1, int(round(fraction * len(estimator.estimators_))))
+    updated = copy.copy(estimator)
+    kept = estimator.estimators_[n_new:] if mode == 'refresh' else estimator.estimators_
+    updated.estimators_ = list(kept)
+    updated.set_params(warm_start=True, n_estimators=len(kept) + n_new)
+    updated.fit(X, y)
+    updated.set_params(warm_start=False)
+    return updated
+
+def update_base_models(model, X, y, boost_rounds=50, rf_fraction=0.2, rf_mode='refresh', n_threads=None,
+                       logger=None):
+    """
+    Επιστρέφει {όνομα: ενημερωμένο estimator}. Ένας RF χωρίς όλες τις κλάσεις στο batch μένει ως έχει.
+    """
+    logger = logger or logging.getLogger('incremental')
+    updated = {}
+    for name, estimator in model.named_estimators_.items():
+        kind = type(estimator).__name__
+        if kind == 'XGBClassifier':
+            updated[name] = _update_xgb(estimator, X, y, boost_rounds, n_threads)
+        elif kind == 'LGBMClassifier':
+            updated[name] = _update_lgbm(estimator, X, y, boost_rounds, n_threads)
+        elif kind == 'RandomForestClassifier':
+            updated[name] = _update_rf(estimator, X, y, rf_fraction, rf_mode)
+            if updated[name] is None:
+                logger.warning("[%s] Το batch δεν περιέχει όλες τις κλάσεις: τα δέντρα μένουν ως έχουν", name)
+                updated[name] = estimator
+        else:
+            logger.warning("[%s] Δεν υποστηρίζεται incremental update για %s: μένει ως έχει", name, kind)
+            updated[name] = estimator
+    return updated
+
+def _resample(X, y, resample):
+    if not resample:
+        return X, y
+    X_res, y_res = SMOTESampler(random_state=42).fit_resample(X.to_numpy(dtype=np.float32), y)
+    return pd.DataFrame(X_res, columns=X.columns, copy=False), y_res
+
+def _stratify(y, n_splits=2):
+    # Stratified split μόνο αν κάθε κλάση έχει αρκετές γραμμές (μικρά ημερήσια batches)
+    return y if np.bincount(y)[np.unique(y)].min() >= n_splits else None
+
+def _load_previous_oof(model, logger):
+    key = getattr(model, 'cache_key_', None)
+    path = os.path.join(model.cache_dir, f"{key}_predictions.npz") if key and model.cache_dir else None
+    if path is None or not os.path.isfile(path):
+        logger.warning("Δεν βρέθηκαν OOF προβλέψεις του προηγούμενου fit: meta-model μόνο στο νέο batch")
+        return None, None
+    with np.load(path) as arrays:
+        if "y" not in arrays:
+            logger.warning("Το cache %s δεν έχει ετικέτες (παλαιό format): meta-model μόνο στο νέο batch", key)
+            return None, None
+        return {name: arrays[f"oof_{name}"] for name in model.named_estimators_}, arrays["y"]
+
+def incremental_update(model, X, y, boost_rounds=50, rf_fraction=0.2, rf_mode='refresh', cv_folds=3,
+                       resample=True, max_meta_rows=200_000, n_threads=None, logger=None):
+    """
+    Νέο OOFStackingClassifier από το model και το batch (X, y):
+      1. OOF πιθανότητες του batch με cv_folds incremental updates (κάθε fold ενημερώνεται χωρίς τις γραμμές του)
+      2. τελικό update των base μοντέλων σε όλο το batch
+      3. refit του meta-model στις προηγούμενες OOF προβλέψεις + τις νέες (έως max_meta_rows, οι πιο πρόσφατες)
+    SMOTE (resample=True) μόνο στις γραμμές εκπαίδευσης κάθε update. Επιστρέφει (candidate, timings).
+    """
+    logger = logger or logging.getLogger('incremental')
+    y = np.asarray(y)
+    timings = {}
+    names = list(model.named_estimators_)
+    n_classes = len(model.classes_)
+
+    start = time.perf_counter()
+    oof = {name: np.zeros((len(y), n_classes)) for name in names}
+    splitter = StratifiedKFold(n_splits=cv_folds) if _stratify(y, cv_folds) is not None else None
+    folds = (splitter.split(np.zeros(len(y)), y) if splitter is not None else
+             np.array_split(np.random.default_rng(42).permutation(len(y)), cv_folds))
+    for fold in folds:
+        train_idx, val_idx = fold if splitter is not None else (np.setdiff1d(np.arange(len(y)), fold), fold)
+        X_fit, y_fit = _resample(X.iloc[train_idx], y[train_idx], resample)
+        fold_models = update_base_models(model, X_fit, y_fit, boost_rounds, rf_fraction, rf_mode, n_threads, logger)
+        for name, est in fold_models.items():
+            oof[name][val_idx] = est.predict_proba(X.iloc[val_idx])
+    timings["oof_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_fit, y_fit = _resample(X, y, resample)
+    updated = update_base_models(model, X_fit, y_fit, boost_rounds, rf_fraction, rf_mode, n_threads, logger)
+    timings["update_seconds"] = time.perf_counter() - start
+
+    # === Meta-model: προηγούμενες OOF γραμμές + νέες
+    start = time.perf_counter()
+    previous_oof, previous_y = _load_previous_oof(model, logger)
+    meta_y = y if previous_y is None else np.concatenate([previous_y, y])[-max_meta_rows:]
+    meta_oof = {name: (oof[name] if previous_oof is None else
+                       np.vstack([previous_oof[name], oof[name]])[-max_meta_rows:]) for name in names}
+
+    candidate = copy.copy(model)
+    candidate.estimators_ = [updated[name] for name in names]
+    candidate.named_estimators_ = type(model.named_estimators_)(**updated)
+    candidate.oof_predictions_ = meta_oof
+    candidate.test_predictions_ = None
+    candidate.refit_meta(meta_y)
+    timings["meta_seconds"] = time.perf_counter() - start
+
+    # Νέο cache entry ώστε το επόμενο update να συνεχίσει από αυτές τις OOF γραμμές
+    digest = hashlib.sha256(str(getattr(model, 'cache_key_', None)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(X.to_numpy()).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    digest.update(repr((boost_rounds, rf_fraction, rf_mode, cv_folds, resample)).encode('utf-8'))
+    candidate.cache_key_ = digest.hexdigest()[:16]
+    candidate._save_cache(candidate.cache_key_, meta_y)
+    logger.info("Meta-model σε %d OOF γραμμές (%d νέες)", len(meta_y), len(y))
+    return candidate, timings
+
+# === Guard ===
+def guard_metrics(model, X, y):
+    proba = model.predict_proba(X)
+    return {"logloss": float(log_loss(y, proba, labels=model.classes_)),
+            "accuracy": float(accuracy_score(y, model.classes_[proba.argmax(axis=1)]))}
+
+def accept_update(previous, candidate, max_logloss_increase=0.02, max_accuracy_drop=0.03):
+    """
+    Αποδοχή αν το candidate δεν είναι χειρότερο από το προηγούμενο μοντέλο πέρα από τα όρια.
+    """
+    return (candidate["logloss"] <= previous["logloss"] * (1 + max_logloss_increase)
+            and candidate["accuracy"] >= previous["accuracy"] - max_accuracy_drop)
+
+def full_retrain(data, target='Heart_Condition', cv_folds=5, config=None, logger=None):
+    """
+    Πλήρης επανεκπαίδευση (pipeline + SMOTE + stacking) όπως στο main.py. Επιστρέφει (model, pipeline, metrics).
+    """
+    from preprocessing import preprocess_data
+    X_train, X_test, y_train, y_test, _, pipeline = preprocess_data(data, target=target)
+    model, _ = train_model(X_train, y_train, X_test, cv_folds=cv_folds, config=config, logger=logger)
+    proba = model.predict_proba_from_base(model.test_predictions_)
+    metrics = {"logloss": float(log_loss(y_test, proba, labels=model.classes_)),
+               "accuracy": float(accuracy_score(y_test, model.classes_[proba.argmax(axis=1)]))}
+    return model, pipeline, metrics
+
+def append_to_history(batch, history_path):
+    """
+    Προσθήκη του batch στο CSV ιστορικού με τη σειρά στηλών του header του. Αν οι στήλες διαφέρουν,
+    το αρχείο ξαναγράφεται με την ένωσή τους αντί να μπουν τιμές κάτω από λάθος στήλες.
+    """
+    if not os.path.isfile(history_path):
+        batch.to_csv(history_path, index=False)
+        return
+    header = pd.read_csv(history_path, nrows=0).columns
+    if set(header) == set(batch.columns):
+        batch.reindex(columns=header).to_csv(history_path, mode='a', header=False, index=False)
+        return
+    history = pd.read_csv(history_path, dtype=str, keep_default_na=False)
+    pd.concat([history, batch], ignore_index=True).to_csv(history_path, index=False)
+
+# === Κύρια Συνάρτηση ===
+def run_incremental(batch_path, model_path=MODEL_PATH, pipeline_path=PIPELINE_PATH, artifact_path=ARTIFACT_PATH,
+                    history_path='data/heart.csv', target='Heart_Condition', guard_size=0.2, boost_rounds=50,
+                    rf_fraction=0.2, rf_mode='refresh', cv_folds=3, resample=True, max_logloss_increase=0.02,
+                    max_accuracy_drop=0.03, fallback=True, compare_full=False, append_history=False,
+                    config=None, report_path=REPORT_PATH, logger=None):
+    """
+    Incremental update του αποθηκευμένου μοντέλου με το batch_path. Αν οι guard μετρικές (holdout του batch)
+    απορρίψουν το update και fallback=True, γίνεται πλήρης επανεκπαίδευση σε history + batch (χωρίς το guard
+    holdout), που αποθηκεύεται μόνο αν περάσει τον ίδιο έλεγχο στο ίδιο holdout.
+    """
+    logger = logger or configure_logging()
+    config = config or TrainingConfig.from_tuned()
+    n_threads = config.resolve()["threads_per_estimator"]
+    report = {"batch": batch_path, "model": model_path}
+
+    model = joblib.load(model_path)
+    pipeline = load_pipeline(pipeline_path)
+    # Μέσω του data_loader: ίδια NA_VALUES ("?", "na", ...) με τα υπόλοιπα entry points
+    data_logger = logging.getLogger('data_loader')
+    batch, _ = load_dataset(batch_path, target=target, gui_fallback=False, logger=data_logger, use_cache=False)
+    X = pd.DataFrame(pipeline.transform_array(batch, dtype=np.float32), columns=pipeline.feature_names_)
+    y = pipeline.encode_target(batch[target]).to_numpy()
+
+    # === Guard holdout: γραμμές του batch που δεν χρησιμοποιούνται στο update
+    update_idx, guard_idx = train_test_split(np.arange(len(y)), test_size=guard_size, random_state=42,
+                                             stratify=_stratify(y))
+    X_guard, y_guard = X.iloc[guard_idx], y[guard_idx]
+    report["batch_rows"] = int(len(y))
+    report["guard_rows"] = int(len(guard_idx))
+
+    start = time.perf_counter()
+    candidate, timings = incremental_update(model, X.iloc[update_idx], y[update_idx], boost_rounds=boost_rounds,
+                                            rf_fraction=rf_fraction, rf_mode=rf_mode, cv_folds=cv_folds,
+                                            resample=resample, n_threads=n_threads, logger=logger)
+    report["incremental_seconds"] = time.perf_counter() - start
+    report["incremental_timings"] = timings
+
+    previous_metrics, candidate_metrics = guard_metrics(model, X_guard, y_guard), guard_metrics(candidate, X_guard,
+                                                                                               y_guard)
+    accepted = accept_update(previous_metrics, candidate_metrics, max_logloss_increase, max_accuracy_drop)
+    report["guard"] = {"previous": previous_metrics, "candidate": candidate_metrics, "accepted": accepted}
+    logger.info("Guard: logloss %.4f -> %.4f, accuracy %.4f -> %.4f (%s)", previous_metrics["logloss"],
+                candidate_metrics["logloss"], previous_metrics["accuracy"], candidate_metrics["accuracy"],
+                "αποδοχή" if accepted else "απόρριψη")
+
+    full, full_accepted = None, False
+    if compare_full or (fallback and not accepted):
+        history, _ = load_dataset(history_path, target=target, gui_fallback=False, logger=data_logger)
+        # Το guard holdout μένει εκτός, ώστε η επανεκπαίδευση να κριθεί στις ίδιες γραμμές με το incremental
+        data = pd.concat([history, batch.iloc[update_idx]], ignore_index=True)
+        logger.info("Πλήρης επανεκπαίδευση σε %d γραμμές (history + batch)...", len(data))
+        start = time.perf_counter()
+        full = full_retrain(data, target=target, config=config, logger=logging.getLogger('modeling'))
+        report["full_retrain_seconds"] = time.perf_counter() - start
+        report["full_retrain_test_metrics"] = full[2]
+        logger.info("Incremental %.1fs έναντι πλήρους επανεκπαίδευσης %.1fs (x%.1f)", report["incremental_seconds"],
+                    report["full_retrain_seconds"], report["full_retrain_seconds"] / report["incremental_seconds"])
+
+        guard_rows = batch.iloc[guard_idx]
+        X_guard_full = pd.DataFrame(full[1].transform_array(guard_rows, dtype=np.float32),
+                                    columns=full[1].feature_names_)
+        full_metrics = guard_metrics(full[0], X_guard_full, full[1].encode_target(guard_rows[target]).to_numpy())
+        full_accepted = accept_update(previous_metrics, full_metrics, max_logloss_increase, max_accuracy_drop)
+        report["guard"]["full_retrain"] = full_metrics
+        report["guard"]["full_retrain_accepted"] = full_accepted
+        logger.info("Guard (πλήρης επανεκπαίδευση): logloss %.4f -> %.4f, accuracy %.4f -> %.4f (%s)",
+                    previous_metrics["logloss"], full_metrics["logloss"], previous_metrics["accuracy"],
+                    full_metrics["accuracy"], "αποδοχή" if full_accepted else "απόρριψη")
+
+    if accepted:
+        report["decision"] = "incremental"
+        save_trained_model(candidate, model_path, artifact_path, logger=logger)
+    elif fallback and full_accepted:
+        report["decision"] = "full_retrain"
+        save_trained_model(full[0], model_path, artifact_path, logger=logger)
+        save_pipeline(full[1], pipeline_path)
+    else:
+        report["decision"] = "rejected"
+        logger.warning("Το update απορρίφθηκε: το αποθηκευμένο μοντέλο μένει ως έχει")
+
+    if append_history and report["decision"] != "rejected":
+        append_to_history(batch, history_path)
+        logger.info("Το batch προστέθηκε στο %s", history_path)
+
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental επανεκπαίδευση σε νέο batch μετρήσεων")
+    parser.add_argument('--batch', required=True, help="CSV με τις νέες μετρήσεις (με στήλη στόχου)")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--pipeline', default=PIPELINE_PATH)
+    parser.add_argument('--history', default='data/heart.csv', help="Ιστορικό για πλήρη επανεκπαίδευση")
+    parser.add_argument('--boost-rounds', type=int, default=50, help="Νέοι γύροι για XGB/LGBM")
+    parser.add_argument('--rf-fraction', type=float, default=0.2, help="Ποσοστό δέντρων RF που ανανεώνονται")
+    parser.add_argument('--rf-mode', choices=('refresh', 'grow'), default='refresh')
+    parser.add_argument('--guard-size', type=float, default=0.2)
+    parser.add_argument('--max-logloss-increase', type=float, default=0.02)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.03)
+    parser.add_argument('--no-fallback', action='store_true', help="Χωρίς πλήρη επανεκπαίδευση σε απόρριψη")
+    parser.add_argument('--compare-full', action='store_true',
+                        help="Μέτρηση και της πλήρους επανεκπαίδευσης για σύγκριση χρόνων")
+    parser.add_argument('--append-history', action='store_true', help="Προσθήκη του batch στο ιστορικό")
+    args = parser.parse_args(argv)
+
+    configure_modeling_logging()
+    report = run_incremental(args.batch, model_path=args.model, pipeline_path=args.pipeline,
+                             history_path=args.history, guard_size=args.guard_size, boost_rounds=args.boost_rounds,
+                             rf_fraction=args.rf_fraction, rf_mode=args.rf_mode,
+                             max_logloss_increase=args.max_logloss_increase, max_accuracy_drop=args.max_accuracy_drop,
+                             fallback=not args.no_fallback, compare_full=args.compare_full,
+                             append_history=args.append_history)
+    print(f"\nΑπόφαση: {report['decision']} | incremental {report['incremental_seconds']:.1f}s"
+          + (f" | πλήρης {report['full_retrain_seconds']:.1f}s" if 'full_retrain_seconds' in report else ""))
+
+if __name__ == "__main__":
+    main()
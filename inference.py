@@ -1,39 +1,301 @@
 # === inference.py ===
-# Demo πρόβλεψης με αποθηκευμένο Stacking μοντέλο + encoders
+# Batch inference (library API + CLI) με αποθηκευμένο Stacking μοντέλο + preprocessing pipeline
+
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 import joblib
+import numpy as np
 import pandas as pd
-from encoder_utils import load_encoders
+from encoder_utils import load_pipeline
+from data_loader import NA_VALUES
+from model_artifact import ARTIFACT_PATH, is_artifact, load_artifact
+from edge_model import is_edge_model, load_edge_model
+from explain import LocalExplainer, DEFAULT_TOP_K
+from drift import PROFILE_PATH, REPORT_PATH, DriftMonitor, DriftError, load_profile, save_report, log_report
+
+MODEL_PATH = ARTIFACT_PATH
+PIPELINE_PATH = "models/preprocessing_pipeline.pkl"
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/inference.log', level=logging.INFO):
+    logger = logging.getLogger('inference')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Φόρτωση Μοντέλου + Pipeline ===
+def load_artifacts(model_path=MODEL_PATH, pipeline_path=PIPELINE_PATH, engine='native', fused_max_rows=None):
+    """
+    engine='fused': τα δέντρα μεταγλωττίζονται σε FusedStackPredictor (χαμηλό latency σε μικρά batches,
+    batches > fused_max_rows πηγαίνουν στο native μοντέλο).
+    """
+    # Distilled μοντέλο (distill.py, μόνο numpy), φάκελος artifact (lazy, native μορφές) ή παλιό pickle (.pkl)
+    if is_edge_model(model_path):
+        model = load_edge_model(model_path)
+    else:
+        model = load_artifact(model_path) if is_artifact(model_path) else joblib.load(model_path)
+    if engine == 'fused':
+        from fused_predictor import FusedStackPredictor
+        model = FusedStackPredictor(model, max_rows=fused_max_rows)
+    elif engine != 'native':
+        raise ValueError("engine πρέπει να είναι 'native' ή 'fused'.")
+    pipeline = load_pipeline(pipeline_path)
+    return model, pipeline
+
+# === Πρόβλεψη για ένα batch ===
+def predict_batch(model, pipeline, batch, passthrough=None):
+    """
+    Προεπεξεργασία + predict_proba σε ένα batch.
+    Επιστρέφει dataframe με Prediction και Proba_<κλάση> (αποκωδικοποιημένα από το pipeline).
+    """
+    return _prediction_frame(model, pipeline, model.predict_proba(pipeline.transform(batch)), batch, passthrough)
+
+def _prediction_frame(model, pipeline, proba, batch, passthrough=None):
+    labels = pipeline.decode_target(model.classes_)
+    result = pd.DataFrame(proba, columns=[f"Proba_{label}" for label in labels], index=batch.index)
+    result.insert(0, "Prediction", labels[proba.argmax(axis=1)])
+    if passthrough:
+        result = pd.concat([batch[passthrough], result], axis=1)
+    return result
+
+def explain_batch(model, pipeline, batch, explainer=None, top_k=DEFAULT_TOP_K):
+    """
+    Πρόβλεψη + ερμηνεία: top-k SHAP συνεισφορές του xgb base μοντέλου για την κλάση που προβλέπει το
+    stacking. Το explainer (LocalExplainer) πρέπει να ξαναχρησιμοποιείται μεταξύ κλήσεων (booster, cache).
+    Επιστρέφει (προβλέψεις όπως το predict_batch, ερμηνείες σε long μορφή).
+    """
+    explainer = explainer or LocalExplainer(model, pipeline)
+    X = pipeline.transform(batch)
+    proba = model.predict_proba(X)
+    result = _prediction_frame(model, pipeline, proba, batch)
+    return result, explainer.explain(batch, top_k=top_k, class_idx=proba.argmax(axis=1), X=X)
+
+def predict_records(records, model=None, pipeline=None):
+    """
+    Πρόβλεψη για λίστα από dicts (ή ένα dict).
+    """
+    if model is None or pipeline is None:
+        model, pipeline = load_artifacts()
+    if isinstance(records, dict):
+        records = [records]
+    return predict_batch(model, pipeline, pd.DataFrame.from_records(records))
+
+# === Streaming ανάγνωση input ===
+def iter_batches(input_path, batch_size=50_000, columns=None):
+    if input_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(input_path, memory_map=True)
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield record_batch.to_pandas()
+    else:
+        with pd.read_csv(input_path, na_values=NA_VALUES, usecols=columns, chunksize=batch_size) as reader:
+            yield from reader
+
+# === Workers (ένα αντίγραφο μοντέλου ανά process) ===
+_worker_artifacts = None
 
-# === Φόρτωση Μοντέλου + Encoders
-model = joblib.load("models/final_model.pkl")
-feature_encoders, target_encoder = load_encoders()
+def _init_worker(model_path, pipeline_path):
+    global _worker_artifacts
+    _worker_artifacts = load_artifacts(model_path, pipeline_path)
 
-# === Παράδειγμα νέου input
-raw_input = {
+def _score_in_worker(batch, passthrough):
+    start = time.perf_counter()
+    result = predict_batch(*_worker_artifacts, batch, passthrough=passthrough)
+    return result, time.perf_counter() - start
+
+# === Εγγραφή αποτελεσμάτων ===
+class _ResultWriter:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self._writer = None
+        self._wrote_csv = False
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    def write(self, result):
+        if self.output_path.endswith('.csv'):
+            result.to_csv(self.output_path, mode='a' if self._wrote_csv else 'w', header=not self._wrote_csv, index=False)
+            self._wrote_csv = True
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(result, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.output_path, table.schema, compression='zstd')
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+# === Batch scoring αρχείου ===
+def score_file(input_path, output_path, batch_size=50_000, n_workers=1, passthrough=None,
+               model_path=MODEL_PATH, pipeline_path=PIPELINE_PATH, window_features=None, drift='report',
+               profile_path=PROFILE_PATH, drift_report=REPORT_PATH, window_cache=True, logger=None):
+    """
+    Διαβάζει CSV/Parquet σε batches, τρέχει predict_proba ανά batch και γράφει columnar output.
+    Με n_workers > 1 τα batches μοιράζονται σε process pool (ένα μοντέλο ανά worker).
+    window_features: μεγέθη παραθύρων αν το μοντέλο εκπαιδεύτηκε με window features (υπολογίζονται
+    streaming στη σειρά του αρχείου, που πρέπει να είναι χρονική ανά ασθενή, πριν τη διανομή των batches·
+    με window_cache τα features κάθε batch αποθηκεύονται και ξαναχρησιμοποιούνται σε επόμενο scoring).
+    drift: 'off', 'report' (drift report στο drift_report) ή 'block' (DriftError σε violations/drift, χωρίς
+    output). Ο έλεγχος γίνεται στα raw batches με το προφίλ του profile_path, αν υπάρχει.
+    Επιστρέφει rows/sec και p50/p99 latency ανά batch.
+    """
+    if logger is None:
+        logger = configure_logging()
+
+    start = time.perf_counter()
+    n_rows = 0
+    latencies = []
+    writer = _ResultWriter(output_path)
+
+    monitor = None
+    if drift != 'off':
+        if os.path.isfile(profile_path):
+            monitor = DriftMonitor(load_profile(profile_path), block=drift == 'block')
+        else:
+            logger.warning("Δεν βρέθηκε προφίλ δεδομένων (%s): scoring χωρίς drift monitoring", profile_path)
+
+    def _collect(result, latency):
+        nonlocal n_rows
+        writer.write(result)
+        n_rows += len(result)
+        latencies.append(latency)
+        if monitor is not None:
+            monitor.update_predictions(result["Prediction"].to_numpy())
+
+    def _monitored(batches):
+        # Έλεγχος πριν το scoring του batch: με block=True δεν γράφεται output για δεδομένα εκτός προφίλ
+        for batch in batches:
+            monitor.update(batch)
+            monitor.check()
+            yield batch
+
+    batches = iter_batches(input_path, batch_size)
+    if monitor is not None:
+        batches = _monitored(batches)
+    if window_features:
+        from window_features import WindowFeatureExtractor
+        batches = WindowFeatureExtractor(windows=window_features).transform_stream(batches, use_cache=window_cache)
+
+    try:
+        if n_workers <= 1:
+            _init_worker(model_path, pipeline_path)
+            for batch in batches:
+                _collect(*_score_in_worker(batch, passthrough))
+        else:
+            # Φραγμένος αριθμός batches "στον αέρα" ώστε η μνήμη να μένει σταθερή
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                     initargs=(model_path, pipeline_path)) as pool:
+                pending = []
+                for batch in batches:
+                    pending.append(pool.submit(_score_in_worker, batch, passthrough))
+                    if len(pending) >= 2 * n_workers:
+                        _collect(*pending.pop(0).result())
+                for future in pending:
+                    _collect(*future.result())
+    except DriftError as e:
+        writer.close()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        save_report(e.report, drift_report)
+        logger.error("Scoring %s σταμάτησε: %s (report: %s)", input_path, e, drift_report)
+        raise
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "rows": n_rows,
+        "batches": len(latencies),
+        "seconds": elapsed,
+        "rows_per_sec": n_rows / elapsed if elapsed > 0 else 0.0,
+        "p50_batch_ms": float(np.percentile(latencies, 50) * 1000) if latencies else 0.0,
+        "p99_batch_ms": float(np.percentile(latencies, 99) * 1000) if latencies else 0.0
+    }
+    if monitor is not None:
+        report = monitor.report()
+        save_report(report, drift_report)
+        log_report(report, logger)
+        summary.update(drift_status=report["status"], drift_report=drift_report,
+                       drift_overhead=report["monitor_seconds"] / elapsed if elapsed > 0 else 0.0)
+    logger.info("Scoring %s -> %s: %d γραμμές σε %.2fs (%.0f rows/sec, p50 %.1f ms, p99 %.1f ms ανά batch)",
+                input_path, output_path, n_rows, elapsed, summary["rows_per_sec"],
+                summary["p50_batch_ms"], summary["p99_batch_ms"])
+    return summary
+
+# === Παράδειγμα νέου input (όταν δεν δίνεται --input)
+DEMO_INPUT = {
     'Age': 58,
-    'Sex': 'Female',
+    'Gender': 'Female',
     'BMI': 29.4,
-    'Smoking': 'No',
-    'PhysicalActivity': 'Medium',
-    'BloodPressure': 130,
-    'Glucose': 180
-    # Πρόσθεσε όλα τα features που χρησιμοποιεί το εκπαιδευμένο μοντέλο
+    'BMI_Category': 'Overweight',
+    'Smoking_Status': 'Never',
+    'Activity_Type': 'Walking',
+    'Blood_Pressure_Systolic_mmHg': 130,
+    'Blood_Pressure_Diastolic_mmHg': 85,
+    'Blood_Glucose_mg_dL': 180
+    # Features που λείπουν συμπληρώνονται από το pipeline (median / πιο συχνή κατηγορία)
 }
 
-# === Προεπεξεργασία input
-input_df = pd.DataFrame([raw_input])
-
-# Εφαρμογή encoders στα κατηγορικά
-for col, encoder in feature_encoders.items():
-    input_df[col] = encoder.transform(input_df[col].astype(str))
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch inference με το αποθηκευμένο Stacking μοντέλο")
+    parser.add_argument('--input', help="CSV ή Parquet αρχείο προς scoring")
+    parser.add_argument('--output', default='results/predictions.parquet', help="Αρχείο εξόδου (.parquet ή .csv)")
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--passthrough', nargs='*', default=None, help="Στήλες input που αντιγράφονται στο output")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--pipeline', default=PIPELINE_PATH)
+    parser.add_argument('--window-features', nargs='*', type=int, default=None,
+                        help="Μεγέθη παραθύρων, αν το μοντέλο εκπαιδεύτηκε με main.py --window-features")
+    parser.add_argument('--no-window-cache', action='store_true', help="Χωρίς cache των window features ανά batch")
+    parser.add_argument('--explain', type=int, default=0, metavar='K',
+                        help="Χωρίς --input: τα K χαρακτηριστικά με τη μεγαλύτερη συνεισφορά στην πρόβλεψη")
+    parser.add_argument('--drift', choices=('off', 'report', 'block'), default='report',
+                        help="Drift monitoring: μόνο report ή διακοπή του scoring σε drift/violations")
+    parser.add_argument('--profile', default=PROFILE_PATH, help="Προφίλ δεδομένων εκπαίδευσης (drift.py profile)")
+    parser.add_argument('--drift-report', default=REPORT_PATH)
+    args = parser.parse_args(argv)
 
-# Scaling (αν χρησιμοποιείς τον ίδιο scaler, πρέπει να τον φορτώσεις με joblib)
-# scaler = joblib.load('models/scaler.pkl')  # Optional
-# input_df[input_df.columns] = scaler.transform(input_df)
+    if args.input is None:
+        model, pipeline = load_artifacts(args.model, args.pipeline)
+        if args.explain:
+            result, explanation = explain_batch(model, pipeline, pd.DataFrame.from_records([DEMO_INPUT]),
+                                                top_k=args.explain)
+        else:
+            result = predict_records(DEMO_INPUT, model, pipeline)
+        print(f"\n✅ Προβλεπόμενη Διάγνωση: {result['Prediction'].iloc[0]}")
+        if args.explain:
+            print(f"Συνεισφορές (SHAP, xgb log-odds, base {explanation['BaseValue'].iloc[0]:.3f}):")
+            print(explanation[["Rank", "Feature", "Value", "SHAP"]].to_string(index=False))
+        return result
 
-# === Πρόβλεψη
-prediction = model.predict(input_df)
-predicted_label = target_encoder.inverse_transform(prediction)
+    return score_file(args.input, args.output, batch_size=args.batch_size, n_workers=args.workers,
+                      passthrough=args.passthrough, model_path=args.model, pipeline_path=args.pipeline,
+                      window_features=args.window_features, drift=args.drift, profile_path=args.profile,
+                      drift_report=args.drift_report, window_cache=not args.no_window_cache)
 
-print(f"\n✅ Προβλεπόμενη Διάγνωση: {predicted_label[0]}")
+if __name__ == "__main__":
+    main()
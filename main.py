@@ -1,55 +1,217 @@
 # === main.py ===
-# Κεντρική εκτέλεση του thesisbeta pipeline
+# Κεντρική εκτέλεση του thesisbeta pipeline ως DAG από stages με cache
 
-from data_loader import load_dataset, configure_logging as configure_data_logging
+import argparse
+from dataclasses import replace
+
+from data_loader import load_dataset, configure_logging as configure_data_logging, _file_fingerprint
 from eda import run_eda
 from preprocessing import preprocess_data
-from modeling import run_modeling
-from encoder_utils import save_encoders
+from modeling import (
+    configure_logging as configure_modeling_logging, train_model, evaluate_model, explain_model,
+    render_explanations, save_trained_model
+)
+from encoder_utils import save_pipeline
+from explain import VALUES_DIR
+from feature_store import FeatureStore
+from training_config import TrainingConfig, available_cpus
+from window_features import add_window_features
+from evaluation import cross_validate
+from drift import PROFILE_PATH, build_profile, save_profile
+from distill import (DISTILLED_PATH, REPORT_PATH as DISTILL_REPORT_PATH, distill_model,
+                     configure_logging as configure_distill_logging)
+from pipeline import Stage, PipelineRunner, ArtifactStore, configure_logging as configure_pipeline_logging
+
+# === Ορισμός κλάσεων & στόχου
+LABEL_NAMES = ['Arrhythmia', 'Diabetes', 'Healthy', 'Hypertension', 'Hypotension']
+TARGET_COL = 'Heart_Condition'
+SHAP_MODELS = ('xgb', 'lgbm', 'rf')
+
+# === Stages
+def load_stage(file_path, target):
+    # Το load_dataset έχει δικό του Parquet cache, οπότε το stage δεν αποθηκεύει την τιμή του
+    data, stats = load_dataset(file_path=file_path, target=target, logger=configure_data_logging())
+    return data
+
+def eda_stage(data, target, save_dir):
+    run_eda(data, target=target, save_dir=save_dir)
+
+def profile_stage(data, target, path, n_bins):
+    # Προφίλ των raw δεδομένων εκπαίδευσης για το drift monitoring του inference
+    return save_profile(build_profile(data, target=target, n_bins=n_bins), path)
+
+def save_pipeline_stage(prepared, path):
+    save_pipeline(prepared[5], path)
+    return path
+
+def feature_store_stage(prepared, cv_folds):
+    # Το store έχει δικό του content-addressed φάκελο, οπότε το stage δεν αποθηκεύει την τιμή του
+    X_train, X_test, y_train, y_test, feature_names, pipeline = prepared
+    return FeatureStore.build(X_train, y_train, X_test, y_test, cv=cv_folds, feature_names=feature_names)
+
+def train_stage(prepared, store, cv_folds, config, model_path, n_threads=None, stack_n_jobs=1):
+    X_train, X_test, y_train, y_test, feature_names, pipeline = prepared
+    config = replace(config, n_threads=n_threads, stack_n_jobs=stack_n_jobs)
+    model, resolved = train_model(X_train, y_train, X_test, cv_folds=cv_folds, config=config, store=store)
+    save_trained_model(model, model_path)
+    # Οι base προβλέψεις του test set δεν μπαίνουν στο pickle του μοντέλου, οπότε κρατιούνται χωριστά
+    return {"model": model, "resolved": resolved, "test_predictions": model.test_predictions_}
+
+def evaluate_stage(prepared, trained, label_names):
+    y_pred, metrics = evaluate_model(trained["model"], prepared[3], label_names,
+                                     test_predictions=trained["test_predictions"])
+    return metrics
+
+def distill_stage(prepared, store, trained, label_names, path):
+    # Ο student μαθαίνει τις πιθανότητες του stacking στο (resampled) train του store
+    X_train, X_test, y_train, y_test, feature_names, pipeline = prepared
+    model, report = distill_model(trained["model"], pipeline, store.frame('train'), X_test, y_test,
+                                  label_names=label_names, path=path, logger=configure_distill_logging())
+    return report["results"]
+
+def cv_stage(data, target, n_splits, n_repeats, n_boot):
+    summary, report = cross_validate(data, target=target, n_splits=n_splits, n_repeats=n_repeats, n_boot=n_boot)
+    return summary
+
+def shap_values_stage(prepared, store, trained, label_names, shap_models, shap_background, shap_max_rows,
+                      shap_perturbation, n_jobs=1):
+    # Background και γραμμές προς ερμηνεία ως views πάνω στο memmap του store
+    y_test = prepared[3]
+    return explain_model(trained["model"], store.frame('train'), store.frame('test'), y_test, label_names,
+                         shap_models=shap_models, shap_background=shap_background, shap_max_rows=shap_max_rows,
+                         shap_perturbation=shap_perturbation, n_jobs=n_jobs)
+
+def shap_plots_stage(shap_metadata, label_names, shap_models, shap_max):
+    return render_explanations(label_names, shap_models, shap_max)
+
+def build_stages(data_path='data/heart.csv', config=None, window_features=(), cv_repeats=0, smote_backend='exact',
+                 max_synthetic_mb=None, shap_perturbation='interventional'):
+    # Οι υπερπαράμετροι του tuning.py (models/tuned_params.json) χρησιμοποιούνται όταν υπάρχουν
+    config = config or TrainingConfig.from_tuned(device='auto', n_threads=None, stack_n_jobs=1)
+    # Τα threads δεν αλλάζουν τα αποτελέσματα, οπότε περνούν ως runtime και μένουν εκτός των stage keys
+    threads = {"n_threads": config.n_threads, "stack_n_jobs": config.stack_n_jobs}
+    model_config = replace(config, n_threads=None, stack_n_jobs=1)
+    n_jobs = min(config.stack_n_jobs, config.n_threads or available_cpus())
+    shap_files = tuple(f"{VALUES_DIR}/shap_{m}.npy" for m in SHAP_MODELS) + (f"{VALUES_DIR}/metadata.json",)
+    return [
+        # === [1] Φόρτωση δεδομένων (key από το hash του αρχείου)
+        Stage('load', load_stage, params={"file_path": data_path, "target": TARGET_COL},
+              deps=('data_loader',), cache=False,
+              fingerprint=lambda p: _file_fingerprint(p["file_path"])["sha256"]),
+        # === [2] Εξερεύνηση Δεδομένων (ανεξάρτητη από την εκπαίδευση, τρέχει παράλληλα)
+        Stage('eda', eda_stage, inputs=('load',), params={"target": TARGET_COL, "save_dir": "results"},
+              deps=('eda',), outputs=("results/eda_manifest.json",), uses_pyplot=True),
+        # === [2β] Προφίλ δεδομένων (histograms, συχνότητες, priors) για drift monitoring στο scoring
+        Stage('profile', profile_stage, inputs=('load',),
+              params={"target": TARGET_COL, "path": PROFILE_PATH, "n_bins": 10},
+              deps=('drift', 'data_loader'), outputs=(PROFILE_PATH,)),
+        # === [3] Window features ανά ασθενή (προαιρετικά) και Προεπεξεργασία Δεδομένων
+        *([Stage('features', add_window_features, inputs=('load',),
+                 params={"windows": tuple(window_features), "group_cols": ('Patient_ID',)},
+                 deps=('window_features',))] if window_features else []),
+        Stage('preprocess', preprocess_data, inputs=('features' if window_features else 'load',),
+              params={"target": TARGET_COL, "test_size": 0.2, "handle_missing": 'median', "scaling": True,
+                      "nn_backend": smote_backend, "max_synthetic_mb": max_synthetic_mb},
+              runtime={"n_jobs": config.n_threads or available_cpus()},
+              deps=('preprocessing', 'resampling')),
+        # === [4] Αποθήκευση Preprocessing Pipeline για inference
+        Stage('save_pipeline', save_pipeline_stage, inputs=('preprocess',),
+              params={"path": 'models/preprocessing_pipeline.pkl'}, deps=('encoder_utils',),
+              outputs=('models/preprocessing_pipeline.pkl',)),
+        # === [5] Κοινός πίνακας χαρακτηριστικών (memmap, folds, bins του LightGBM) για train και SHAP
+        Stage('feature_store', feature_store_stage, inputs=('preprocess',), params={"cv_folds": 5},
+              deps=('feature_store',), cache=False),
+        # === [6] Εκπαίδευση, αξιολόγηση και ερμηνεία
+        Stage('train', train_stage, inputs=('preprocess', 'feature_store'),
+              params={"cv_folds": 5, "config": model_config, "model_path": 'models/final_model.pkl'},
+              runtime=threads,
+              deps=('modeling', 'training_config', 'model_artifact', 'feature_store'),
+              outputs=('models/final_model.pkl', 'models/final_model/manifest.json')),
+        Stage('evaluate', evaluate_stage, inputs=('preprocess', 'train'), params={"label_names": LABEL_NAMES},
+              deps=('modeling', 'evaluation'),
+              outputs=("results/classification_report.csv", "results/confusion_matrix.png",
+                       "results/base_model_accuracies.csv", "results/evaluation_metrics.json"), uses_pyplot=True),
+        # === [6β] Distillation σε συμπαγές μοντέλο (μόνο numpy) για edge deployment
+        Stage('distill', distill_stage, inputs=('preprocess', 'feature_store', 'train'),
+              params={"label_names": LABEL_NAMES, "path": DISTILLED_PATH},
+              deps=('distill', 'edge_model', 'fused_predictor', 'evaluation'),
+              outputs=(f"{DISTILLED_PATH}/manifest.json", DISTILL_REPORT_PATH)),
+        # === [7] Repeated stratified K-fold με bootstrap CIs (προαιρετικά, ανεξάρτητο από το split του train)
+        *([Stage('cv', cv_stage, inputs=('features' if window_features else 'load',),
+                 params={"target": TARGET_COL, "n_splits": 5, "n_repeats": cv_repeats, "n_boot": 1000},
+                 deps=('evaluation', 'preprocessing', 'resampling', 'modeling', 'training_config',
+                       'feature_store'),
+                 outputs=("results/cv_metrics.json", "results/cv_summary.csv", "results/cv_calibration.csv"))]
+          if cv_repeats else []),
+        Stage('shap_values', shap_values_stage, inputs=('preprocess', 'feature_store', 'train'),
+              params={"label_names": LABEL_NAMES, "shap_models": SHAP_MODELS, "shap_background": 100,
+                      "shap_max_rows": 2000, "shap_perturbation": shap_perturbation},
+              runtime={"n_jobs": n_jobs},
+              deps=('explain',), outputs=shap_files),
+        Stage('shap_plots', shap_plots_stage, inputs=('shap_values',),
+              params={"label_names": LABEL_NAMES, "shap_models": SHAP_MODELS, "shap_max": 15},
+              deps=('explain',), outputs=("results/shap/shap_top_features_summary.csv",), uses_pyplot=True),
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Εκτέλεση του pipeline (μόνο τα stages που άλλαξαν)")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--stage', nargs='*', default=None,
+                        help="Εκτέλεση μόνο αυτών των stages (και όσων εισόδων τους λείπουν από το cache)")
+    parser.add_argument('--force', nargs='*', default=(), help="Stages για υποχρεωτική επανεκτέλεση")
+    parser.add_argument('--force-all', action='store_true', help="Επανεκτέλεση όλων των stages")
+    parser.add_argument('--jobs', type=int, default=2, help="Stages που τρέχουν ταυτόχρονα")
+    parser.add_argument('--cache-dir', default='.pipeline_cache')
+    parser.add_argument('--threads', type=int, default=None, help="Budget threads της εκπαίδευσης (default: όλοι οι πυρήνες)")
+    parser.add_argument('--stack-jobs', type=int, default=None,
+                        help="Παράλληλα fits (processes) ανά (estimator, fold) στο stacking (default: όσοι οι πυρήνες "
+                             "του budget, με 1 thread ανά fit)")
+    parser.add_argument('--window-features', nargs='*', type=int, default=(),
+                        help="Μεγέθη παραθύρων (μετρήσεις) για ECG/HR window features, π.χ. 8 32")
+    parser.add_argument('--smote-backend', choices=('exact', 'approximate'), default='exact',
+                        help="k-NN του SMOTE: exact (sklearn) ή approximate (pynndescent, αν υπάρχει)")
+    parser.add_argument('--max-synthetic-mb', type=float, default=None,
+                        help="Όριο μνήμης (MB) για τα συνθετικά δείγματα του SMOTE")
+    parser.add_argument('--shap-perturbation', choices=('interventional', 'tree_path_dependent'),
+                        default='interventional',
+                        help="SHAP με background 100 γραμμών του X_train ή path-dependent (ταχύτερο, χωρίς background)")
+    parser.add_argument('--cv-repeats', type=int, default=0,
+                        help="Προσθέτει stage 'cv': repeated stratified 5-fold με bootstrap CIs")
+    parser.add_argument('--profile', nargs='*', default=(),
+                        help="Stages ή υπο-βήματα (π.χ. preprocess, smote, train/fit/xgb) για profiling")
+    parser.add_argument('--profiler', choices=('cprofile', 'py-spy'), default='cprofile')
+    parser.add_argument('--metrics-dir', default='results/metrics', help="JSON/Prometheus μετρικές του run")
+    parser.add_argument('--dry-run', action='store_true', help="Εμφάνιση του σχεδίου χωρίς εκτέλεση")
+    args = parser.parse_args(argv)
 
-def main():
     # === Logging ενεργοποίηση
-    data_logger = configure_data_logging()
-
-    # === Ορισμός κλάσεων & στόχου
-    label_names = ['Arrhythmia', 'Diabetes', 'Healthy', 'Hypertension', 'Hypotension']
-    target_col = 'Heart_Condition'
-
-    # === [1] Φόρτωση δεδομένων
-    data, stats = load_dataset(file_path='data/heart.csv', target=target_col, logger=data_logger)
-
-    # === [2] Εξερεύνηση Δεδομένων
-    mi_scores = run_eda(data, target=target_col)
-
-    # === [3] Προεπεξεργασία Δεδομένων
-    X_train, X_test, y_train, y_test, feature_names, scaler, feature_encoders, target_encoder = preprocess_data(
-        data,
-        target=target_col,
-        test_size=0.2,
-        handle_missing='median',
-        scaling=True
-    )
-
-    # === [4] Αποθήκευση Encoders για inference
-    save_encoders(feature_encoders, target_encoder)
-
-    # === [5] Εκπαίδευση Μοντέλου και Ερμηνεία
-    model, y_pred, metrics = run_modeling(
-        X_train=X_train,
-        X_test=X_test,
-        y_train=y_train,
-        y_test=y_test,
-        feature_names=feature_names,
-        label_names=label_names,
-        cv_folds=5,
-        shap_max=15,
-        save_model=True
-    )
+    logger = configure_pipeline_logging()
+    configure_modeling_logging()
+
+    n_threads = args.threads or available_cpus()
+    config = TrainingConfig.from_tuned(device='auto', n_threads=n_threads, stack_n_jobs=args.stack_jobs or n_threads)
+    runner = PipelineRunner(build_stages(args.data, config=config, window_features=args.window_features,
+                                         cv_repeats=args.cv_repeats, smote_backend=args.smote_backend,
+                                         max_synthetic_mb=args.max_synthetic_mb,
+                                         shap_perturbation=args.shap_perturbation),
+                            store=ArtifactStore(args.cache_dir), n_jobs=args.jobs, logger=logger)
+    force = 'all' if args.force_all else tuple(args.force)
+    if args.dry_run:
+        plan, keys = runner.plan(args.stage, force)
+        for name in runner.order:
+            if name in plan:
+                print(f"{name:<16} {plan[name]:<4} {keys[name]}")
+        return
+
+    values, summary = runner.run(args.stage, force, metrics_dir=args.metrics_dir, profile=args.profile,
+                                 profiler=args.profiler)
 
     # === [6] Τελική Αναφορά
-    print("\n📊 [Τελικές Μετρικές]")
-    print(f"Accuracy: {metrics['accuracy']:.4f}")
-    print(f"ROC AUC:  {metrics['roc_auc']:.4f}")
+    if 'evaluate' in summary:
+        metrics = values['evaluate'] if 'evaluate' in values else runner.load('evaluate')
+        print("\n📊 [Τελικές Μετρικές]")
+        print(f"Accuracy: {metrics['accuracy']:.4f}")
+        print(f"ROC AUC:  {metrics['roc_auc']:.4f}")
 
 if __name__ == "__main__":
     main()
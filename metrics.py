@@ -0,0 +1,262 @@
+# === metrics.py ===
+# Ελαφρύ instrumentation: spans (context manager / decorator) με wall time, CPU time και peak RSS
+# ανά stage και υπο-βήμα, προαιρετικό profiling (cProfile ή py-spy) για επιλεγμένα βήματα
+# και export κάθε run σε JSON και Prometheus text format στο results/metrics/
+
+import os
+import glob
+import json
+import time
+import signal
+import shutil
+import logging
+import threading
+import contextvars
+import subprocess
+from functools import wraps
+from contextlib import contextmanager
+
+METRICS_DIR = "results/metrics"
+PROFILE_DIR = "results/profiles"
+PROM_NAME = "metrics.prom"
+
+# Τρέχον span ανά thread/context (για ιεραρχικά ονόματα, π.χ. train/fit/xgb)
+_current = contextvars.ContextVar('metrics_span', default=None)
+
+def rss_mb():
+    # Τρέχουσα resident memory (Linux), αλλιώς peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# === Profilers ===
+class _CProfile:
+    def __init__(self, path):
+        import cProfile
+        self.path = path + '.prof'
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
+        return self.path
+
+class _PySpy:
+    # py-spy record πάνω στο τρέχον process για όσο διαρκεί το span (speedscope JSON)
+    def __init__(self, path, rate=100):
+        self.path = path + '.speedscope.json'
+        self.proc = subprocess.Popen(['py-spy', 'record', '--pid', str(os.getpid()), '--rate', str(rate),
+                                      '--format', 'speedscope', '--output', self.path, '--nonblocking'],
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def stop(self):
+        self.proc.send_signal(signal.SIGINT)
+        try:
+            self.proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        return self.path if os.path.isfile(self.path) else None
+
+# === Συλλογή μετρικών ενός run ===
+class RunMetrics:
+    """
+    Spans καταγράφονται μόνο όσο υπάρχει ενεργό run (start_run ... finish_run). Εκτός run το span()
+    είναι σχεδόν no-op, οπότε το instrumentation μένει και στα hot paths (π.χ. transform στο inference).
+    Το RSS είναι ολόκληρου του process: με παράλληλα stages τα peaks τους επικαλύπτονται.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.records = []
+        self._lock = threading.Lock()
+        self._open = set()
+        self._trackers = {}
+        self._sampler = None
+        self.logger = logging.getLogger('metrics')
+
+    def start_run(self, name='pipeline', profile=(), profiler='cprofile', profile_dir=PROFILE_DIR,
+                  sample_interval=0.01):
+        if profiler not in ('cprofile', 'py-spy'):
+            raise ValueError("profiler πρέπει να είναι 'cprofile' ή 'py-spy'.")
+        if profiler == 'py-spy' and shutil.which('py-spy') is None:
+            self.logger.warning("Το py-spy δεν βρέθηκε στο PATH: χρήση cProfile")
+            profiler = 'cprofile'
+        with self._lock:
+            self.records = []
+            self.run = {"name": name, "run_id": time.strftime('%Y%m%d-%H%M%S'),
+                        "created": time.strftime('%Y-%m-%dT%H:%M:%S'), "pid": os.getpid()}
+            self.profile = set(profile or ())
+            self.profiler = profiler
+            self.profile_dir = profile_dir
+            self.sample_interval = sample_interval
+            self._run_start = (time.perf_counter(), time.process_time(), rss_mb())
+            self.active = True
+        return self
+
+    # === Καταγραφή ===
+    def record(self, name, wall_seconds, cpu_seconds=None, peak_rss_mb=None, rss_start_mb=None, **labels):
+        """
+        Καταγραφή ενός βήματος που μετρήθηκε αλλού (π.χ. σε worker process), κάτω από το τρέχον span.
+        """
+        if not self.active:
+            return None
+        parent = _current.get()
+        entry = {"name": f"{parent}/{name}" if parent else name, "wall_seconds": wall_seconds,
+                 "cpu_seconds": cpu_seconds, "rss_start_mb": rss_start_mb, "peak_rss_mb": peak_rss_mb,
+                 "peak_delta_mb": (peak_rss_mb - rss_start_mb) if peak_rss_mb is not None and rss_start_mb
+                 is not None else None, "labels": labels, "thread": threading.current_thread().name}
+        with self._lock:
+            self.records.append(entry)
+        return entry
+
+    def _enter(self, tracker):
+        with self._lock:
+            self._open.add(id(tracker))
+            self._trackers[id(tracker)] = tracker
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='metrics-rss', daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            current = rss_mb()
+            with self._lock:
+                if not self._open:
+                    self._sampler = None
+                    return
+                for key in self._open:
+                    tracker = self._trackers[key]
+                    tracker["peak"] = max(tracker["peak"], current)
+            time.sleep(self.sample_interval)
+
+    def _exit(self, tracker):
+        with self._lock:
+            self._open.discard(id(tracker))
+            self._trackers.pop(id(tracker), None)
+
+    # === Export ===
+    def summary(self):
+        wall0, cpu0, rss0 = self._run_start
+        return dict(self.run, total_wall_seconds=time.perf_counter() - wall0,
+                    total_cpu_seconds=time.process_time() - cpu0, rss_start_mb=rss0, rss_end_mb=rss_mb(),
+                    steps=list(self.records))
+
+    def finish_run(self, out_dir=METRICS_DIR, keep=50):
+        """
+        Γράφει run_<id>.json και metrics.prom (τελευταίο run) στο out_dir. Επιστρέφει τα paths.
+        """
+        if not self.active:
+            return None
+        report = self.summary()
+        self.active = False
+        if not out_dir:
+            return report
+        os.makedirs(out_dir, exist_ok=True)
+        json_path = os.path.join(out_dir, f"run_{report['run_id']}.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        prom_path = os.path.join(out_dir, PROM_NAME)
+        with open(prom_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(report))
+        os.replace(prom_path + '.tmp', prom_path)
+
+        for old in sorted(glob.glob(os.path.join(out_dir, "run_*.json")))[:-keep]:
+            os.remove(old)
+        self.logger.info("Μετρικές run στο %s και %s", json_path, prom_path)
+        return json_path, prom_path
+
+METRICS = RunMetrics()
+
+@contextmanager
+def span(name, **labels):
+    """
+    Μετρά wall/CPU time και peak RSS του block. Τα εμφωλευμένα spans παίρνουν όνομα parent/name.
+    Αν το name (ή το πλήρες path) είναι στο profile του run, το block γίνεται profile.
+    """
+    metrics = METRICS
+    if not metrics.active:
+        yield
+        return
+    parent = _current.get()
+    full_name = f"{parent}/{name}" if parent else name
+    token = _current.set(full_name)
+    tracker = {"peak": rss_mb()}
+    rss_start = tracker["peak"]
+    profiler = None
+    if name in metrics.profile or full_name in metrics.profile:
+        os.makedirs(metrics.profile_dir, exist_ok=True)
+        path = os.path.join(metrics.profile_dir, f"{metrics.run['run_id']}_{full_name.replace('/', '.')}")
+        profiler = _PySpy(path) if metrics.profiler == 'py-spy' else _CProfile(path)
+    metrics._enter(tracker)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        metrics._exit(tracker)
+        peak = max(tracker["peak"], rss_mb())
+        _current.reset(token)
+        if profiler is not None:
+            labels["profile"] = profiler.stop()
+        if metrics.active:
+            entry = {"name": full_name, "wall_seconds": wall, "cpu_seconds": cpu, "rss_start_mb": rss_start,
+                     "peak_rss_mb": peak, "peak_delta_mb": peak - rss_start, "labels": labels,
+                     "thread": threading.current_thread().name}
+            with metrics._lock:
+                metrics.records.append(entry)
+
+def timed(name=None, **labels):
+    """
+    Decorator: κάθε κλήση της συνάρτησης ως span (default όνομα: το όνομα της συνάρτησης).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# === Prometheus text format ===
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(report, prefix='thesis'):
+    """
+    Gauges ανά βήμα (wall, CPU, peak RSS σε bytes) και για όλο το run, για node_exporter textfile collector.
+    """
+    lines = []
+    metrics = (
+        ("step_wall_seconds", "Wall time ανά βήμα", "wall_seconds", 1.0),
+        ("step_cpu_seconds", "CPU time (process) ανά βήμα", "cpu_seconds", 1.0),
+        ("step_peak_rss_bytes", "Peak resident memory ανά βήμα", "peak_rss_mb", 1024 ** 2)
+    )
+    run_label = f'run="{_label_value(report["run_id"])}",pipeline="{_label_value(report["name"])}"'
+    for metric, help_text, key, scale in metrics:
+        lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} gauge"]
+        for entry in report["steps"]:
+            if entry.get(key) is not None:
+                lines.append(f'{prefix}_{metric}{{{run_label},step="{_label_value(entry["name"])}"}} '
+                             f'{entry[key] * scale:.6g}')
+    for metric, key, scale in (("run_wall_seconds", "total_wall_seconds", 1.0),
+                               ("run_cpu_seconds", "total_cpu_seconds", 1.0),
+                               ("run_end_rss_bytes", "rss_end_mb", 1024 ** 2)):
+        lines += [f"# TYPE {prefix}_{metric} gauge", f"{prefix}_{metric}{{{run_label}}} {report[key] * scale:.6g}"]
+    lines.append(f"# TYPE {prefix}_run_timestamp_seconds gauge")
+    lines.append(f"{prefix}_run_timestamp_seconds{{{run_label}}} {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+def load_runs(out_dir=METRICS_DIR, limit=None):
+    """
+    Τα αποθηκευμένα runs (παλαιότερο πρώτο), π.χ. για γραφήματα στο Streamlit app.
+    """
+    paths = sorted(glob.glob(os.path.join(out_dir, "run_*.json")))
+    runs = []
+    for path in paths[-limit:] if limit else paths:
+        with open(path, encoding='utf-8') as f:
+            runs.append(json.load(f))
+    return runs
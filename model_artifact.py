@@ -0,0 +1,301 @@
+# === model_artifact.py ===
+# Συμπαγές artifact για το stacking μοντέλο: κάθε base estimator στη native μορφή του
+# (XGBoost UBJSON, LightGBM model string, RandomForest ως επίπεδοι numpy πίνακες με mmap),
+# συντελεστές του meta-model και manifest. Lazy φόρτωση, κοινή read-only χρήση από πολλά processes.
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+
+import joblib
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+ARTIFACT_VERSION = 1
+ARTIFACT_PATH = "models/final_model"
+MANIFEST_NAME = "manifest.json"
+
+_RF_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+# === Εξαγωγή ===
+def forest_arrays(forest):
+    """
+    Όλα τα δέντρα ενός RandomForest σε κοινούς πίνακες κόμβων (global δείκτες παιδιών, -1 για φύλλα)
+    και κανονικοποιημένες πιθανότητες φύλλων σε float32.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for tree in forest.estimators_:
+        t = tree.tree_
+        is_leaf = t.children_left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, t.feature).astype(np.int32))
+        thresholds.append(t.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, t.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, t.children_right + offset).astype(np.int32))
+        value = t.value[:, 0, :forest.n_classes_]
+        values.append((value / value.sum(axis=1, keepdims=True)).astype(np.float32))
+        offset += t.node_count
+        max_depth = max(max_depth, t.max_depth)
+
+    arrays = {
+        "feature": np.concatenate(features), "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts), "right": np.concatenate(rights),
+        "value": np.concatenate(values), "roots": np.asarray(roots, dtype=np.int32)
+    }
+    return arrays, {"n_trees": len(roots), "n_nodes": offset, "max_depth": int(max_depth)}
+
+def _export_random_forest(forest, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    arrays, info = forest_arrays(forest)
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array)
+    return info
+
+def _export_estimator(name, estimator, path):
+    kind = type(estimator).__name__
+    entry = {"name": name, "classes": np.asarray(estimator.classes_).tolist()}
+    if kind == 'XGBClassifier':
+        entry.update(kind='xgboost', file=f"{name}.ubj")
+        estimator.get_booster().save_model(os.path.join(path, entry["file"]))
+    elif kind == 'LGBMClassifier':
+        entry.update(kind='lightgbm', file=f"{name}.txt")
+        estimator.booster_.save_model(os.path.join(path, entry["file"]))
+    elif kind == 'RandomForestClassifier':
+        entry.update(kind='random_forest', file=name)
+        entry.update(_export_random_forest(estimator, os.path.join(path, name)))
+    else:
+        # Άγνωστος τύπος: pickle μόνο του συγκεκριμένου estimator
+        entry.update(kind='pickle', file=f"{name}.joblib")
+        joblib.dump(estimator, os.path.join(path, entry["file"]))
+    return entry
+
+def uses_softmax(final_estimator):
+    # Ίδια λογική με το LogisticRegression.predict_proba του sklearn
+    multi_class = getattr(final_estimator, 'multi_class', 'auto')
+    if multi_class in ('ovr', 'warn'):
+        return False
+    return multi_class == 'multinomial' or (len(final_estimator.classes_) > 2 and final_estimator.solver != 'liblinear')
+
+def linear_predict_proba(stacked, coef, intercept, softmax=True):
+    """
+    predict_proba του LogisticRegression από τους συντελεστές του (softmax ή ovr/binary sigmoid).
+    """
+    scores = stacked @ coef.T + intercept
+    if softmax:
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    else:
+        scores = 1.0 / (1.0 + np.exp(-scores))
+        if scores.shape[1] == 1:
+            scores = np.hstack([1.0 - scores, scores])
+    return scores / scores.sum(axis=1, keepdims=True)
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def export_artifact(model, path=ARTIFACT_PATH, logger=None):
+    """
+    Γράφει το εκπαιδευμένο OOFStackingClassifier (ή StackingClassifier) ως artifact στον φάκελο path.
+    """
+    logger = logger or logging.getLogger('modeling')
+    if type(model.final_estimator_).__name__ != 'LogisticRegression':
+        raise ValueError("Το artifact υποστηρίζει LogisticRegression ως meta-model.")
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    estimators = [_export_estimator(name, est, tmp_path) for name, est in model.named_estimators_.items()]
+    meta = model.final_estimator_
+    np.savez(os.path.join(tmp_path, "meta.npz"), coef=meta.coef_, intercept=meta.intercept_,
+             classes=np.asarray(meta.classes_))
+
+    feature_names = getattr(model, 'feature_names_in_', None)
+    manifest = {
+        "format": "stacked-model",
+        "version": ARTIFACT_VERSION,
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "classes": np.asarray(model.classes_).tolist(),
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "estimators": estimators,
+        "meta": {"file": "meta.npz", "softmax": uses_softmax(meta)}
+    }
+    with open(os.path.join(tmp_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    logger.info("Artifact μοντέλου στο %s (%.1f MB)", path, _dir_size(path) / 1024 ** 2)
+    return path
+
+# === Native estimators (φόρτωση κατά την πρώτη χρήση) ===
+# Διάσχιση του forest με numba: blocks γραμμών παράλληλα, μέσα σε κάθε block δέντρο-δέντρο (οι κόμβοι
+# ενός δέντρου μένουν στην cache), με άθροιση των πιθανοτήτων στο out. Ίδια σύγκριση με το sklearn
+if njit is not None:
+    @njit(parallel=True, cache=True, nogil=True)
+    def _forest_proba_numba(X, feature, threshold, left, right, value, roots, out, block_size):
+        n_blocks = (X.shape[0] + block_size - 1) // block_size
+        for b in prange(n_blocks):
+            stop = min(X.shape[0], (b + 1) * block_size)
+            for t in range(roots.shape[0]):
+                for i in range(b * block_size, stop):
+                    node = roots[t]
+                    while left[node] != -1:
+                        if X[i, feature[node]] <= threshold[node]:
+                            node = left[node]
+                        else:
+                            node = right[node]
+                    for c in range(value.shape[1]):
+                        out[i, c] += value[node, c]
+else:
+    _forest_proba_numba = None
+
+class _RandomForestArrays:
+    """
+    Διάσχιση όλων των δέντρων πάνω σε memory-mapped πίνακες κόμβων: numba αν υπάρχει (ταχύτερο από το
+    sklearn forest σε μεγάλα batches), αλλιώς vectorized numpy.
+    """
+
+    def __init__(self, path, entry, chunk_size=8192):
+        # Απλά ndarray views πάνω στο mmap (οι σελίδες μοιράζονται μεταξύ processes μέσω page cache)
+        self.arrays = {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r'))
+                       for name in _RF_ARRAYS}
+        self.chunk_size = chunk_size
+
+    def predict_proba(self, X):
+        a = self.arrays
+        feature, threshold, left, right = a["feature"], a["threshold"], a["left"], a["right"]
+        # Το sklearn συγκρίνει τα features σε float32 με threshold float64
+        X = np.asarray(X, dtype=np.float32)
+        roots = a["roots"]
+        if _forest_proba_numba is not None:
+            proba = np.zeros((len(X), a["value"].shape[1]))
+            _forest_proba_numba(np.ascontiguousarray(X), feature, threshold, left, right, a["value"], roots, proba,
+                                256)
+            return proba / len(roots)
+        proba = np.zeros((len(X), a["value"].shape[1]))
+        for start in range(0, len(X), self.chunk_size):
+            X_chunk = X[start:start + self.chunk_size]
+            m = len(X_chunk)
+            # Ένα (δέντρο, γραμμή) ανά θέση. Σε κάθε βήμα προχωρούν μόνο όσα δεν έφτασαν σε φύλλο
+            node = np.repeat(roots, m)
+            row = np.tile(np.arange(m), len(roots))
+            active = np.flatnonzero(left[node] != -1)
+            while active.size:
+                current = node[active]
+                go_left = X_chunk[row[active], feature[current]] <= threshold[current]
+                nxt = np.where(go_left, left[current], right[current])
+                node[active] = nxt
+                active = active[left[nxt] != -1]
+            proba[start:start + m] = a["value"][node].reshape(len(roots), m, -1).sum(axis=0)
+        return proba / len(roots)
+
+class _XGBoostBooster:
+    def __init__(self, path, entry, n_threads=None):
+        import xgboost as xgb
+        self.booster = xgb.Booster()
+        self.booster.load_model(os.path.join(path, entry["file"]))
+        if n_threads:
+            self.booster.set_param({"nthread": n_threads})
+
+    def predict_proba(self, X):
+        import xgboost as xgb
+        return self.booster.predict(xgb.DMatrix(X, feature_names=self.booster.feature_names))
+
+class _LightGBMBooster:
+    def __init__(self, path, entry, n_threads=None):
+        import lightgbm as lgb
+        self.booster = lgb.Booster(model_file=os.path.join(path, entry["file"]))
+        self.n_threads = n_threads
+
+    def predict_proba(self, X):
+        params = {"num_threads": self.n_threads} if self.n_threads else {}
+        return self.booster.predict(X, **params)
+
+class _PickledEstimator:
+    def __init__(self, path, entry, n_threads=None):
+        self.estimator = joblib.load(os.path.join(path, entry["file"]))
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(X)
+
+_LOADERS = {
+    "random_forest": lambda path, entry, n_threads: _RandomForestArrays(os.path.join(path, entry["file"]), entry),
+    "xgboost": _XGBoostBooster,
+    "lightgbm": _LightGBMBooster,
+    "pickle": _PickledEstimator
+}
+
+# === Φορτωμένο artifact ===
+class StackedModelArtifact:
+    """
+    Ίδιο API πρόβλεψης με το OOFStackingClassifier (classes_, predict_proba, predict).
+    Στην αρχικοποίηση διαβάζονται μόνο το manifest και οι συντελεστές του meta-model,
+    κάθε base estimator φορτώνεται στην πρώτη πρόβλεψη (ή με warm()).
+    """
+
+    def __init__(self, path=ARTIFACT_PATH, n_threads=None):
+        with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != "stacked-model" or self.manifest.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Μη υποστηριζόμενο artifact στο {path}")
+        self.path = path
+        self.n_threads = n_threads
+        self.classes_ = np.asarray(self.manifest["classes"])
+        if self.manifest["feature_names"] is not None:
+            self.feature_names_in_ = np.asarray(self.manifest["feature_names"], dtype=object)
+        with np.load(os.path.join(path, self.manifest["meta"]["file"])) as meta:
+            self.coef_ = meta["coef"]
+            self.intercept_ = meta["intercept"]
+        self._estimators = {}
+        # Ταυτόχρονες πρώτες προβλέψεις (π.χ. thread pool του serving) φορτώνουν κάθε estimator μία φορά
+        self._load_lock = threading.Lock()
+
+    def _estimator(self, entry):
+        estimator = self._estimators.get(entry["name"])
+        if estimator is None:
+            with self._load_lock:
+                estimator = self._estimators.get(entry["name"])
+                if estimator is None:
+                    estimator = _LOADERS[entry["kind"]](self.path, entry, self.n_threads)
+                    self._estimators[entry["name"]] = estimator
+        return estimator
+
+    def base_estimator(self, name):
+        """
+        Ο φορτωμένος base estimator (π.χ. _XGBoostBooster με .booster) για ερμηνεία ανά πρόβλεψη.
+        """
+        return self._estimator(next(entry for entry in self.manifest["estimators"] if entry["name"] == name))
+
+    def warm(self):
+        for entry in self.manifest["estimators"]:
+            self._estimator(entry)
+        return self
+
+    def base_predict_proba(self, X):
+        return {entry["name"]: np.asarray(self._estimator(entry).predict_proba(X))
+                for entry in self.manifest["estimators"]}
+
+    def predict_proba_from_base(self, base_probas):
+        stacked = np.hstack([base_probas[entry["name"]] for entry in self.manifest["estimators"]])
+        return linear_predict_proba(stacked, self.coef_, self.intercept_, self.manifest["meta"]["softmax"])
+
+    def predict_proba(self, X):
+        return self.predict_proba_from_base(self.base_predict_proba(X))
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def load_artifact(path=ARTIFACT_PATH, n_threads=None, lazy=True):
+    model = StackedModelArtifact(path, n_threads=n_threads)
+    return model if lazy else model.warm()
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
@@ -2,20 +2,25 @@
 # Εκπαίδευση Stacking Classifier + SHAP με logging και αποθήκευση αποτελεσμάτων
 
 import os
+import json
+import time
 import joblib
+import hashlib
 import logging
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import shap
-from sklearn.ensemble import StackingClassifier, RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from xgboost import XGBClassifier
-from lightgbm import LGBMClassifier
-from sklearn.metrics import (
-    accuracy_score, classification_report, confusion_matrix,
-    ConfusionMatrixDisplay, roc_auc_score
-)
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.model_selection import StratifiedKFold
+from sklearn.utils import Bunch
+from training_config import TrainingConfig, build_estimators, fit_timer
+from feature_store import fit_from_store
+from explain import compute_shap_values, render_shap_outputs, select_rows_stratified
+from model_artifact import export_artifact, ARTIFACT_PATH
+from metrics import METRICS, span, rss_mb
+from evaluation import compute_metrics, classification_report_frame
+from sklearn.metrics import ConfusionMatrixDisplay
 
 # === Logging Configuration ===
 def configure_logging(log_file='logs/modeling.log', level=logging.INFO):
@@ -38,54 +43,310 @@ def configure_logging(log_file='logs/modeling.log', level=logging.INFO):
 
     return logger
 
-# === Κύρια Συνάρτηση Εκπαίδευσης ===
-def run_modeling(X_train, X_test, y_train, y_test, feature_names, label_names, cv_folds=5, shap_max=15, save_model=True):
-    logger = configure_logging()
+# === Parallel OOF Stacking Engine ===
+# Παράμετροι που δεν αλλάζουν το μοντέλο (threads/logging) δεν μπαίνουν στο cache key
+_NON_MODEL_PARAMS = {'n_jobs', 'nthread', 'num_threads', 'verbose', 'verbosity', 'silent'}
+
+def _select_rows(X, idx):
+    return X.iloc[idx] if hasattr(X, 'iloc') else X[idx]
+
+def _fit_fold(name, fold, estimator, X, y, train_idx, val_idx, X_test):
+    """
+    Fit ενός (estimator, fold). fold=None σημαίνει fit σε όλα τα δεδομένα (τελικός estimator).
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    est = clone(estimator)
+    if train_idx is None:
+        est.fit(X, y)
+        proba = est.predict_proba(X_test) if X_test is not None else None
+    else:
+        est.fit(_select_rows(X, train_idx), y[train_idx])
+        proba = est.predict_proba(_select_rows(X, val_idx))
+    timing = {"name": name, "fold": fold, "wall_seconds": time.perf_counter() - wall_start,
+              "cpu_seconds": time.process_time() - cpu_start, "rss_mb": rss_mb()}
+    return name, fold, (est if train_idx is None else None), proba, timing
+
+def _fit_fold_store(name, fold, estimator, store, with_test):
+    """
+    Όπως το _fit_fold, με τα δεδομένα από το FeatureStore: memmap στον worker αντί για αντίγραφο του
+    DataFrame και αποθηκευμένα LightGBM Datasets ανά fold.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if fold is None:
+        est = fit_from_store(name, estimator, store)
+        proba = est.predict_proba(store.frame('test')) if with_test else None
+    else:
+        _, val_idx = store.fold_indices(fold)
+        est = fit_from_store(name, estimator, store, fold)
+        proba = est.predict_proba(pd.DataFrame(store.X_train[val_idx], columns=store.feature_names, copy=False))
+    timing = {"name": name, "fold": fold, "wall_seconds": time.perf_counter() - wall_start,
+              "cpu_seconds": time.process_time() - cpu_start, "rss_mb": rss_mb()}
+    return name, fold, (est if fold is None else None), proba, timing
+
+def _hash_array(digest, X):
+    values = X.to_numpy() if hasattr(X, 'to_numpy') else np.asarray(X)
+    digest.update(str((values.shape, values.dtype.str)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(values).tobytes())
+    if hasattr(X, 'columns'):
+        digest.update(json.dumps([str(c) for c in X.columns]).encode('utf-8'))
+
+class OOFStackingClassifier(BaseEstimator, ClassifierMixin):
+    """
+    Stacking με παράλληλα fits ανά (estimator, fold) σε process pool (loky, memory-mapped X).
+    Κρατά τους out-of-fold πίνακες πιθανοτήτων και τις base προβλέψεις του test set,
+    αποθηκευμένα στο cache_dir με key από hash δεδομένων + υπερπαραμέτρων, ώστε το meta-model
+    να ξαναεκπαιδεύεται ή να αλλάζει (refit_meta) χωρίς νέο fit των XGB/LGBM/RF.
+    Στο cache_dir μένουν τα cache_keep πιο πρόσφατα keys.
+    """
+
+    def __init__(self, estimators, final_estimator, cv=5, n_jobs=1, cache_dir='models/stacking_cache', cache_keep=3):
+        self.estimators = estimators
+        self.final_estimator = final_estimator
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.cache_dir = cache_dir
+        self.cache_keep = cache_keep
+
+    def cache_key(self, X, y, X_test=None, store=None):
+        digest = hashlib.sha256()
+        if store is not None:
+            # Το key του store είναι ήδη hash των X/y/X_test. Τα folds του LightGBM μοιράζονται τα bins του
+            # πλήρους X_train: entries με bins ανά fold δεν ξαναχρησιμοποιούνται
+            digest.update(f"store={store.key};lgbm_bins=shared".encode('utf-8'))
+        else:
+            _hash_array(digest, X)
+            _hash_array(digest, y)
+            if X_test is not None:
+                _hash_array(digest, X_test)
+        for name, est in self.estimators:
+            params = {k: v for k, v in est.get_params().items() if k not in _NON_MODEL_PARAMS}
+            digest.update(f"{name}:{type(est).__name__}:{sorted(params.items(), key=str)!r}".encode('utf-8'))
+        digest.update(f"cv={self.cv}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _cache_paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '_predictions.npz', base + '_estimators.joblib'
+
+    def _load_cache(self, key):
+        if not self.cache_dir:
+            return False
+        arrays_path, estimators_path = self._cache_paths(key)
+        if not (os.path.isfile(arrays_path) and os.path.isfile(estimators_path)):
+            return False
+        for path in (arrays_path, estimators_path):
+            os.utime(path)  # πρόσφατη χρήση: δεν αφαιρείται από το prune
+        with np.load(arrays_path) as arrays:
+            self.oof_predictions_ = {name: arrays[f"oof_{name}"] for name, _ in self.estimators}
+            self.test_predictions_ = ({name: arrays[f"test_{name}"] for name, _ in self.estimators}
+                                      if all(f"test_{name}" in arrays for name, _ in self.estimators) else None)
+        self.estimators_ = joblib.load(estimators_path)
+        return True
+
+    def _save_cache(self, key, y=None):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        arrays_path, estimators_path = self._cache_paths(key)
+        arrays = {f"oof_{name}": proba for name, proba in self.oof_predictions_.items()}
+        if y is not None:
+            # Οι ετικέτες των OOF γραμμών χρειάζονται για refit του meta-model σε incremental updates
+            arrays["y"] = np.asarray(y)
+        if self.test_predictions_ is not None:
+            arrays.update({f"test_{name}": proba for name, proba in self.test_predictions_.items()})
+        np.savez(arrays_path, **arrays)
+        joblib.dump(self.estimators_, estimators_path)
+        self._prune_cache()
+
+    def _prune_cache(self):
+        # Όπως το ArtifactStore: κρατά τα πιο πρόσφατα keys (μοντέλα παλιότερων pickles χωρίς cache_keep -> 3)
+        keep = getattr(self, 'cache_keep', 3)
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            key, sep, suffix = name.partition('_')
+            if sep and suffix in ('predictions.npz', 'estimators.joblib'):
+                mtime = os.path.getmtime(os.path.join(self.cache_dir, name))
+                entries[key] = max(entries.get(key, 0.0), mtime)
+        for key in sorted(entries, key=entries.get, reverse=True)[keep:]:
+            for path in self._cache_paths(key):
+                if os.path.isfile(path):
+                    os.remove(path)
+
+    def fit(self, X, y, X_test=None, store=None):
+        """
+        store: FeatureStore με τα ίδια X/y (και X_test), ώστε τα folds να διαβάζουν από το memmap του
+        και να μοιράζονται τα bins του LightGBM. Τα X/y/X_test αγνοούνται τότε εκτός από τις ετικέτες.
+        """
+        logger = logging.getLogger('modeling')
+        if store is not None and store.cv != self.cv:
+            raise ValueError(f"Το feature store έχει {store.cv} folds, το stacking {self.cv}.")
+        y = np.asarray(y if store is None else store.y_train)
+        self.classes_ = np.unique(y)
+        self.stack_method_ = ['predict_proba'] * len(self.estimators)
+        self.fit_timings_ = []
+
+        key = self.cache_key(X, y, X_test, store=store)
+        self.cache_key_ = key
+        self.cache_hit_ = self._load_cache(key)
+        if self.cache_hit_:
+            logger.info("[stacking] Cache hit (%s): base μοντέλα και OOF προβλέψεις από %s", key, self.cache_dir)
+        else:
+            backend = 'loky' if self.n_jobs > 1 else 'sequential'
+            if store is None:
+                folds = list(StratifiedKFold(n_splits=self.cv).split(np.zeros(len(y)), y))
+                tasks = [(name, None, est, None, None) for name, est in self.estimators]
+                tasks += [(name, k, est, train_idx, val_idx)
+                          for name, est in self.estimators for k, (train_idx, val_idx) in enumerate(folds)]
+
+                # Το joblib κάνει memory-map τα μεγάλα arrays προς τους workers αντί για αντιγραφή
+                results = Parallel(n_jobs=self.n_jobs, backend=backend)(
+                    delayed(_fit_fold)(name, fold, est, X, y, train_idx, val_idx, X_test)
+                    for name, fold, est, train_idx, val_idx in tasks
+                )
+            else:
+                # Στους workers περνά μόνο το path του store και ο αριθμός του fold
+                folds = [store.fold_indices(k) for k in range(self.cv)]
+                X_test = store.X_test
+                results = Parallel(n_jobs=self.n_jobs, backend=backend)(
+                    delayed(_fit_fold_store)(name, fold, est, store, X_test is not None)
+                    for fold in (None, *range(self.cv)) for name, est in self.estimators
+                )
+
+            n_classes = len(self.classes_)
+            self.oof_predictions_ = {name: np.zeros((len(y), n_classes)) for name, _ in self.estimators}
+            self.test_predictions_ = {} if X_test is not None else None
+            fitted = {}
+            for name, fold, est, proba, timing in results:
+                self.fit_timings_.append(timing)
+                if fold is None:
+                    fitted[name] = est
+                    if X_test is not None:
+                        self.test_predictions_[name] = proba
+                else:
+                    self.oof_predictions_[name][folds[fold][1]] = proba
+            self.estimators_ = [fitted[name] for name, _ in self.estimators]
+            self._save_cache(key, y)
+
+        self.named_estimators_ = Bunch(**{name: est for (name, _), est in zip(self.estimators, self.estimators_)})
+        if hasattr(self.estimators_[0], 'feature_names_in_'):
+            self.feature_names_in_ = self.estimators_[0].feature_names_in_
+        return self.refit_meta(y)
+
+    def refit_meta(self, y, final_estimator=None):
+        """
+        (Επαν)εκπαίδευση μόνο του meta-model πάνω στις αποθηκευμένες OOF πιθανότητες.
+        """
+        if final_estimator is not None:
+            self.final_estimator = final_estimator
+        self.final_estimator_ = clone(self.final_estimator).fit(self._stack(self.oof_predictions_), np.asarray(y))
+        return self
+
+    def _stack(self, base_probas):
+        return np.hstack([base_probas[name] for name, _ in self.estimators])
+
+    def base_predict_proba(self, X):
+        return {name: est.predict_proba(X) for name, est in self.named_estimators_.items()}
+
+    def transform(self, X):
+        return self._stack(self.base_predict_proba(X))
+
+    def predict_proba_from_base(self, base_probas):
+        return self.final_estimator_.predict_proba(self._stack(base_probas))
+
+    def predict_proba(self, X):
+        return self.predict_proba_from_base(self.base_predict_proba(X))
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def __getstate__(self):
+        # Οι OOF/test πίνακες μένουν στο cache_dir, όχι μέσα στο pickle του μοντέλου
+        state = self.__dict__.copy()
+        state.pop('oof_predictions_', None)
+        state.pop('test_predictions_', None)
+        return state
+
+# === Βήματα εκπαίδευσης (χρησιμοποιούνται και ως ξεχωριστά stages του pipeline) ===
+def train_model(X_train, y_train, X_test=None, cv_folds=5, config=None, logger=None, store=None):
+    """
+    Εκπαίδευση του OOF stacking (store: FeatureStore των ίδιων δεδομένων, βλ. feature_store.py).
+    Επιστρέφει (model, resolved training config).
+    """
+    logger = logger or logging.getLogger('modeling')
+    config = config or TrainingConfig()
 
     logger.info("[1] Ορισμός βασικών μοντέλων...")
-    base_models = [
-        ('xgb', XGBClassifier(use_label_encoder=False, eval_metric='mlogloss', tree_method='gpu_hist')),
-        ('lgbm', LGBMClassifier(device='gpu', gpu_platform_id=0, gpu_device_id=0)),
-        ('rf', RandomForestClassifier(n_jobs=-1))
-    ]
-    meta_model = LogisticRegression(max_iter=1000, n_jobs=-1)
-
-    model = StackingClassifier(estimators=base_models, final_estimator=meta_model, cv=cv_folds)
-    model.fit(X_train, y_train)
+    base_models, meta_model, resolved = build_estimators(config)
+    logger.info("Training config: %s", resolved)
+
+    model = OOFStackingClassifier(estimators=base_models, final_estimator=meta_model, cv=cv_folds,
+                                  n_jobs=resolved["stack_n_jobs"])
+
+    # Κάθε (estimator, fold) τρέχει σε δικό του worker process με threads_per_estimator threads,
+    # ώστε stack_n_jobs * threads_per_estimator <= n_threads (χωρίς oversubscription)
+    with span('stacking'), fit_timer("stacking (σύνολο)", logger=logger, n_threads=resolved["n_threads"]):
+        model.fit(X_train, y_train, X_test=X_test, store=store)
     logger.info("Μοντέλο εκπαιδεύτηκε επιτυχώς.")
 
-    y_pred = model.predict(X_test)
-    y_proba = model.predict_proba(X_test)
+    # Τα fits τρέχουν σε workers: καταγραφή των χρόνων τους (RSS του worker στο τέλος του fit)
+    for t in model.fit_timings_:
+        fold = 'final' if t["fold"] is None else f"fold{t['fold']}"
+        METRICS.record(f"stacking/fit/{t['name']}/{fold}", t["wall_seconds"], t["cpu_seconds"],
+                       peak_rss_mb=t.get("rss_mb"))
+
+    for name, _ in base_models:
+        runs = [t for t in model.fit_timings_ if t["name"] == name]
+        if runs:
+            wall = sum(t["wall_seconds"] for t in runs)
+            cpu = sum(t["cpu_seconds"] for t in runs)
+            logger.info("[fit] %s: %d fits, wall %.2fs, CPU %.2fs, utilization %.0f%% (%d threads)", name, len(runs),
+                        wall, cpu, 100 * cpu / (wall * resolved["threads_per_estimator"]) if wall > 0 else 0.0,
+                        resolved["threads_per_estimator"])
+    return model, resolved
+
+def evaluate_model(model, y_test, label_names, test_predictions=None, logger=None):
+    """
+    Μετρικές, classification report, confusion matrix και ακρίβεια base μοντέλων στο results/.
+    test_predictions: base πιθανότητες του test set (default: model.test_predictions_ από το fit).
+    """
+    logger = logger or logging.getLogger('modeling')
+    test_predictions = model.test_predictions_ if test_predictions is None else test_predictions
+
+    # Οι base προβλέψεις του test set υπολογίστηκαν ήδη στο fit και επαναχρησιμοποιούνται
+    y_proba = model.predict_proba_from_base(test_predictions)
+    y_pred = model.classes_[y_proba.argmax(axis=1)]
 
-    # === Accuracy & ROC AUC
-    acc = accuracy_score(y_test, y_pred)
-    roc = roc_auc_score(y_test, y_proba, multi_class='ovr')
+    # === Όλες οι μετρικές (report, confusion matrix, ROC AUC, calibration) σε ένα πέρασμα
+    codes = np.searchsorted(model.classes_, np.asarray(y_test))
+    result = compute_metrics(codes, y_proba, label_names)
+    acc, roc = result["accuracy"], result["roc_auc_macro"]
     logger.info(f"Accuracy: {acc:.4f}")
     logger.info(f"ROC AUC (OvR): {roc:.4f}")
+    logger.info(f"Log loss: {result['log_loss']:.4f}, ECE: {result['ece']:.4f}")
 
     # === Classification Report
-    report = classification_report(y_test, y_pred, target_names=label_names, output_dict=True)
-    df_report = pd.DataFrame(report).transpose()
     os.makedirs("results", exist_ok=True)
-    df_report.to_csv("results/classification_report.csv")
-    logger.info("Αποθηκεύτηκε το classification_report.csv")
+    classification_report_frame(result).to_csv("results/classification_report.csv")
+    with open("results/evaluation_metrics.json", 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    logger.info("Αποθηκεύτηκε το classification_report.csv και evaluation_metrics.json")
 
     # === Confusion Matrix
-    cm = confusion_matrix(y_test, y_pred)
-    cm_display = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=label_names)
-    cm_display.plot(cmap='Blues', xticks_rotation=45)
-    plt.title('Confusion Matrix')
-    plt.tight_layout()
-    plt.savefig("results/confusion_matrix.png")
-    plt.close()
+    cm = np.asarray(result["confusion_matrix"])
+    with span('plot/confusion_matrix.png'):
+        cm_display = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=label_names)
+        cm_display.plot(cmap='Blues', xticks_rotation=45)
+        plt.title('Confusion Matrix')
+        plt.tight_layout()
+        plt.savefig("results/confusion_matrix.png")
+        plt.close()
     pd.DataFrame(cm, index=label_names, columns=label_names).to_csv("results/confusion_matrix.csv")
     logger.info("Αποθηκεύτηκε confusion_matrix σε PNG/CSV")
 
     # === Αξιολόγηση επιμέρους μοντέλων και αποθήκευση συγκρίσεων
     model_scores = []
-    for name, clf in model.named_estimators_.items():
-        yp = clf.predict(X_test)
-        score = accuracy_score(y_test, yp)
+    for name, proba in test_predictions.items():
+        score = float((proba.argmax(axis=1) == codes).mean())
         logger.info(f"[{name}] Accuracy: {score:.4f}")
         model_scores.append({'Model': name, 'Accuracy': score})
 
@@ -94,55 +355,59 @@ def run_modeling(X_train, X_test, y_train, y_test, feature_names, label_names, c
     model_scores_df.to_csv("results/base_model_accuracies.csv", index=False)
     logger.info("Αποθηκεύτηκε base_model_accuracies.csv")
 
-    # === SHAP για XGBoost
-    logger.info("Υπολογισμός SHAP για XGBoost...")
-    explainer = shap.Explainer(model.named_estimators_['xgb'], X_train, feature_names=feature_names)
-    shap_values = explainer(X_test)
+    return y_pred, {"accuracy": acc, "roc_auc": roc, "log_loss": result["log_loss"], "ece": result["ece"]}
 
-    os.makedirs("results/shap", exist_ok=True)
-    summary_data = []
+def explain_model(model, X_train, X_test, y_test, label_names, shap_models=('xgb', 'lgbm', 'rf'),
+                  shap_background=100, shap_max_rows=2000, shap_perturbation='interventional', n_jobs=1,
+                  logger=None):
+    """
+    SHAP (TreeExplainer) για xgb/lgbm/rf, με όριο γραμμών ανά κλάση. Επιστρέφει το metadata των τιμών.
+    """
+    logger = logger or logging.getLogger('modeling')
+    logger.info("Υπολογισμός SHAP για %s...", ", ".join(shap_models))
+    explain_idx = select_rows_stratified(X_test, y_test, max_rows=shap_max_rows)
+    return compute_shap_values(model.named_estimators_, X_train, X_test.iloc[explain_idx], models=shap_models,
+                               n_background=shap_background, feature_perturbation=shap_perturbation,
+                               n_jobs=n_jobs, label_names=label_names, logger=logger)
 
-    for i, name in enumerate(label_names):
-        logger.info(f"[SHAP] Κλάση: {name}")
+def render_explanations(label_names, shap_models=('xgb', 'lgbm', 'rf'), shap_max=15, n_jobs=1, logger=None):
+    logger = logger or logging.getLogger('modeling')
+    paths = []
+    for shap_model in shap_models:
+        paths += render_shap_outputs(shap_model, shap_max=shap_max, label_names=label_names, n_jobs=n_jobs,
+                                     logger=logger)
+    return paths
 
-        # Beeswarm Plot
-        plt.figure()
-        shap.plots.beeswarm(shap_values[:, :, i], max_display=shap_max, show=False)
-        plt.title(f'SHAP Beeswarm - Κλάση: {name}')
-        plt.tight_layout()
-        beeswarm_path = f"results/shap/shap_beeswarm_{name}.png"
-        plt.savefig(beeswarm_path)
-        plt.close()
-        logger.info(f"Αποθηκεύτηκε: {beeswarm_path}")
+def save_trained_model(model, path="models/final_model.pkl", artifact_path=ARTIFACT_PATH, logger=None):
+    """
+    Pickle (για SHAP/επανεκπαίδευση) + συμπαγές native artifact για inference (artifact_path=None: μόνο pickle).
+    """
+    logger = logger or logging.getLogger('modeling')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with span('pickle'):
+        joblib.dump(model, path)
+    logger.info(f"Το εκπαιδευμένο μοντέλο αποθηκεύτηκε στο {path}")
+    if artifact_path:
+        with span('artifact'):
+            export_artifact(model, artifact_path, logger=logger)
+    return path
 
-        # Bar Plot
-        plt.figure()
-        shap.plots.bar(shap_values[:, :, i], max_display=shap_max, show=False)
-        plt.title(f'SHAP Feature Importance - Κλάση: {name}')
-        plt.tight_layout()
-        bar_path = f"results/shap/shap_bar_{name}.png"
-        plt.savefig(bar_path)
-        plt.close()
-        logger.info(f"Αποθηκεύτηκε: {bar_path}")
-
-        # SHAP values summary table
-        class_shap_values = shap_values[:, :, i].values
-        mean_abs_shap = np.abs(class_shap_values).mean(axis=0)
-        feature_ranking = pd.DataFrame({
-            'Feature': feature_names,
-            'MeanAbsSHAP': mean_abs_shap,
-            'Class': name
-        }).sort_values(by='MeanAbsSHAP', ascending=False).head(shap_max)
-        summary_data.append(feature_ranking)
-
-    shap_summary_df = pd.concat(summary_data, axis=0)
-    shap_summary_df.to_csv("results/shap/shap_top_features_summary.csv", index=False)
-    logger.info("Αποθηκεύτηκε shap_top_features_summary.csv")
+# === Κύρια Συνάρτηση Εκπαίδευσης ===
+def run_modeling(X_train, X_test, y_train, y_test, feature_names, label_names, cv_folds=5, shap_max=15, save_model=True,
+                 config=None, shap_models=('xgb', 'lgbm', 'rf'), shap_background=100, shap_max_rows=2000,
+                 shap_perturbation='interventional'):
+    logger = configure_logging()
+
+    model, resolved = train_model(X_train, y_train, X_test, cv_folds=cv_folds, config=config, logger=logger)
+    y_pred, metrics = evaluate_model(model, y_test, label_names, logger=logger)
+
+    explain_model(model, X_train, X_test, y_test, label_names, shap_models=shap_models,
+                  shap_background=shap_background, shap_max_rows=shap_max_rows, shap_perturbation=shap_perturbation,
+                  n_jobs=resolved["stack_n_jobs"], logger=logger)
+    render_explanations(label_names, shap_models, shap_max, n_jobs=resolved["stack_n_jobs"], logger=logger)
 
     # === Αποθήκευση Μοντέλου
     if save_model:
-        os.makedirs("models", exist_ok=True)
-        joblib.dump(model, "models/final_model.pkl")
-        logger.info("Το εκπαιδευμένο μοντέλο αποθηκεύτηκε στο models/final_model.pkl")
+        save_trained_model(model, logger=logger)
 
-    return model, y_pred, {"accuracy": acc, "roc_auc": roc}
+    return model, y_pred, metrics
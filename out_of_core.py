@@ -0,0 +1,483 @@
+# === out_of_core.py ===
+# Εκπαίδευση του stacking σε δεδομένα μεγαλύτερα από τη μνήμη: δύο streaming περάσματα του CSV
+# (δείγμα για το fit του pipeline, μετά προεπεξεργασμένα shards στον δίσκο), XGBoost με external-memory
+# DMatrix (DataIter), LightGBM σε stratified δείγμα φραγμένου μεγέθους, RandomForest σε stratified
+# δείγμα ή ως ένωση forests ανά shard, και meta-model πάνω σε streamed OOF πιθανότητες
+
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.utils import Bunch
+
+from data_loader import stream_dataset, build_dtype_schema, _file_fingerprint, CATEGORICAL_COLUMNS
+from preprocessing import PreprocessingPipeline
+from training_config import TrainingConfig, build_estimators
+from modeling import OOFStackingClassifier, save_trained_model
+from evaluation import compute_metrics
+from metrics import METRICS, span, rss_mb
+from feature_store import lgbm_train_params, xgb_train_params, wrap_booster
+from drift import PROFILE_PATH, DataProfiler, save_profile
+
+WORK_DIR = "data/.cache/out_of_core"
+REPORT_PATH = "results/out_of_core_report.json"
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/out_of_core.log', level=logging.INFO):
+    logger = logging.getLogger('out_of_core')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Δείγμα σταθερού μεγέθους από stream ===
+def _take(values, idx):
+    return values.iloc[idx] if hasattr(values, 'iloc') else values[idx]
+
+def _concat(parts):
+    return pd.concat(parts, ignore_index=True) if hasattr(parts[0], 'iloc') else np.concatenate(parts)
+
+class BottomKSample:
+    """
+    Ομοιόμορφο δείγμα χωρίς επανάθεση από stream (bottom-k: κρατιούνται οι γραμμές με τα μικρότερα
+    τυχαία keys), έως capacity γραμμές ανά κλάση αν stratify, αλλιώς συνολικά. Τα values είναι
+    arrays ή DataFrames με την ίδια σειρά γραμμών.
+    """
+
+    def __init__(self, capacity, stratify=True, random_state=42):
+        self.capacity = capacity
+        self.stratify = stratify
+        self.rng = np.random.default_rng(random_state)
+        self.keys = None
+        self.values = None
+
+    def update(self, y, **values):
+        keys = self.rng.random(len(y))
+        if self.keys is not None:
+            keys = np.concatenate([self.keys, keys])
+            y = np.concatenate([self.values["y"], y])
+            values = {name: _concat([self.values[name], v]) for name, v in values.items()}
+        groups = y if self.stratify else np.zeros(len(y), dtype=np.int64)
+        # Ανά ομάδα οι capacity μικρότεροι keys: ταξινόμηση κατά (ομάδα, key) και θέση μέσα στην ομάδα
+        order = np.lexsort((keys, groups))
+        sorted_groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        keep = np.sort(order[rank < self.capacity])
+        self.keys = keys[keep]
+        self.values = {"y": y[keep], **{name: _take(v, keep) for name, v in values.items()}}
+
+    def __len__(self):
+        return 0 if self.keys is None else len(self.keys)
+
+# === Shards στον δίσκο ===
+class ShardStore:
+    """
+    Προεπεξεργασμένα chunks ως .npy (X float32, y, fold) στο path, memory-mapped στην ανάγνωση.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.shards = []
+
+    def write(self, X, y, fold):
+        i = len(self.shards)
+        for name, values in (("X", X), ("y", y), ("fold", fold)):
+            np.save(os.path.join(self.path, f"{name}_{i:05d}.npy"), values)
+        self.shards.append(len(y))
+
+    def read(self, i):
+        return tuple(np.load(os.path.join(self.path, f"{name}_{i:05d}.npy"), mmap_mode='r')
+                     for name in ("X", "y", "fold"))
+
+    def offsets(self):
+        return np.r_[0, np.cumsum(self.shards)]
+
+    def iter(self, exclude_fold=None, only_fold=None):
+        """
+        (index shard, X, y, mask) για κάθε shard, με mask τις γραμμές που ανήκουν στο ζητούμενο υποσύνολο.
+        """
+        for i in range(len(self.shards)):
+            X, y, fold = self.read(i)
+            if exclude_fold is not None:
+                mask = fold != exclude_fold
+            elif only_fold is not None:
+                mask = fold == only_fold
+            else:
+                mask = np.ones(len(y), dtype=bool)
+            yield i, X, y, mask
+
+# === Περάσματα πάνω στο CSV ===
+def _chunks(file_path, target, chunk_rows, categories=None):
+    # categories: όλες οι τιμές των κατηγορικών στηλών (από το πέρασμα 1), αλλιώς str
+    header = pd.read_csv(file_path, nrows=0).columns
+    return stream_dataset(file_path, target=target, chunksize=chunk_rows,
+                          dtype=build_dtype_schema(header, target, categories))
+
+def _chunk_rows(file_path, memory_mb):
+    # Raw chunk (category/float32 στήλες + αντίγραφα του pandas) + float32 πίνακας: ~256 bytes ανά τιμή
+    n_columns = len(pd.read_csv(file_path, nrows=0).columns)
+    return int(np.clip(memory_mb * 1024 ** 2 // (n_columns * 256), 10_000, 2_000_000))
+
+def write_shards(file_path, target, pipeline, chunk_rows, store, n_folds, samples, random_state=42,
+                 categories=None):
+    """
+    Πέρασμα 2: transform ανά chunk σε float32 shards, stratified ανάθεση fold (round-robin ανά κλάση)
+    και ενημέρωση των stratified δειγμάτων (samples: RandomForest, LightGBM) με X και fold.
+    """
+    rng = np.random.default_rng(random_state)
+    n_classes = len(pipeline.classes_)
+    next_fold = rng.integers(0, n_folds, n_classes)
+    for chunk in _chunks(file_path, target, chunk_rows, categories):
+        chunk = chunk[chunk[target].notna()]
+        X = pipeline.transform_array(chunk, dtype=np.float32)
+        y = pipeline.encode_target(chunk[target]).to_numpy().astype(np.int8)
+        fold = np.empty(len(y), dtype=np.int8)
+        for c in range(n_classes):
+            rows = rng.permutation(np.flatnonzero(y == c))
+            fold[rows] = (next_fold[c] + np.arange(len(rows))) % n_folds
+            next_fold[c] = (next_fold[c] + len(rows)) % n_folds
+        store.write(X, y, fold)
+        for sample in samples:
+            sample.update(y, X=X, fold=fold)
+
+# === Base μοντέλα ===
+def _class_weights(counts):
+    # Balanced βάρη (n / (K * n_c)): αντί για SMOTE, που δεν γίνεται σε stream
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts.sum() / (len(counts) * counts)
+
+def _xgb_iterator(store, weights, exclude_fold, cache_prefix):
+    import xgboost as xgb
+
+    class _ShardIterator(xgb.DataIter):
+        # Ένα shard τη φορά: το XGBoost κρατά τα pages του στο cache_prefix, όχι στη μνήμη
+        def __init__(self):
+            self._it = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._it is None:
+                self._it = store.iter(exclude_fold=exclude_fold)
+            for _, X, y, mask in self._it:
+                if mask.any():
+                    input_data(data=np.asarray(X[mask]), label=np.asarray(y[mask]), weight=weights[y[mask]])
+                    return 1
+            return 0
+
+        def reset(self):
+            self._it = None
+
+    return _ShardIterator()
+
+def train_xgb(estimator, store, weights, feature_names, n_classes, exclude_fold, work_dir, n_threads):
+    import xgboost as xgb
+    cache_prefix = os.path.join(work_dir, f"xgb_cache_{'all' if exclude_fold is None else exclude_fold}")
+    dtrain = xgb.DMatrix(_xgb_iterator(store, weights, exclude_fold, cache_prefix), missing=np.nan,
+                         feature_names=list(feature_names), nthread=n_threads)
+    params = xgb_train_params(estimator, n_classes)
+    params.update(tree_method='hist', nthread=n_threads)
+    params.pop('n_jobs', None)
+    params.pop('use_label_encoder', None)
+    booster = xgb.train(params, dtrain, num_boost_round=estimator.n_estimators)
+    del dtrain
+    for path in os.listdir(work_dir):
+        if path.startswith(os.path.basename(cache_prefix)):
+            os.remove(os.path.join(work_dir, path))
+    return booster
+
+def build_lgbm_dataset(lgbm_sample, binary_path, feature_names, n_classes, n_threads):
+    """
+    Binary LightGBM Dataset από το stratified δείγμα (έως lgbm_sample_rows γραμμές): η μνήμη δεν
+    εξαρτάται από το μέγεθος του αρχείου. Balanced βάρη από τις μετρήσεις κλάσεων του δείγματος (το
+    stratified δείγμα έχει άλλες αναλογίες από το αρχείο). Αποθηκεύεται ως .bin δίπλα στα shards.
+    Επιστρέφει (dataset, fold ids των γραμμών του).
+    """
+    import lightgbm as lgb
+    values = lgbm_sample.values
+    y = values["y"].astype(np.int64)
+    weights = _class_weights(np.bincount(y, minlength=n_classes))
+    dataset = lgb.Dataset(values["X"], label=y, weight=weights[y], feature_name=list(feature_names),
+                          free_raw_data=True, params={'verbose': -1, 'n_jobs': n_threads})
+    dataset.construct()
+    if os.path.isfile(binary_path):
+        os.remove(binary_path)
+    dataset.save_binary(binary_path)
+    return dataset, values["fold"]
+
+def train_lgbm(estimator, dataset, fold_ids, n_classes, exclude_fold, n_threads):
+    import lightgbm as lgb
+    params = lgbm_train_params(estimator, n_classes)
+    params.update(n_jobs=n_threads, verbose=-1)
+    # Όπως στο feature_store: τα folds είναι subsets που μοιράζονται τα bins όλου του Dataset
+    train_set = dataset if exclude_fold is None else dataset.subset(np.flatnonzero(fold_ids != exclude_fold)).construct()
+    return lgb.train(params, train_set, num_boost_round=estimator.n_estimators)
+
+def train_rf(estimator, store, rf_sample, weights, exclude_fold, mode, n_classes, logger):
+    """
+    mode='sample': ένα forest στο stratified δείγμα. mode='chunks': forest ανά shard με
+    n_estimators / n_shards δέντρα, ενωμένα σε ένα (shards χωρίς όλες τις κλάσεις παραλείπονται).
+    """
+    if mode == 'sample':
+        values = rf_sample.values
+        mask = values["fold"] != exclude_fold if exclude_fold is not None else np.ones(len(values["y"]), bool)
+        y = values["y"][mask].astype(np.int64)
+        return clone(estimator).fit(values["X"][mask], y, sample_weight=weights[y])
+
+    per_shard = max(1, estimator.n_estimators // len(store.shards))
+    forest, trees = None, []
+    for i, X, y, mask in store.iter(exclude_fold=exclude_fold):
+        y = np.asarray(y[mask]).astype(np.int64)
+        if len(np.unique(y)) < n_classes:
+            logger.warning("[RF] Shard %d χωρίς όλες τις κλάσεις: παράλειψη", i)
+            continue
+        part = clone(estimator).set_params(n_estimators=per_shard).fit(np.asarray(X[mask]), y,
+                                                                      sample_weight=weights[y])
+        forest = forest or part
+        trees += part.estimators_
+    if forest is None:
+        raise ValueError("Κανένα shard δεν περιέχει όλες τις κλάσεις: μεγαλύτερο chunk_rows ή rf_mode='sample'.")
+    forest.estimators_ = trees
+    forest.n_estimators = len(trees)
+    return forest
+
+def _predict(name, model, X, feature_names):
+    if name == 'xgb':
+        import xgboost as xgb
+        return model.predict(xgb.DMatrix(X, feature_names=list(feature_names), missing=np.nan))
+    return model.predict(X) if name == 'lgbm' else model.predict_proba(X)
+
+# === Κύρια ροή ===
+def train_out_of_core(file_path, target='Heart_Condition', n_folds=3, memory_mb=1024, chunk_rows=None,
+                      rf_mode='sample', rf_sample_rows=200_000, lgbm_sample_rows=1_000_000, meta_sample_rows=200_000,
+                      pipeline_sample_rows=100_000,
+                      config=None, work_dir=WORK_DIR, model_path='models/final_model.pkl',
+                      pipeline_path='models/preprocessing_pipeline.pkl', report_path=REPORT_PATH, keep_shards=False,
+                      profile_path=PROFILE_PATH, random_state=42, logger=None):
+    """
+    Εκπαιδεύει το ίδιο stacking (xgb, lgbm, rf + LogisticRegression) χωρίς να φορτώσει ποτέ όλο το
+    dataset. Η μνήμη φράσσεται από chunk_rows (ή memory_mb) και τα μεγέθη των δειγμάτων: RandomForest και
+    LightGBM εκπαιδεύονται σε stratified δείγματα (rf_sample_rows, lgbm_sample_rows, μοιρασμένα ανά κλάση),
+    μόνο το XGBoost βλέπει όλες τις γραμμές. Εκτός δειγμάτων μένουν στη μνήμη μόνο οι μετρήσεις κλάσεων.
+    Αντί για SMOTE: balanced βάρη κλάσεων.
+    Το πρώτο πέρασμα χτίζει και το προφίλ δεδομένων (profile_path) για το drift monitoring του inference.
+    Επιστρέφει (model, pipeline, report).
+    """
+    from encoder_utils import save_pipeline
+
+    if rf_mode not in ('sample', 'chunks'):
+        raise ValueError("rf_mode πρέπει να είναι 'sample' ή 'chunks'.")
+    logger = logger or logging.getLogger('out_of_core')
+    config = config or TrainingConfig.from_tuned(device='cpu', n_threads=None, stack_n_jobs=1)
+    n_threads = config.resolve()["n_threads"]
+    chunk_rows = chunk_rows or _chunk_rows(file_path, memory_mb)
+    run_dir = os.path.join(work_dir, _file_fingerprint(file_path)["sha256"][:16])
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    timings, start = {}, time.perf_counter()
+    logger.info("[OOC] %s: chunks των %d γραμμών, %d folds, shards στο %s", file_path, chunk_rows, n_folds, run_dir)
+
+    # === Πέρασμα 1: δείγμα για το pipeline
+    with span('scan'):
+        t = time.perf_counter()
+        pipeline = PreprocessingPipeline(target=target)
+        sample = BottomKSample(pipeline_sample_rows, stratify=False, random_state=random_state)
+        profiler = DataProfiler(target=target, random_state=random_state) if profile_path else None
+        counts, categories = {}, {}
+        for chunk in _chunks(file_path, target, chunk_rows):
+            chunk = chunk[chunk[target].notna()].reset_index(drop=True)
+            # Λεξιλόγιο των κατηγορικών στηλών (str στο πέρασμα 1) για σταθερό CategoricalDtype στο πέρασμα 2
+            for col in chunk.columns[chunk.dtypes == object]:
+                if col in CATEGORICAL_COLUMNS or col == target:
+                    categories.setdefault(col, set()).update(chunk[col].dropna().unique())
+            if profiler is not None:
+                profiler.update(chunk)
+            labels, codes = np.unique(chunk[target].astype(str).to_numpy(), return_inverse=True)
+            for label, n in zip(labels, np.bincount(codes)):
+                counts[label] = counts.get(label, 0) + int(n)
+            sample.update(codes, rows=chunk)
+        # Στατιστικά (medians, scaler, κατηγορίες) από ομοιόμορφο δείγμα, κλάσεις από όλο το αρχείο
+        pipeline.fit(sample.values["rows"])
+        pipeline.classes_ = np.array(sorted(counts), dtype=object)
+        n_rows = sum(counts.values())
+        timings["scan"] = time.perf_counter() - t
+    class_counts = np.array([counts[label] for label in pipeline.classes_])
+    weights = _class_weights(class_counts)
+    n_classes = len(pipeline.classes_)
+    feature_names = pipeline.feature_names_
+    logger.info("[OOC] Πέρασμα 1: %d γραμμές, κλάσεις %s (%.1fs)", n_rows, dict(zip(pipeline.classes_, class_counts)),
+                timings["scan"])
+
+    # === Πέρασμα 2: shards + δείγματα RF και LightGBM, LightGBM Dataset από το δείγμα του
+    store = ShardStore(run_dir)
+    rf_sample = BottomKSample(rf_sample_rows // n_classes, stratify=True, random_state=random_state)
+    lgbm_sample = BottomKSample(lgbm_sample_rows // n_classes, stratify=True, random_state=random_state + 1)
+    with span('shard'):
+        t = time.perf_counter()
+        write_shards(file_path, target, pipeline, chunk_rows, store, n_folds, (rf_sample, lgbm_sample),
+                     random_state, categories)
+        lgbm_dataset, fold_ids = build_lgbm_dataset(lgbm_sample, os.path.join(run_dir, "lgbm.bin"), feature_names,
+                                                    n_classes, n_threads)
+        lgbm_rows = len(lgbm_sample)
+        del lgbm_sample
+        timings["shard"] = time.perf_counter() - t
+    logger.info("[OOC] Πέρασμα 2: %d shards, δείγμα RF %d γραμμές, δείγμα LightGBM %d γραμμές (%.1fs)",
+                len(store.shards), len(rf_sample), lgbm_rows, timings["shard"])
+
+    base_models, meta_model, _ = build_estimators(config)
+    estimators = dict(base_models)
+
+    def fit_all(exclude_fold):
+        tag = 'all' if exclude_fold is None else f"fold{exclude_fold}"
+        fitted = {}
+        for name, fit in (("xgb", lambda: train_xgb(estimators["xgb"], store, weights, feature_names, n_classes,
+                                                     exclude_fold, run_dir, n_threads)),
+                          ("lgbm", lambda: train_lgbm(estimators["lgbm"], lgbm_dataset, fold_ids, n_classes,
+                                                      exclude_fold, n_threads)),
+                          ("rf", lambda: train_rf(estimators["rf"], store, rf_sample, weights, exclude_fold,
+                                                  rf_mode, n_classes, logger))):
+            t = time.perf_counter()
+            with span(f"fit/{name}/{tag}"):
+                fitted[name] = fit()
+            timings[f"fit/{name}/{tag}"] = time.perf_counter() - t
+            logger.info("[OOC] %s %s: %.1fs (RSS %.0f MB)", name, tag, timings[f"fit/{name}/{tag}"], rss_mb())
+        return fitted
+
+    # === OOF πιθανότητες: memmap στον δίσκο, δείγμα τους για το meta-model
+    offsets = store.offsets()
+    oof = np.lib.format.open_memmap(os.path.join(run_dir, "oof.npy"), mode='w+', dtype=np.float32,
+                                    shape=(n_rows, len(base_models) * n_classes))
+    for k in range(n_folds):
+        fitted = fit_all(k)
+        with span(f"oof/fold{k}"):
+            for i, X, y, mask in store.iter(only_fold=k):
+                rows = offsets[i] + np.flatnonzero(mask)
+                oof[rows] = np.hstack([_predict(name, fitted[name], np.asarray(X[mask]), feature_names)
+                                       for name, _ in base_models])
+        del fitted
+    oof.flush()
+
+    meta_sample = BottomKSample(meta_sample_rows, stratify=False, random_state=random_state)
+    for i in range(len(store.shards)):
+        y = np.asarray(store.read(i)[1]).astype(np.int64)
+        meta_sample.update(y, P=np.asarray(oof[offsets[i]:offsets[i + 1]]))
+    P_meta, y_meta = meta_sample.values["P"], meta_sample.values["y"]
+    with span('meta'):
+        final_estimator = clone(meta_model).fit(P_meta, y_meta)
+
+    # OOF μετρικές στο (ομοιόμορφο) δείγμα: base μοντέλα out-of-fold, stack in-sample ως προς το meta-model
+    oof_metrics = {}
+    for j, (name, _) in enumerate(base_models):
+        result = compute_metrics(y_meta, P_meta[:, j * n_classes:(j + 1) * n_classes], pipeline.classes_)
+        oof_metrics[name] = {m: result[m] for m in ("accuracy", "macro_f1", "roc_auc_macro", "log_loss")}
+    result = compute_metrics(y_meta, final_estimator.predict_proba(P_meta), pipeline.classes_)
+    oof_metrics["stack"] = {m: result[m] for m in ("accuracy", "macro_f1", "roc_auc_macro", "log_loss")}
+
+    # === Τελικά μοντέλα σε όλα τα δεδομένα
+    fitted = fit_all(None)
+    model = OOFStackingClassifier(estimators=base_models, final_estimator=meta_model, cv=n_folds, n_jobs=1)
+    model.classes_ = np.arange(n_classes)
+    model.stack_method_ = ['predict_proba'] * len(base_models)
+    model.estimators_ = [wrap_booster(estimators["xgb"], fitted["xgb"], np.arange(n_classes)),
+                         wrap_booster(estimators["lgbm"], fitted["lgbm"], np.arange(n_classes)),
+                         fitted["rf"]]
+    model.estimators_[2].feature_names_in_ = np.asarray(feature_names, dtype=object)
+    model.named_estimators_ = Bunch(**{name: est for (name, _), est in zip(base_models, model.estimators_)})
+    model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    model.final_estimator_ = final_estimator
+    model.fit_timings_ = [{"name": key.split('/')[1], "fold": key.split('/')[2], "wall_seconds": seconds}
+                          for key, seconds in timings.items() if key.startswith('fit/')]
+    model.oof_predictions_, model.test_predictions_, model.cache_hit_ = None, None, False
+    model.out_of_core_ = True
+
+    save_pipeline(pipeline, pipeline_path)
+    if profiler is not None:
+        save_profile(profiler.profile(), profile_path)
+    save_trained_model(model, model_path, artifact_path=os.path.splitext(model_path)[0], logger=logger)
+    del lgbm_dataset, oof
+    if not keep_shards:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "source": os.path.abspath(file_path),
+        "rows": n_rows,
+        "class_counts": dict(zip(map(str, pipeline.classes_), class_counts.tolist())),
+        "config": {"n_folds": n_folds, "memory_mb": memory_mb, "chunk_rows": chunk_rows, "rf_mode": rf_mode,
+                   "rf_sample_rows": rf_sample_rows, "lgbm_sample_rows": lgbm_sample_rows,
+                   "meta_sample_rows": meta_sample_rows,
+                   "pipeline_sample_rows": pipeline_sample_rows, "n_threads": n_threads},
+        "shards": len(store.shards),
+        "lgbm_rows": lgbm_rows,
+        "total_seconds": time.perf_counter() - start,
+        "timings": timings,
+        "peak_rss_mb": _peak_rss_mb(),
+        "oof_metrics": oof_metrics
+    }
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info("[OOC] Ολοκλήρωση σε %.1fs, peak RSS %.0f MB. OOF stack accuracy %.4f, ROC AUC %.4f",
+                report["total_seconds"], report["peak_rss_mb"], oof_metrics["stack"]["accuracy"],
+                oof_metrics["stack"]["roc_auc_macro"])
+    return model, pipeline, report
+
+def _peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Out-of-core εκπαίδευση του stacking (δεδομένα > μνήμη)")
+    parser.add_argument('--data', required=True, help="CSV (διαβάζεται σε chunks, δύο περάσματα)")
+    parser.add_argument('--target', default='Heart_Condition')
+    parser.add_argument('--folds', type=int, default=3, help="Folds για τις OOF πιθανότητες του meta-model")
+    parser.add_argument('--memory-mb', type=int, default=1024, help="Budget μνήμης ανά chunk (ορίζει το chunk_rows)")
+    parser.add_argument('--chunk-rows', type=int, default=None)
+    parser.add_argument('--rf-mode', choices=('sample', 'chunks'), default='sample')
+    parser.add_argument('--rf-sample-rows', type=int, default=200_000)
+    parser.add_argument('--lgbm-sample-rows', type=int, default=1_000_000,
+                        help="Όριο γραμμών του LightGBM (stratified δείγμα): φράσσει τη μνήμη του binned Dataset")
+    parser.add_argument('--meta-sample-rows', type=int, default=200_000)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--work-dir', default=WORK_DIR)
+    parser.add_argument('--model', default='models/final_model.pkl')
+    parser.add_argument('--pipeline', default='models/preprocessing_pipeline.pkl')
+    parser.add_argument('--profile', default=PROFILE_PATH, help="Προφίλ δεδομένων για drift monitoring ('' χωρίς)")
+    parser.add_argument('--keep-shards', action='store_true')
+    args = parser.parse_args(argv)
+
+    logger = configure_logging()
+    config = TrainingConfig.from_tuned(device='cpu', n_threads=args.threads, stack_n_jobs=1)
+    METRICS.start_run('out_of_core')
+    try:
+        train_out_of_core(args.data, target=args.target, n_folds=args.folds, memory_mb=args.memory_mb,
+                          chunk_rows=args.chunk_rows, rf_mode=args.rf_mode, rf_sample_rows=args.rf_sample_rows,
+                          lgbm_sample_rows=args.lgbm_sample_rows,
+                          meta_sample_rows=args.meta_sample_rows, config=config, work_dir=args.work_dir,
+                          model_path=args.model, pipeline_path=args.pipeline, keep_shards=args.keep_shards,
+                          profile_path=args.profile, logger=logger)
+    finally:
+        METRICS.finish_run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# === pipeline.py ===
+# DAG runner: stages με δηλωμένες εισόδους/παραμέτρους, content-addressed cache στο δίσκο,
+# εκτέλεση μόνο των stages που ακυρώθηκαν και παράλληλη εκτέλεση των ανεξάρτητων
+
+import os
+import sys
+import json
+import time
+import shutil
+import inspect
+import hashlib
+import logging
+import threading
+import dataclasses
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import joblib
+
+from metrics import METRICS, METRICS_DIR, span
+
+PIPELINE_VERSION = 1
+CACHE_DIR = ".pipeline_cache"
+SUMMARY_PATH = "results/pipeline_run.json"
+
+# Το pyplot δεν είναι thread-safe: stages που σχεδιάζουν τρέχουν ένα-ένα
+_PYPLOT_LOCK = threading.Lock()
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/pipeline.log', level=logging.INFO):
+    logger = logging.getLogger('pipeline')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Ορισμός Stage ===
+@dataclass
+class Stage:
+    """
+    func(*τιμές_εισόδων, **params) -> τιμή εξόδου.
+    deps: modules των οποίων ο κώδικας μπαίνει στο key (αλλαγή κώδικα -> επανεκτέλεση).
+    fingerprint: callable(params) με επιπλέον υλικό για το key (π.χ. hash αρχείου εισόδου).
+    outputs: αρχεία που παράγει το stage. Cache hit μόνο αν υπάρχουν αμετάβλητα.
+    runtime: επιπλέον kwargs που δεν μπαίνουν στο key (π.χ. threads), γιατί δεν αλλάζουν το αποτέλεσμα.
+    cache=False: η τιμή δεν αποθηκεύεται (π.χ. stage με δικό του cache) και εκτελείται όποτε χρειαστεί.
+    """
+    name: str
+    func: callable
+    inputs: tuple = ()
+    params: dict = field(default_factory=dict)
+    runtime: dict = field(default_factory=dict)
+    deps: tuple = ()
+    fingerprint: callable = None
+    outputs: tuple = ()
+    cache: bool = True
+    uses_pyplot: bool = False
+
+def _jsonable(value):
+    if dataclasses.is_dataclass(value):
+        return {"__dataclass__": type(value).__name__, **dataclasses.asdict(value)}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    return value
+
+def _source_hash(obj):
+    try:
+        return hashlib.sha256(inspect.getsource(obj).encode('utf-8')).hexdigest()
+    except (OSError, TypeError):
+        return getattr(obj, '__qualname__', repr(obj))
+
+def _module_hash(name):
+    module = sys.modules.get(name) or __import__(name)
+    path = getattr(module, '__file__', None)
+    if not path or not os.path.isfile(path):
+        return name
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _file_state(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+# === Content-addressed αποθήκη αποτελεσμάτων ===
+class ArtifactStore:
+    """
+    <root>/<stage>/<key>/value.joblib + meta.json. Κρατά τα keep πιο πρόσφατα keys ανά stage.
+    """
+
+    def __init__(self, root=CACHE_DIR, keep=3):
+        self.root = root
+        self.keep = keep
+
+    def _dir(self, stage, key):
+        return os.path.join(self.root, stage, key)
+
+    def meta(self, stage, key):
+        path = os.path.join(self._dir(stage, key), "meta.json")
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def has(self, stage, key):
+        meta = self.meta(stage, key)
+        if meta is None or not os.path.isfile(os.path.join(self._dir(stage, key), "value.joblib")):
+            return False
+        # Τα αρχεία εξόδου πρέπει να υπάρχουν και να μην έχουν αντικατασταθεί από άλλο run
+        for path, state in meta.get("outputs", {}).items():
+            if not os.path.isfile(path) or _file_state(path) != state:
+                return False
+        return True
+
+    def load(self, stage, key):
+        return joblib.load(os.path.join(self._dir(stage, key), "value.joblib"))
+
+    def save(self, stage, key, value, meta):
+        final_dir = self._dir(stage, key)
+        tmp_dir = f"{final_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        joblib.dump(value, os.path.join(tmp_dir, "value.joblib"))
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False, default=str)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+        self.prune(stage)
+
+    def prune(self, stage):
+        stage_dir = os.path.join(self.root, stage)
+        entries = [os.path.join(stage_dir, d) for d in os.listdir(stage_dir) if '.tmp-' not in d]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+# === Runner ===
+class PipelineRunner:
+    """
+    Εκτελεί ένα DAG από Stage. Το key κάθε stage είναι hash(όνομα, params, κώδικας, keys εισόδων),
+    οπότε μια αλλαγή ακυρώνει μόνο το stage και όσα εξαρτώνται από αυτό. Τα stages που πρέπει να τρέξουν
+    εκτελούνται σε thread pool μόλις είναι έτοιμες οι είσοδοί τους (τα βαριά stages έχουν δικά τους processes).
+    """
+
+    def __init__(self, stages, store=None, n_jobs=2, logger=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.store = store or ArtifactStore()
+        self.n_jobs = max(1, n_jobs)
+        self.logger = logger or logging.getLogger('pipeline')
+        self.order = self._toposort()
+
+    def _toposort(self):
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'active':
+                raise ValueError(f"Κυκλική εξάρτηση στο pipeline: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise ValueError(f"Άγνωστο stage '{name}' (είσοδος του {path[-1] if path else '-'})")
+            state[name] = 'active'
+            for dep in self.stages[name].inputs:
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def keys(self):
+        keys = {}
+        for name in self.order:
+            stage = self.stages[name]
+            payload = {
+                "version": PIPELINE_VERSION,
+                "stage": name,
+                "params": _jsonable(stage.params),
+                "code": _source_hash(stage.func),
+                "deps": {dep: _module_hash(dep) for dep in stage.deps},
+                "inputs": {dep: keys[dep] for dep in stage.inputs},
+                "fingerprint": _jsonable(stage.fingerprint(stage.params)) if stage.fingerprint else None
+            }
+            blob = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+            keys[name] = hashlib.sha256(blob).hexdigest()[:16]
+        return keys
+
+    def plan(self, targets=None, force=()):
+        """
+        Επιστρέφει {stage: 'run' | 'hit'} για όσα stages χρειάζονται ώστε να παραχθούν τα targets.
+        force: ονόματα stages για υποχρεωτική επανεκτέλεση ή 'all'.
+        """
+        keys = self.keys()
+        # Χωρίς targets: όλα τα stages με cache. Τα υπόλοιπα εκτελούνται μόνο ως είσοδοι άλλων
+        targets = list(targets or [name for name in self.order if self.stages[name].cache])
+        for name in targets:
+            if name not in self.stages:
+                raise ValueError(f"Άγνωστο stage '{name}'. Διαθέσιμα: {', '.join(self.order)}")
+        plan = {}
+
+        def visit(name):
+            if name in plan:
+                return
+            stage = self.stages[name]
+            forced = force == 'all' or name in force
+            if stage.cache and not forced and self.store.has(name, keys[name]):
+                plan[name] = 'hit'
+                return
+            plan[name] = 'run'
+            for dep in stage.inputs:
+                visit(dep)
+
+        for name in targets:
+            visit(name)
+        return plan, keys
+
+    def load(self, name):
+        """
+        Τιμή ενός stage από το cache (για το τρέχον key του).
+        """
+        return self.store.load(name, self.keys()[name])
+
+    def run(self, targets=None, force=(), summary_path=SUMMARY_PATH, metrics_dir=METRICS_DIR, profile=(),
+            profiler='cprofile'):
+        """
+        Εκτέλεση των stages που λείπουν από το cache. Με metrics_dir, wall/CPU time και peak RSS κάθε stage
+        και υπο-βήματος γράφονται σε JSON/Prometheus. profile: stages (ή υπο-βήματα) για cProfile/py-spy dump.
+        """
+        owns_run = metrics_dir is not None and not METRICS.active
+        if owns_run:
+            METRICS.start_run('pipeline', profile=profile, profiler=profiler)
+        try:
+            return self._run(targets, force, summary_path)
+        finally:
+            if owns_run:
+                METRICS.finish_run(metrics_dir)
+
+    def _run(self, targets, force, summary_path):
+        run_start = time.perf_counter()
+        plan, keys = self.plan(targets, force)
+        values, summary = {}, {}
+        values_lock = threading.Lock()
+
+        for name in self.order:
+            if name in plan:
+                summary[name] = {"status": plan[name], "key": keys[name], "seconds": 0.0}
+        self.logger.info("[pipeline] Σχέδιο: %s", ", ".join(f"{n}={s}" for n, s in plan.items()))
+
+        def value_of(name):
+            # Οι τιμές των cache hits φορτώνονται μόνο αν τις χρειάζεται stage που εκτελείται
+            with values_lock:
+                if name not in values:
+                    start = time.perf_counter()
+                    values[name] = self.store.load(name, keys[name])
+                    summary[name]["load_seconds"] = time.perf_counter() - start
+                return values[name]
+
+        def execute(name):
+            stage = self.stages[name]
+            args = [value_of(dep) for dep in stage.inputs]
+            self.logger.info("[pipeline] ▶ %s (%s)", name, keys[name])
+            start = time.perf_counter()
+            with span(name):
+                if stage.uses_pyplot:
+                    with _PYPLOT_LOCK:
+                        value = stage.func(*args, **stage.params, **stage.runtime)
+                else:
+                    value = stage.func(*args, **stage.params, **stage.runtime)
+            seconds = time.perf_counter() - start
+            if stage.cache:
+                self.store.save(name, keys[name], value, {
+                    "stage": name,
+                    "key": keys[name],
+                    "params": _jsonable(stage.params),
+                    "inputs": {dep: keys[dep] for dep in stage.inputs},
+                    "seconds": seconds,
+                    "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    "outputs": {path: _file_state(path) for path in stage.outputs if os.path.isfile(path)}
+                })
+            return value, seconds
+
+        pending = [name for name in self.order if plan.get(name) == 'run']
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            while pending or running:
+                ready = [name for name in pending
+                         if all(plan[dep] == 'hit' or dep in values for dep in self.stages[name].inputs)]
+                for name in ready:
+                    pending.remove(name)
+                    running[executor.submit(execute, name)] = name
+                if not running:
+                    raise RuntimeError(f"Αδιέξοδο στο pipeline: {pending}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        value, seconds = future.result()
+                    except Exception:
+                        self.logger.exception("[pipeline] ✖ %s απέτυχε", name)
+                        summary[name]["status"] = 'failed'
+                        for other in running:
+                            other.cancel()
+                        self._write_summary(summary, time.perf_counter() - run_start, summary_path)
+                        raise
+                    with values_lock:
+                        values[name] = value
+                    summary[name]["seconds"] = seconds
+                    self.logger.info("[pipeline] ✔ %s σε %.2fs", name, seconds)
+
+        total = time.perf_counter() - run_start
+        self._write_summary(summary, total, summary_path)
+        return values, summary
+
+    def _write_summary(self, summary, total_seconds, summary_path):
+        hits = sum(1 for s in summary.values() if s["status"] == 'hit')
+        runs = sum(1 for s in summary.values() if s["status"] == 'run')
+        self.logger.info("[pipeline] %-16s %-7s %9s  %s", "stage", "status", "seconds", "key")
+        for name, entry in summary.items():
+            self.logger.info("[pipeline] %-16s %-7s %9.2f  %s", name, entry["status"],
+                             entry["seconds"] + entry.get("load_seconds", 0.0), entry["key"])
+        self.logger.info("[pipeline] Σύνολο %.2fs — %d εκτελέστηκαν, %d από cache", total_seconds, runs, hits)
+        if summary_path:
+            os.makedirs(os.path.dirname(summary_path) or '.', exist_ok=True)
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump({"total_seconds": total_seconds, "cache_hits": hits, "executed": runs, "stages": summary},
+                          f, indent=2, ensure_ascii=False)
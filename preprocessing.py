@@ -1,60 +1,162 @@
 # === preprocessing.py ===
-# Label Encoding, Scaling, SMOTE + επιστροφή encoders για deploy/inference
+# Fitted preprocessing pipeline (imputation, encoding, scaling), split, SMOTE στο train + επιστροφή pipeline για deploy/inference
 
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from imblearn.over_sampling import SMOTE
+from resampling import SMOTESampler
 from collections import Counter
+from metrics import span
 
-def preprocess_data(data, target='Heart_Condition', test_size=0.2, scaling=True, handle_missing='median'):
-    data = data.copy()
-
-    # === Αφαίρεση timestamp
-    if 'timestamp' in data.columns:
-        data.drop(columns=['timestamp'], inplace=True)
-
-    # === Διαχείριση Missing Values
-    if handle_missing == 'median':
-        data.fillna(data.median(numeric_only=True), inplace=True)
-    elif handle_missing == 'mean':
-        data.fillna(data.mean(numeric_only=True), inplace=True)
-    else:
-        raise ValueError("handle_missing πρέπει να είναι 'median' ή 'mean'.")
-
-    # === Label Encoding για κατηγορικά features
-    feature_encoders = {}
-    categorical_cols = data.select_dtypes(include=['object', 'category']).columns.drop(target, errors='ignore')
-
-    for col in categorical_cols:
-        le = LabelEncoder()
-        data[col] = le.fit_transform(data[col].astype(str))
-        feature_encoders[col] = le
-
-    # === Encoding στόχου
-    target_encoder = None
-    if data[target].dtype == 'object' or str(data[target].dtype).startswith("category"):
-        target_encoder = LabelEncoder()
-        data[target] = target_encoder.fit_transform(data[target].astype(str))
-
-    # === Ορισμός X και y
-    X = data.drop(columns=[target])
-    y = data[target]
-
-    # === Scaling
-    if scaling:
-        scaler = StandardScaler()
-        X[X.columns] = scaler.fit_transform(X)
-    else:
-        scaler = None
-
-    # === SMOTE
-    print("[SMOTE] Πριν:", Counter(y))
-    sm = SMOTE(random_state=42)
-    X_res, y_res = sm.fit_resample(X, y)
-    print("[SMOTE] Μετά:", Counter(y_res))
-
-    # === Train-Test Split
-    X_train, X_test, y_train, y_test = train_test_split(X_res, y_res, test_size=test_size, random_state=42)
-
-    return X_train, X_test, y_train, y_test, X.columns.tolist(), scaler, feature_encoders, target_encoder
+# === Preprocessing Pipeline ===
+class PreprocessingPipeline:
+    """
+    Ενιαίο, serializable transform: medians imputation, lookup κατηγοριών -> codes,
+    mean/scale του scaling και σειρά στηλών. Μετασχηματίζει N γραμμές σε ένα vectorized πέρασμα.
+    """
+
+    def __init__(self, target='Heart_Condition', handle_missing='median', scaling=True,
+                 handle_unknown='mode', drop_columns=('timestamp',)):
+        if handle_missing not in ('median', 'mean'):
+            raise ValueError("handle_missing πρέπει να είναι 'median' ή 'mean'.")
+        if handle_unknown not in ('mode', 'code'):
+            raise ValueError("handle_unknown πρέπει να είναι 'mode' ή 'code'.")
+        self.target = target
+        self.handle_missing = handle_missing
+        self.scaling = scaling
+        self.handle_unknown = handle_unknown
+        self.drop_columns = tuple(drop_columns)
+
+    def fit(self, data):
+        X = data.drop(columns=[self.target, *self.drop_columns], errors='ignore')
+
+        self.categorical_cols_ = X.select_dtypes(include=['object', 'category']).columns.tolist()
+        self.numeric_cols_ = [col for col in X.columns if col not in self.categorical_cols_]
+        self.feature_names_ = X.columns.tolist()
+
+        # === Τιμές imputation για αριθμητικά features
+        numeric = X[self.numeric_cols_].to_numpy(dtype=np.float64)
+        if self.handle_missing == 'median':
+            self.fill_values_ = np.nanmedian(numeric, axis=0) if numeric.size else np.empty(0)
+        else:
+            self.fill_values_ = np.nanmean(numeric, axis=0) if numeric.size else np.empty(0)
+
+        # === Lookup tables κατηγορία -> code (ταξινομημένες, ίδια codes με LabelEncoder)
+        self.categories_ = {}
+        self.unknown_codes_ = {}
+        for col in self.categorical_cols_:
+            values = X[col].astype(str)
+            categories = np.sort(values.unique())
+            self.categories_[col] = categories
+            codes = pd.Categorical(values, categories=categories).codes
+            mode_code = np.bincount(codes, minlength=len(categories)).argmax()
+            self.unknown_codes_[col] = int(mode_code) if self.handle_unknown == 'mode' else -1
+
+        # === Κλάσεις στόχου
+        self.classes_ = None
+        y = data[self.target] if self.target in data.columns else None
+        if y is not None and (y.dtype == 'object' or str(y.dtype).startswith('category')):
+            self.classes_ = np.sort(y.astype(str).unique())
+
+        # === Παράμετροι scaling
+        if self.scaling:
+            encoded = self._encode(X)
+            self.mean_ = encoded.mean(axis=0)
+            scale = encoded.std(axis=0)
+            scale[scale == 0.0] = 1.0
+            self.scale_ = scale
+        else:
+            self.mean_ = self.scale_ = None
+
+        return self
+
+    def _encode(self, data, dtype=np.float64):
+        n_rows = len(data)
+        out = np.empty((n_rows, len(self.feature_names_)), dtype=dtype)
+        positions = {col: i for i, col in enumerate(self.feature_names_)}
+
+        if self.numeric_cols_:
+            numeric = data.reindex(columns=self.numeric_cols_).to_numpy(dtype=np.float64)
+            numeric = np.where(np.isnan(numeric), self.fill_values_, numeric)
+            out[:, [positions[col] for col in self.numeric_cols_]] = numeric
+
+        for col in self.categorical_cols_:
+            if col in data.columns:
+                codes = pd.Categorical(data[col].astype(str), categories=self.categories_[col]).codes
+                codes = np.where(codes < 0, self.unknown_codes_[col], codes)
+            else:
+                codes = np.full(n_rows, self.unknown_codes_[col])
+            out[:, positions[col]] = codes
+
+        return out
+
+    def transform_array(self, data, dtype=np.float64):
+        """
+        Μετασχηματίζει batch σε numpy array με τη σειρά στηλών του fit.
+        Άγνωστες κατηγορίες -> code της πιο συχνής κατηγορίας ('mode') ή -1 ('code').
+        """
+        with span('encoding'):
+            out = self._encode(data, dtype=dtype)
+        if self.scaling:
+            with span('scaling'):
+                out -= self.mean_.astype(dtype)
+                out /= self.scale_.astype(dtype)
+        return out
+
+    def transform(self, data):
+        return pd.DataFrame(self.transform_array(data), columns=self.feature_names_, index=data.index)
+
+    def fit_transform(self, data):
+        return self.fit(data).transform(data)
+
+    def encode_target(self, y):
+        if self.classes_ is None:
+            return pd.Series(np.asarray(y), index=getattr(y, 'index', None), name=self.target)
+        codes = pd.Categorical(np.asarray(y).astype(str), categories=self.classes_).codes
+        if (codes < 0).any():
+            raise ValueError("Άγνωστη κλάση στόχου στο input.")
+        return pd.Series(codes.astype(np.int64), index=getattr(y, 'index', None), name=self.target)
+
+    def decode_target(self, codes):
+        codes = np.asarray(codes)
+        return codes if self.classes_ is None else self.classes_[codes]
+
+# === Κύρια Συνάρτηση Προεπεξεργασίας ===
+def preprocess_data(data, target='Heart_Condition', test_size=0.2, scaling=True, handle_missing='median',
+                    resample=True, smote_k=5, nn_backend='exact', n_jobs=None, max_synthetic_mb=None):
+    """
+    Split πρώτα (stratified), fit του pipeline μόνο στο train, float32 πίνακες και SMOTE μόνο στο
+    training fold, ώστε κανένα συνθετικό δείγμα ή στατιστικό του test να μη διαρρέει στην εκπαίδευση.
+    """
+    # === Stratified Train-Test Split σε δείκτες (χωρίς αντιγραφή του dataframe)
+    labels = data[target].astype(str).to_numpy()
+    train_idx, test_idx = train_test_split(np.arange(len(data)), test_size=test_size, random_state=42,
+                                           stratify=labels)
+
+    # === Fit του pipeline (imputation, encoding, scaling) μόνο στο train
+    pipeline = PreprocessingPipeline(target=target, handle_missing=handle_missing, scaling=scaling)
+    with span('fit_pipeline'):
+        pipeline.fit(data.iloc[train_idx])
+    with span('transform'):
+        X_all = pipeline.transform_array(data, dtype=np.float32)
+    y_all = pipeline.encode_target(data[target]).to_numpy()
+    X_train, y_train = X_all[train_idx], y_all[train_idx]
+    X_test, y_test = X_all[test_idx], y_all[test_idx]
+    del X_all
+
+    # === SMOTE μόνο στο training fold
+    if resample:
+        print("[SMOTE] Πριν:", Counter(y_train))
+        sampler = SMOTESampler(k_neighbors=smote_k, random_state=42, n_jobs=n_jobs, nn_backend=nn_backend,
+                               max_memory_mb=max_synthetic_mb)
+        with span('smote'):
+            X_train, y_train = sampler.fit_resample(X_train, y_train)
+        print("[SMOTE] Μετά:", Counter(y_train))
+
+    columns = pipeline.feature_names_
+    X_train = pd.DataFrame(X_train, columns=columns, copy=False)
+    X_test = pd.DataFrame(X_test, columns=columns, index=data.index[test_idx], copy=False)
+    y_train = pd.Series(y_train, name=target)
+    y_test = pd.Series(y_test, index=data.index[test_idx], name=target)
+
+    return X_train, X_test, y_train, y_test, pipeline.feature_names_, pipeline
@@ -0,0 +1,96 @@
+# === resampling.py ===
+# SMOTE σε float32 μόνο στο training fold: παράλληλο/προσεγγιστικό k-NN, όριο μνήμης
+
+import logging
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+class SMOTESampler:
+    """
+    Oversampling των μειοψηφικών κλάσεων ως την πλειοψηφική (όπως το SMOTE του imblearn).
+    Αποθηκεύει μόνο τους δείκτες των k γειτόνων ανά δείγμα και δημιουργεί τα συνθετικά δείγματα
+    vectorized (fit_resample, με όριο max_memory_mb).
+    nn_backend: 'exact' (sklearn NearestNeighbors, n_jobs threads) ή 'approximate' (pynndescent αν υπάρχει).
+    """
+
+    def __init__(self, k_neighbors=5, random_state=42, n_jobs=None, nn_backend='exact', max_memory_mb=None):
+        if nn_backend not in ('exact', 'approximate'):
+            raise ValueError("nn_backend πρέπει να είναι 'exact' ή 'approximate'.")
+        self.k_neighbors = k_neighbors
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.nn_backend = nn_backend
+        self.max_memory_mb = max_memory_mb
+
+    def _neighbors(self, X_class):
+        k = min(self.k_neighbors + 1, len(X_class))
+        if self.nn_backend == 'approximate':
+            try:
+                from pynndescent import NNDescent
+                index = NNDescent(X_class, n_neighbors=k, random_state=self.random_state, n_jobs=self.n_jobs or -1)
+                neighbors, _ = index.neighbor_graph
+                return neighbors[:, 1:].astype(np.int32)
+            except ImportError:
+                logging.getLogger('preprocessing').warning(
+                    "Το pynndescent δεν είναι εγκατεστημένο. Χρήση exact k-NN.")
+        nn = NearestNeighbors(n_neighbors=k, n_jobs=self.n_jobs).fit(X_class)
+        # Η πρώτη στήλη είναι το ίδιο το δείγμα
+        return nn.kneighbors(X_class, return_distance=False)[:, 1:].astype(np.int32)
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y)
+        classes, counts = np.unique(y, return_counts=True)
+        self.n_features_ = X.shape[1]
+        self.class_counts_ = dict(zip(classes.tolist(), counts.tolist()))
+        self.class_indices_ = {}
+        self.neighbors_ = {}
+
+        target = counts.max()
+        n_synthetic = {c: int(target - n) for c, n in zip(classes.tolist(), counts.tolist()) if n < target and n > 1}
+
+        # Όριο μνήμης: αναλογική μείωση των συνθετικών δειγμάτων όλων των κλάσεων
+        if self.max_memory_mb is not None and n_synthetic:
+            budget_rows = int(self.max_memory_mb * 1024 ** 2 / (self.n_features_ * X.itemsize))
+            total = sum(n_synthetic.values())
+            if total > budget_rows:
+                ratio = budget_rows / total
+                n_synthetic = {c: int(n * ratio) for c, n in n_synthetic.items()}
+                logging.getLogger('preprocessing').info(
+                    "[SMOTE] Όριο μνήμης %s MB: %d -> %d συνθετικά δείγματα", self.max_memory_mb, total,
+                    sum(n_synthetic.values()))
+        self.n_synthetic_ = n_synthetic
+
+        for c in n_synthetic:
+            idx = np.flatnonzero(y == c)
+            self.class_indices_[c] = idx
+            self.neighbors_[c] = self._neighbors(X[idx])
+        return self
+
+    def _generate(self, X, c, n, rng):
+        idx = self.class_indices_[c]
+        neighbors = self.neighbors_[c]
+        base = rng.integers(0, len(idx), n)
+        neighbor = neighbors[base, rng.integers(0, neighbors.shape[1], n)]
+        gap = rng.random((n, 1), dtype=np.float32)
+        X_base = X[idx[base]]
+        return X_base + gap * (X[idx[neighbor]] - X_base)
+
+    def sample(self, X, n_per_class=None, rng=None):
+        """
+        Δημιουργεί συνθετικά δείγματα (default: όσα χρειάζονται για ισορροπία, εντός ορίου μνήμης).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rng = rng or np.random.default_rng(self.random_state)
+        n_per_class = self.n_synthetic_ if n_per_class is None else n_per_class
+        parts = [(self._generate(X, c, n, rng), np.full(n, c)) for c, n in n_per_class.items() if n > 0]
+        if not parts:
+            return np.empty((0, X.shape[1]), dtype=np.float32), np.empty(0)
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def fit_resample(self, X, y):
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y)
+        self.fit(X, y)
+        X_syn, y_syn = self.sample(X)
+        return np.concatenate([X, X_syn]), np.concatenate([y, y_syn.astype(y.dtype)])
@@ -0,0 +1,383 @@
+# === serving.py ===
+# Online scoring service (asyncio HTTP) με micro-batching γύρω από το Stacking μοντέλο
+
+import json
+import time
+import asyncio
+import logging
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from inference import load_artifacts, predict_batch, explain_batch, MODEL_PATH, PIPELINE_PATH
+from explain import LocalExplainer, DEFAULT_TOP_K
+from drift import PROFILE_PATH, DriftMonitor, load_profile
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/serving.log', level=logging.INFO):
+    logger = logging.getLogger('serving')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Latency Histogram ===
+class LatencyHistogram:
+    """
+    Ιστόγραμμα latency με σταθερά buckets (ms) + προσεγγιστικά percentiles.
+    """
+    BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.BUCKETS_MS) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        self.counts[np.searchsorted(self.BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def percentile(self, q):
+        if self.total == 0:
+            return 0.0
+        rank = np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.total)
+        return float(self.BUCKETS_MS[rank]) if rank < len(self.BUCKETS_MS) else float('inf')
+
+    def to_dict(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "buckets_ms": {str(b): int(c) for b, c in zip(self.BUCKETS_MS + ('+Inf',), np.cumsum(self.counts))}
+        }
+
+# === Micro-Batcher ===
+class ServiceShutdown(RuntimeError):
+    """
+    Το request δεν εξυπηρετήθηκε γιατί ο service τερματίζει.
+    """
+
+class MicroBatcher:
+    """
+    Συγκεντρώνει ταυτόχρονα requests σε batches (max_batch_size γραμμές ή max_wait_ms αναμονή),
+    ώστε τα xgb/lgbm/rf + meta-model να τρέχουν μία φορά ανά batch.
+    Με monitor (DriftMonitor) κάθε batch και οι προβλέψεις του ενημερώνουν τα drift counts, σε δικό του
+    thread αφού έχουν απαντηθεί τα requests του batch.
+    """
+
+    def __init__(self, model, pipeline, max_batch_size=256, max_wait_ms=5.0, monitor=None):
+        self.model = model
+        self.pipeline = pipeline
+        self.monitor = monitor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.n_batches = 0
+        self.n_batched_rows = 0
+        self.batch_latency = LatencyHistogram()
+        self._queue = asyncio.Queue()
+        # Ένα thread για το μοντέλο: τα batches εκτελούνται σειριακά εκτός του event loop
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._monitor_executor = ThreadPoolExecutor(max_workers=1) if monitor is not None else None
+        self._task = None
+        # Τα items του batch που εκτελείται, ώστε το stop να απαντήσει και αυτά
+        self._in_flight = []
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # Τα requests που περιμένουν (στην ουρά ή στο batch που διακόπηκε) αποτυγχάνουν αντί να μείνουν ανοιχτά
+        pending = self._in_flight
+        self._in_flight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(ServiceShutdown("Ο scoring service τερματίζει."))
+        self._executor.shutdown(wait=False)
+        if self._monitor_executor is not None:
+            self._monitor_executor.shutdown(wait=False)
+
+    async def submit(self, frame):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((frame, future))
+        return await future
+
+    async def _collect(self):
+        items = self._in_flight
+        items.append(await self._queue.get())
+        n_rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+        return items
+
+    def _predict(self, frames):
+        start = time.perf_counter()
+        batch = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+        result = predict_batch(self.model, self.pipeline, batch)
+        return batch, result, time.perf_counter() - start
+
+    def _monitor(self, batch, result):
+        try:
+            self.monitor.update(batch)
+            self.monitor.update_predictions(result["Prediction"].to_numpy())
+        except Exception:
+            logging.getLogger('serving').exception("Σφάλμα στο drift monitoring:")
+
+    def _predict_each(self, frames):
+        # Fallback όταν αποτύχει ολόκληρο το batch: κάθε request χωριστά, ώστε ένα άκυρο record
+        # να αποτυγχάνει μόνο το δικό του request
+        outcomes = []
+        for frame in frames:
+            try:
+                outcomes.append(self._predict([frame]))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _record_batch(self, batch, result, latency):
+        # Μετά την απάντηση των requests: το monitoring δεν προστίθεται στο latency τους
+        self.n_batches += 1
+        self.n_batched_rows += len(result)
+        self.batch_latency.observe(latency)
+        if self._monitor_executor is not None:
+            self._monitor_executor.submit(self._monitor, batch, result)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._in_flight = []
+            items = await self._collect()
+            frames = [frame for frame, _ in items]
+            try:
+                batch, result, latency = await loop.run_in_executor(self._executor, self._predict, frames)
+            except Exception as e:
+                outcomes = [e] if len(items) == 1 else \
+                    await loop.run_in_executor(self._executor, self._predict_each, frames)
+                for (_, future), outcome in zip(items, outcomes):
+                    if isinstance(outcome, Exception):
+                        if not future.done():
+                            future.set_exception(outcome)
+                        continue
+                    if not future.done():
+                        future.set_result(outcome[1])
+                    self._record_batch(*outcome)
+                continue
+
+            offset = 0
+            for frame, future in items:
+                if not future.done():
+                    future.set_result(result.iloc[offset:offset + len(frame)])
+                offset += len(frame)
+            self._record_batch(batch, result, latency)
+
+# === HTTP Server ===
+class ScoringServer:
+    """
+    Ελάχιστος HTTP/1.1 server (keep-alive) πάνω σε asyncio streams.
+    Endpoints: POST /predict, POST /explain, GET /health, GET /metrics, GET /drift (αν δοθεί monitor).
+    """
+
+    def __init__(self, model, pipeline, host='0.0.0.0', port=8080, max_batch_size=256, max_wait_ms=5.0, monitor=None,
+                 logger=None):
+        self.host = host
+        self.port = port
+        self.logger = logger or logging.getLogger('serving')
+        self.batcher = MicroBatcher(model, pipeline, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                                    monitor=monitor)
+        self.request_latency = LatencyHistogram()
+        self.started_at = time.time()
+        self.n_requests = 0
+        self.n_records = 0
+        self._model, self._pipeline = model, pipeline
+        self._explainer = None
+        self._server = None
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info("Scoring service στο http://%s:%d (max_batch_size=%d, max_wait_ms=%.1f)",
+                         self.host, self.port, self.batcher.max_batch_size, self.batcher.max_wait * 1000)
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def metrics(self):
+        batcher = self.batcher
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "requests": self.n_requests,
+            "records": self.n_records,
+            "batches": batcher.n_batches,
+            "mean_batch_size": batcher.n_batched_rows / batcher.n_batches if batcher.n_batches else 0.0,
+            "request_latency": self.request_latency.to_dict(),
+            "batch_latency": batcher.batch_latency.to_dict()
+        }
+
+    async def _predict(self, body):
+        records = self._records(json.loads(body or b'null'))
+
+        start = time.perf_counter()
+        result = await self.batcher.submit(pd.DataFrame.from_records(records))
+        self.request_latency.observe(time.perf_counter() - start)
+        self.n_requests += 1
+        self.n_records += len(records)
+        return {"predictions": result.to_dict(orient='records')}
+
+    def _records(self, payload):
+        if isinstance(payload, dict) and 'records' in payload:
+            payload = payload['records']
+        records = [payload] if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+            raise ValueError("Αναμένεται JSON record, λίστα από records ή {\"records\": [...]}.")
+        return records
+
+    async def _explain(self, body):
+        # Εκτός micro-batching, στο thread του μοντέλου: ο explainer (booster + LRU cache) χτίζεται μία φορά.
+        # Body όπως στο /predict, προαιρετικά {"records": [...], "top_k": k}
+        payload = json.loads(body or b'null')
+        top_k = int(payload.get('top_k', DEFAULT_TOP_K)) if isinstance(payload, dict) and 'records' in payload \
+            else DEFAULT_TOP_K
+        records = self._records(payload)
+        frame = pd.DataFrame.from_records(records)
+        result, explanation = await asyncio.get_running_loop().run_in_executor(
+            self.batcher._executor, self._explain_rows, frame, top_k)
+        contributions = explanation.astype({"Value": str}).groupby("Row")[["Feature", "Value", "SHAP"]]
+        return {"predictions": result.to_dict(orient='records'),
+                "explanations": [group.to_dict(orient='records') for _, group in contributions],
+                "base_values": explanation.groupby("Row")["BaseValue"].first().tolist()}
+
+    def _explain_rows(self, frame, top_k):
+        # Στο thread του μοντέλου: η κατασκευή του explainer (lazy φόρτωση artifact, αντίγραφο booster)
+        # δεν μπλοκάρει το event loop
+        if self._explainer is None:
+            self._explainer = LocalExplainer(self._model, self._pipeline)
+        return explain_batch(self._model, self._pipeline, frame, self._explainer, top_k)
+
+    async def _route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {"status": "ok"}
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics()
+        if method == 'GET' and path == '/drift':
+            if self.batcher.monitor is None:
+                return 404, {"error": "Drift monitoring ανενεργό (δεν βρέθηκε προφίλ δεδομένων)."}
+            return 200, self.batcher.monitor.report()
+        if method == 'POST' and path in ('/predict', '/explain'):
+            try:
+                return 200, await (self._predict(body) if path == '/predict' else self._explain(body))
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {"error": str(e)}
+            except ServiceShutdown as e:
+                return 503, {"error": str(e)}
+            except Exception as e:
+                self.logger.exception("Σφάλμα κατά το scoring:")
+                return 500, {"error": str(e)}
+        return 404, {"error": f"Άγνωστο endpoint: {method} {path}"}
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self._route(method, path.split('?', 1)[0], body)
+                data = json.dumps(payload, default=float, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', 'keep-alive').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online scoring service με micro-batching")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--pipeline', default=PIPELINE_PATH)
+    parser.add_argument('--engine', choices=('native', 'fused'), default='native',
+                        help="fused: ενιαία vectorized αξιολόγηση όλων των δέντρων (χαμηλότερο latency σε μικρά batches)")
+    parser.add_argument('--fused-max-rows', type=int, default=512,
+                        help="Micro-batches με περισσότερες γραμμές πηγαίνουν στο native μοντέλο")
+    parser.add_argument('--profile', default=PROFILE_PATH, help="Προφίλ δεδομένων για GET /drift ('' για απενεργοποίηση)")
+    args = parser.parse_args(argv)
+
+    logger = configure_logging()
+    model, pipeline = load_artifacts(args.model, args.pipeline, engine=args.engine, fused_max_rows=args.fused_max_rows)
+    monitor = DriftMonitor(load_profile(args.profile)) if args.profile and os.path.isfile(args.profile) else None
+    server = ScoringServer(model, pipeline, host=args.host, port=args.port, max_batch_size=args.max_batch_size,
+                           max_wait_ms=args.max_wait_ms, monitor=monitor, logger=logger)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Τερματισμός scoring service.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# === training_config.py ===
+# Ρυθμίσεις εκπαίδευσης ανάλογα με το hardware: ανίχνευση GPU, budget threads, χρονομέτρηση fit
+
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from xgboost import XGBClassifier
+from lightgbm import LGBMClassifier
+
+# === Ανίχνευση διαθέσιμων backends ===
+_BACKENDS = None
+
+def available_cpus():
+    # Σέβεται cpusets/affinity (π.χ. containers) όπου υποστηρίζεται
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _probe(fit):
+    # Τα native libraries γράφουν απευθείας στα fd 1/2 όταν λείπει GPU build, οπότε σιγούν προσωρινά
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        fit()
+        return True
+    except Exception:
+        return False
+    finally:
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [devnull]:
+            os.close(fd)
+
+def detect_backends(refresh=False):
+    """
+    Ελέγχει (μία φορά ανά process) αν XGBoost/LightGBM μπορούν να εκπαιδευτούν σε GPU,
+    με ένα μικρό δοκιμαστικό fit.
+    """
+    global _BACKENDS
+    if _BACKENDS is not None and not refresh:
+        return _BACKENDS
+
+    X = np.random.default_rng(0).random((64, 4))
+    y = np.arange(64) % 2
+    _BACKENDS = {
+        "n_cpus": available_cpus(),
+        "xgboost_gpu": _probe(lambda: XGBClassifier(n_estimators=1, tree_method='gpu_hist').fit(X, y)),
+        "lightgbm_gpu": _probe(lambda: LGBMClassifier(n_estimators=1, device='gpu', verbose=-1).fit(X, y))
+    }
+    return _BACKENDS
+
+# === Training Configuration ===
+@dataclass
+class TrainingConfig:
+    """
+    device: 'auto' (GPU αν υπάρχει, αλλιώς CPU), 'cpu' ή 'gpu'.
+    n_threads: συνολικό budget threads (None -> όλοι οι διαθέσιμοι πυρήνες).
+    stack_n_jobs: παράλληλα fits (worker processes) στο stacking ανά (estimator, fold). Τα threads
+    μοιράζονται ώστε stack_n_jobs * threads_ανά_estimator <= n_threads.
+    *_params: overrides των default υπερπαραμέτρων κάθε μοντέλου.
+    """
+    device: str = 'auto'
+    n_threads: int = None
+    stack_n_jobs: int = 1
+    random_state: int = 42
+    xgb_params: dict = field(default_factory=dict)
+    lgbm_params: dict = field(default_factory=dict)
+    rf_params: dict = field(default_factory=dict)
+    meta_params: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_tuned(cls, path='models/tuned_params.json', **kwargs):
+        """
+        Config με τις υπερπαραμέτρους που βρήκε το tuning.py (αν υπάρχει το αρχείο).
+        """
+        tuned = {}
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                tuned = json.load(f)
+        for name in ('xgb_params', 'lgbm_params', 'rf_params'):
+            kwargs[name] = dict(tuned.get(name, {}), **kwargs.get(name, {}))
+        return cls(**kwargs)
+
+    def resolve(self):
+        """
+        Επιλέγει backend και κατανομή threads για το τρέχον μηχάνημα.
+        """
+        if self.device not in ('auto', 'cpu', 'gpu'):
+            raise ValueError("device πρέπει να είναι 'auto', 'cpu' ή 'gpu'.")
+
+        backends = detect_backends()
+        n_threads = max(1, min(self.n_threads or backends["n_cpus"], backends["n_cpus"]))
+        stack_n_jobs = max(1, min(self.stack_n_jobs, n_threads))
+        per_estimator = max(1, n_threads // stack_n_jobs)
+
+        xgb_gpu = self.device != 'cpu' and backends["xgboost_gpu"]
+        lgbm_gpu = self.device != 'cpu' and backends["lightgbm_gpu"]
+        if self.device == 'gpu' and not (xgb_gpu or lgbm_gpu):
+            raise RuntimeError("Ζητήθηκε device='gpu' αλλά δεν βρέθηκε διαθέσιμο GPU backend.")
+
+        return {
+            "n_threads": n_threads,
+            "stack_n_jobs": stack_n_jobs,
+            "threads_per_estimator": per_estimator,
+            "xgb_device": 'gpu' if xgb_gpu else 'cpu',
+            "lgbm_device": 'gpu' if lgbm_gpu else 'cpu'
+        }
+
+def build_estimators(config=None):
+    """
+    Επιστρέφει (base_models, meta_model, resolved) σύμφωνα με το TrainingConfig.
+    CPU: 'hist' για XGBoost, histogram LightGBM με num_threads από το budget.
+    """
+    config = config or TrainingConfig()
+    resolved = config.resolve()
+    threads = resolved["threads_per_estimator"]
+
+    xgb_params = dict(use_label_encoder=False, eval_metric='mlogloss', n_jobs=threads,
+                      random_state=config.random_state,
+                      tree_method='gpu_hist' if resolved["xgb_device"] == 'gpu' else 'hist')
+    xgb_params.update(config.xgb_params)
+
+    lgbm_params = dict(n_jobs=threads, random_state=config.random_state, verbose=-1)
+    if resolved["lgbm_device"] == 'gpu':
+        lgbm_params.update(device='gpu', gpu_platform_id=0, gpu_device_id=0)
+    lgbm_params.update(config.lgbm_params)
+
+    rf_params = dict(n_jobs=threads, random_state=config.random_state)
+    rf_params.update(config.rf_params)
+
+    meta_params = dict(max_iter=1000, n_jobs=1)
+    meta_params.update(config.meta_params)
+
+    base_models = [
+        ('xgb', XGBClassifier(**xgb_params)),
+        ('lgbm', LGBMClassifier(**lgbm_params)),
+        ('rf', RandomForestClassifier(**rf_params))
+    ]
+    return base_models, LogisticRegression(**meta_params), resolved
+
+# === Χρονομέτρηση fit ===
+@contextmanager
+def fit_timer(name, logger=None, n_threads=None, timings=None):
+    """
+    Μετρά wall time και CPU utilization (CPU time / (wall * threads)) ενός βήματος.
+    """
+    logger = logger or logging.getLogger('modeling')
+    n_threads = n_threads or available_cpus()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        utilization = cpu / (wall * n_threads) if wall > 0 else 0.0
+        logger.info("[fit] %s: wall %.2fs, CPU %.2fs, utilization %.0f%% (%d threads)",
+                    name, wall, cpu, 100 * utilization, n_threads)
+        if timings is not None:
+            timings.append({"name": name, "wall_seconds": wall, "cpu_seconds": cpu,
+                            "cpu_utilization": utilization, "threads": n_threads})
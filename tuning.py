@@ -0,0 +1,358 @@
+# === tuning.py ===
+# Αναζήτηση υπερπαραμέτρων για τα base μοντέλα: successive halving / Hyperband με πόρο το n_estimators,
+# early stopping σε eval set για XGB/LGBM, παράλληλα trials σε processes εντός budget CPU,
+# SQLite store για συνέχιση διακομμένων αναζητήσεων και export των καλύτερων configs για το stacking
+
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import train_test_split
+
+from resampling import SMOTESampler
+from training_config import TrainingConfig, available_cpus, build_estimators
+
+DB_PATH = "models/tuning.sqlite"
+TUNED_PARAMS_PATH = "models/tuned_params.json"
+REPORT_PATH = "results/tuning_report.json"
+
+# === Χώρος αναζήτησης ===
+# ('int', low, high), ('float', low, high), ('log', low, high) ή ('choice', [τιμές])
+SEARCH_SPACE = {
+    "xgb": {
+        "max_depth": ('int', 3, 10),
+        "learning_rate": ('log', 0.01, 0.3),
+        "subsample": ('float', 0.6, 1.0),
+        "colsample_bytree": ('float', 0.5, 1.0),
+        "min_child_weight": ('log', 1.0, 10.0),
+        "reg_lambda": ('log', 1e-3, 10.0)
+    },
+    "lgbm": {
+        "num_leaves": ('int', 15, 127),
+        "learning_rate": ('log', 0.01, 0.3),
+        "min_child_samples": ('int', 5, 100),
+        "subsample": ('float', 0.6, 1.0),
+        "subsample_freq": ('choice', [0, 1]),
+        "colsample_bytree": ('float', 0.5, 1.0),
+        "reg_lambda": ('log', 1e-3, 10.0)
+    },
+    "rf": {
+        "max_depth": ('choice', [None, 8, 16, 32]),
+        "min_samples_leaf": ('int', 1, 10),
+        "max_features": ('choice', ['sqrt', 'log2', 0.5])
+    }
+}
+
+_CONFIG_FIELDS = {"xgb": "xgb_params", "lgbm": "lgbm_params", "rf": "rf_params"}
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/tuning.log', level=logging.INFO):
+    logger = logging.getLogger('tuning')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+def sample_config(space, rng):
+    config = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == 'int':
+            config[name] = int(rng.integers(spec[1], spec[2] + 1))
+        elif kind == 'float':
+            config[name] = float(rng.uniform(spec[1], spec[2]))
+        elif kind == 'log':
+            config[name] = float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+        elif kind == 'choice':
+            config[name] = spec[1][int(rng.integers(len(spec[1])))]
+        else:
+            raise ValueError(f"Άγνωστος τύπος παραμέτρου '{kind}' για {name}")
+    return config
+
+def config_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+# === SQLite store ολοκληρωμένων trials ===
+class TrialStore:
+    """
+    Ένα trial = (study, model, config, resource). Τα ολοκληρωμένα trials δεν ξανατρέχουν.
+    """
+
+    def __init__(self, path=DB_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trials (
+                study TEXT, model TEXT, config_key TEXT, resource INTEGER, params TEXT,
+                score REAL, accuracy REAL, best_iteration INTEGER, seconds REAL, finished_at REAL,
+                PRIMARY KEY (study, model, config_key, resource)
+            )""")
+        self.conn.commit()
+
+    def get(self, study, model, key, resource):
+        row = self.conn.execute(
+            "SELECT score, accuracy, best_iteration, seconds FROM trials "
+            "WHERE study=? AND model=? AND config_key=? AND resource=?", (study, model, key, resource)).fetchone()
+        if row is None:
+            return None
+        return {"score": row[0], "accuracy": row[1], "best_iteration": row[2], "seconds": row[3]}
+
+    def put(self, study, model, key, resource, params, result):
+        self.conn.execute("INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          (study, model, key, resource, json.dumps(params), result["score"], result["accuracy"],
+                           result["best_iteration"], result["seconds"], time.time()))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+# === Εκτέλεση ενός trial (σε worker process) ===
+_worker_data = None
+
+def _init_worker(X_fit, y_fit, X_val, y_val):
+    global _worker_data
+    _worker_data = (X_fit, y_fit, X_val, y_val)
+
+def _run_trial(model, params, resource, threads, random_state, early_stopping_rounds):
+    X_fit, y_fit, X_val, y_val = _worker_data
+    start = time.perf_counter()
+    config = TrainingConfig(device='cpu', n_threads=threads, random_state=random_state,
+                            **{_CONFIG_FIELDS[model]: dict(params, n_estimators=resource)})
+    estimator = dict(build_estimators(config)[0])[model]
+
+    if model == 'xgb':
+        estimator.set_params(early_stopping_rounds=early_stopping_rounds)
+        estimator.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        best_iteration = int(estimator.best_iteration)
+    elif model == 'lgbm':
+        import lightgbm as lgb
+        estimator.fit(X_fit, y_fit, eval_set=[(X_val, y_val)],
+                      callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+        best_iteration = int(estimator.best_iteration_ or resource) - 1
+    else:
+        estimator.fit(X_fit, y_fit)
+        best_iteration = resource - 1
+
+    proba = estimator.predict_proba(X_val)
+    return {
+        "score": float(log_loss(y_val, proba, labels=estimator.classes_)),
+        "accuracy": float(accuracy_score(y_val, estimator.classes_[proba.argmax(axis=1)])),
+        "best_iteration": best_iteration,
+        "seconds": time.perf_counter() - start
+    }
+
+# === Αναζήτηση ===
+class _Search:
+    def __init__(self, store, study, executor, threads, random_state, early_stopping_rounds, logger):
+        self.store = store
+        self.study = study
+        self.executor = executor
+        self.threads = threads
+        self.random_state = random_state
+        self.early_stopping_rounds = early_stopping_rounds
+        self.logger = logger
+        self.start = time.perf_counter()
+        self.trials = []
+        self.best = {}
+
+    def _record(self, model, params, resource, result, cached):
+        trial = dict(result, model=model, params=params, resource=resource, cached=cached,
+                     elapsed=time.perf_counter() - self.start)
+        self.trials.append(trial)
+        best = self.best.get(model)
+        if best is None or (resource, -trial["score"]) > (best["resource"], -best["score"]):
+            self.best[model] = trial
+        return trial
+
+    def run_rung(self, model, configs, resource):
+        """
+        Αξιολογεί όλα τα configs με τον δοσμένο πόρο. Επιστρέφει [(score, params)].
+        """
+        results, pending = [], []
+        for params in configs:
+            key = config_key(params)
+            stored = self.store.get(self.study, model, key, resource)
+            if stored is not None:
+                results.append((self._record(model, params, resource, stored, True)["score"], params))
+            else:
+                pending.append((key, params))
+
+        args = [(model, params, resource, self.threads, self.random_state, self.early_stopping_rounds)
+                for _, params in pending]
+        if self.executor is None:
+            outcomes = ((p, _run_trial(*a)) for p, a in zip(pending, args))
+        else:
+            futures = {self.executor.submit(_run_trial, *a): p for p, a in zip(pending, args)}
+            outcomes = ((futures[f], f.result()) for f in as_completed(futures))
+        for (key, params), result in outcomes:
+            # Κάθε trial αποθηκεύεται μόλις τελειώσει, ώστε μια διακοπή να χάνει μόνο τα τρέχοντα
+            self.store.put(self.study, model, key, resource, params, result)
+            results.append((self._record(model, params, resource, result, False)["score"], params))
+
+        best_score = min(score for score, _ in results)
+        self.logger.info("[%s] resource=%d: %d configs (%d από cache), καλύτερο logloss %.4f", model, resource,
+                         len(configs), len(configs) - len(pending), best_score)
+        return results
+
+    def successive_halving(self, model, configs, min_resource, max_resource, eta):
+        resource = min_resource
+        while True:
+            results = self.run_rung(model, configs, resource)
+            if resource >= max_resource or len(configs) <= 1:
+                return results
+            results.sort(key=lambda r: r[0])
+            configs = [params for _, params in results[:max(1, len(results) // eta)]]
+            resource = min(max_resource, resource * eta)
+
+def tune(X_train, y_train, models=('xgb', 'lgbm', 'rf'), strategy='hyperband', n_configs=27, min_resource=50,
+         max_resource=450, eta=3, n_cpus=None, threads_per_trial=1, val_size=0.2, early_stopping_rounds=20,
+         db_path=DB_PATH, study=None, output_path=TUNED_PARAMS_PATH, report_path=REPORT_PATH, search_space=None,
+         random_state=42, logger=None):
+    """
+    Successive halving (strategy='sh', n_configs τυχαία configs) ή Hyperband (brackets με διαφορετικό
+    αρχικό πόρο) για κάθε μοντέλο, με logloss σε stratified validation split του X_train.
+    Το SMOTE εφαρμόζεται μόνο στο τμήμα εκπαίδευσης του split. Επιστρέφει τα καλύτερα params ανά μοντέλο.
+    """
+    if strategy not in ('sh', 'hyperband'):
+        raise ValueError("strategy πρέπει να είναι 'sh' ή 'hyperband'.")
+    logger = logger or logging.getLogger('tuning')
+    search_space = search_space or SEARCH_SPACE
+    X_train = np.asarray(X_train, dtype=np.float32)
+    y_train = np.asarray(y_train)
+
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=val_size,
+                                                  random_state=random_state, stratify=y_train)
+    X_fit, y_fit = SMOTESampler(random_state=random_state).fit_resample(X_fit, y_fit)
+
+    # Το study εξαρτάται από δεδομένα, split και χώρο αναζήτησης: ίδια είσοδος -> συνέχιση από το store
+    if study is None:
+        digest = hashlib.sha256()
+        for array in (X_train, y_train):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update(json.dumps([search_space, val_size, random_state, early_stopping_rounds],
+                                 sort_keys=True, default=str).encode('utf-8'))
+        study = digest.hexdigest()[:16]
+
+    n_cpus = max(1, min(n_cpus or available_cpus(), available_cpus()))
+    threads = max(1, min(threads_per_trial, n_cpus))
+    n_workers = max(1, n_cpus // threads)
+    logger.info("Study %s: %s, %s, %d workers x %d threads", study, strategy, ", ".join(models), n_workers, threads)
+
+    store = TrialStore(db_path)
+    executor = (ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                    initargs=(X_fit, y_fit, X_val, y_val)) if n_workers > 1 else None)
+    if executor is None:
+        _init_worker(X_fit, y_fit, X_val, y_val)
+    search = _Search(store, study, executor, threads, random_state, early_stopping_rounds, logger)
+    rng = np.random.default_rng(random_state)
+    try:
+        for model in models:
+            space = search_space[model]
+            if strategy == 'sh':
+                search.successive_halving(model, [sample_config(space, rng) for _ in range(n_configs)],
+                                          min_resource, max_resource, eta)
+                continue
+            # Hyperband: brackets από πολλά configs με λίγο πόρο έως λίγα configs με πλήρη πόρο
+            s_max = int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9))
+            for s in range(s_max, -1, -1):
+                n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+                resource = max(min_resource, int(round(max_resource * eta ** -s)))
+                search.successive_halving(model, [sample_config(space, rng) for _ in range(n)],
+                                          resource, max_resource, eta)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        store.close()
+
+    best_params = {}
+    report = {"study": study, "strategy": strategy, "total_seconds": time.perf_counter() - search.start, "models": {}}
+    for model in models:
+        best = search.best[model]
+        params = dict(best["params"])
+        # Early stopping: τελικό n_estimators = καλύτερη επανάληψη στον μεγαλύτερο πόρο
+        params["n_estimators"] = best["best_iteration"] + 1 if model in ('xgb', 'lgbm') else best["resource"]
+        best_params[_CONFIG_FIELDS[model]] = params
+
+        trials = [t for t in search.trials if t["model"] == model]
+        trace, running = [], None
+        for t in trials:
+            if t["resource"] == best["resource"] and (running is None or t["score"] < running):
+                running = t["score"]
+                trace.append({"elapsed_seconds": t["elapsed"], "logloss": t["score"]})
+        report["models"][model] = {
+            "best_logloss": best["score"],
+            "best_accuracy": best["accuracy"],
+            "best_params": params,
+            "n_trials": len(trials),
+            "cached_trials": sum(t["cached"] for t in trials),
+            "trial_seconds": sum(t["seconds"] for t in trials),
+            "time_to_best_seconds": best["elapsed"],
+            "best_score_trace": trace
+        }
+        logger.info("[%s] καλύτερο logloss %.4f (accuracy %.4f) σε %.1fs: %s", model, best["score"],
+                    best["accuracy"], best["elapsed"], params)
+
+    if output_path and os.path.isfile(output_path):
+        # Αναζήτηση για υποσύνολο μοντέλων: τα υπόλοιπα κρατούν τις προηγούμενες τιμές
+        with open(output_path, encoding='utf-8') as f:
+            best_params = dict(json.load(f), **best_params)
+    for path, payload in ((output_path, best_params), (report_path, report)):
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2, ensure_ascii=False)
+    return best_params, report
+
+def main(argv=None):
+    from data_loader import load_dataset, configure_logging as configure_data_logging
+    from preprocessing import preprocess_data
+
+    parser = argparse.ArgumentParser(description="Hyperparameter search (successive halving / Hyperband)")
+    parser.add_argument('--data', default='data/heart.csv')
+    parser.add_argument('--target', default='Heart_Condition')
+    parser.add_argument('--models', nargs='*', default=['xgb', 'lgbm', 'rf'])
+    parser.add_argument('--strategy', choices=('sh', 'hyperband'), default='hyperband')
+    parser.add_argument('--n-configs', type=int, default=27, help="Αρχικά configs για --strategy sh")
+    parser.add_argument('--min-resource', type=int, default=50, help="Ελάχιστα n_estimators")
+    parser.add_argument('--max-resource', type=int, default=450, help="Μέγιστα n_estimators")
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--cpus', type=int, default=None, help="Συνολικό budget CPU")
+    parser.add_argument('--threads-per-trial', type=int, default=1)
+    parser.add_argument('--early-stopping-rounds', type=int, default=20)
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--study', default=None, help="Όνομα study (default: hash δεδομένων + χώρου)")
+    parser.add_argument('--output', default=TUNED_PARAMS_PATH)
+    args = parser.parse_args(argv)
+
+    logger = configure_logging()
+    data, _ = load_dataset(file_path=args.data, target=args.target, logger=configure_data_logging())
+    # Μόνο το train split: το test set δεν χρησιμοποιείται στην αναζήτηση
+    X_train, _, y_train, _, _, _ = preprocess_data(data, target=args.target, resample=False)
+    tune(X_train, y_train, models=args.models, strategy=args.strategy, n_configs=args.n_configs,
+         min_resource=args.min_resource, max_resource=args.max_resource, eta=args.eta, n_cpus=args.cpus,
+         threads_per_trial=args.threads_per_trial, early_stopping_rounds=args.early_stopping_rounds,
+         db_path=args.db, study=args.study, output_path=args.output, logger=logger)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+# === window_features.py ===
+# Χαρακτηριστικά χρονικών παραθύρων ανά ασθενή/συσκευή για ECG και καρδιακό ρυθμό:
+# rolling mean/std, RMSSD, σχετική ισχύς ζωνών (FFT) και στατιστικά κορυφών ECG.
+# Όλα τα παράθυρα υπολογίζονται μαζί με sliding_window_view (stride tricks), χωρίς loops ανά γραμμή,
+# και σε streaming mode πάνω στα chunks του loader με cache ανά chunk.
+
+import os
+import json
+import time
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+HR_COLUMN = "Heart_Rate_bpm"
+SIGNAL_COLUMNS = ("ECG_Lead1_mV", "ECG_Lead2_mV", "Heart_Rate_bpm", "Heart_Rate_Variability_ms")
+ECG_COLUMNS = ("ECG_Lead1_mV", "ECG_Lead2_mV")
+# Ζώνες ως κλάσματα της συχνότητας Nyquist (η δειγματοληψία διαφέρει ανά συσκευή)
+BANDS = {"low": (0.0, 0.25), "mid": (0.25, 0.5), "high": (0.5, 1.0)}
+
+FEATURE_CACHE_VERSION = 1
+
+# === Logging Configuration ===
+def configure_logging(log_file='logs/window_features.log', level=logging.INFO):
+    logger = logging.getLogger('window_features')
+    logger.setLevel(level)
+    logger.handlers.clear()
+
+    formatter = logging.Formatter('%(asctime)s - [%(levelname)s] %(message)s')
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+    return logger
+
+# === Vectorized χαρακτηριστικά πάνω σε πίνακα παραθύρων (n_windows, W) ===
+def _nan_mean_std(windows):
+    count = np.sum(~np.isnan(windows), axis=1)
+    total = np.nansum(windows, axis=1)
+    mean = np.divide(total, count, out=np.full(len(windows), np.nan), where=count > 0)
+    var = np.nansum((windows - mean[:, None]) ** 2, axis=1)
+    std = np.sqrt(np.divide(var, count - 1, out=np.full(len(windows), np.nan), where=count > 1))
+    return mean, std
+
+def rmssd(windows):
+    """
+    Root mean square των διαδοχικών διαφορών (αγνοώντας ζεύγη με NaN).
+    """
+    diff_sq = np.diff(windows, axis=1) ** 2
+    count = np.sum(~np.isnan(diff_sq), axis=1)
+    return np.sqrt(np.divide(np.nansum(diff_sq, axis=1), count, out=np.full(len(windows), np.nan),
+                             where=count > 0))
+
+def band_powers(windows, mean, bands=BANDS):
+    """
+    Σχετική ισχύς ανά ζώνη από το rfft του detrended παραθύρου (τα NaN γίνονται η μέση τιμή).
+    """
+    centered = np.where(np.isnan(windows), 0.0, windows - mean[:, None])
+    power = np.abs(np.fft.rfft(centered, axis=1)[:, 1:]) ** 2
+    freq = np.arange(1, power.shape[1] + 1) / (windows.shape[1] / 2)
+    total = power.sum(axis=1)
+    out = {}
+    for name, (low, high) in bands.items():
+        band = power[:, (freq > low) & (freq <= high)].sum(axis=1)
+        out[name] = np.divide(band, total, out=np.zeros(len(windows)), where=total > 0)
+    return out
+
+def peak_stats(windows, mean, std, k=1.0):
+    """
+    Τοπικά μέγιστα πάνω από mean + k*std: πλήθος, μέσο πλάτος και μέση απόσταση (σε δείγματα).
+    """
+    center = windows[:, 1:-1]
+    peaks = (center > windows[:, :-2]) & (center >= windows[:, 2:]) & (center > (mean + k * std)[:, None])
+    count = peaks.sum(axis=1)
+    amplitude = np.divide(np.where(peaks, center, 0.0).sum(axis=1), count, out=np.full(len(windows), np.nan),
+                          where=count > 0)
+    first = peaks.argmax(axis=1)
+    last = peaks.shape[1] - 1 - peaks[:, ::-1].argmax(axis=1)
+    interval = np.divide(last - first, count - 1, out=np.full(len(windows), np.nan), where=count > 1)
+    return count.astype(np.float64), amplitude, interval
+
+# === Extractor ===
+class WindowFeatureExtractor:
+    """
+    Για κάθε γραμμή: χαρακτηριστικά του trailing παραθύρου των τελευταίων `window` μετρήσεων του ίδιου
+    ασθενή/συσκευής (causal, χωρίς πληροφορία από το μέλλον). Οι πρώτες γραμμές κάθε ομάδας έχουν
+    μερικά παράθυρα (NaN padding, nan-aware στατιστικά).
+    """
+
+    def __init__(self, windows=(16,), group_cols=('Patient_ID',), time_col='timestamp', signals=SIGNAL_COLUMNS,
+                 ecg_signals=ECG_COLUMNS, hr_col=HR_COLUMN, peak_k=1.0, chunk_rows=65_536,
+                 cache_dir='data/.cache/window_features'):
+        self.windows = tuple(windows)
+        self.group_cols = tuple(group_cols)
+        self.time_col = time_col
+        self.signals = tuple(signals)
+        self.ecg_signals = tuple(ecg_signals)
+        self.hr_col = hr_col
+        self.peak_k = peak_k
+        self.chunk_rows = chunk_rows
+        self.cache_dir = cache_dir
+        self.stats_ = {"rows": 0, "samples": 0, "seconds": 0.0, "cache_hits": 0, "chunks": 0}
+
+    @property
+    def max_window(self):
+        return max(self.windows)
+
+    def config_key(self):
+        config = [FEATURE_CACHE_VERSION, self.windows, self.group_cols, self.time_col, self.signals,
+                  self.ecg_signals, self.hr_col, self.peak_k, sorted(BANDS.items())]
+        return hashlib.sha256(json.dumps(config, default=str).encode('utf-8')).hexdigest()[:16]
+
+    def feature_names(self):
+        names = []
+        for w in self.windows:
+            for col in self.signals:
+                names += [f"{col}_w{w}_mean", f"{col}_w{w}_std"] + [f"{col}_w{w}_bp_{b}" for b in BANDS]
+            if self.hr_col in self.signals:
+                names.append(f"RR_w{w}_rmssd")
+            for col in self.ecg_signals:
+                names += [f"{col}_w{w}_peak_count", f"{col}_w{w}_peak_amp", f"{col}_w{w}_peak_interval"]
+        return names
+
+    def _present(self, data):
+        return ([c for c in self.signals if c in data.columns], [c for c in self.group_cols if c in data.columns])
+
+    def _order(self, data, group_cols):
+        """
+        Θέσεις γραμμών ταξινομημένες ανά (ομάδα, χρόνο) και δείκτης ομάδας για κάθε ταξινομημένη γραμμή.
+        """
+        keys = [data[c].to_numpy() for c in reversed(group_cols)]
+        if self.time_col in data.columns:
+            keys.insert(0, pd.to_datetime(data[self.time_col], errors='coerce').to_numpy())
+        order = np.lexsort(keys) if keys else np.arange(len(data))
+        if not group_cols:
+            return order, np.zeros(len(data), dtype=np.int64)
+        sorted_groups = data[list(group_cols)].iloc[order]
+        changed = (sorted_groups.to_numpy()[1:] != sorted_groups.to_numpy()[:-1]).any(axis=1)
+        return order, np.concatenate([[0], np.cumsum(changed)])
+
+    def _compute(self, data):
+        signals, group_cols = self._present(data)
+        n = len(data)
+        if n == 0:
+            return pd.DataFrame({name: pd.Series(dtype=np.float32) for name in self.feature_names()},
+                                index=data.index)
+        order, group_id = self._order(data, group_cols)
+        out = {}
+        for w in self.windows:
+            # Κάθε ομάδα παίρνει w-1 NaN μπροστά: το παράθυρο της γραμμής i είναι padded[p_i-w+1 : p_i+1]
+            ends = np.arange(n) + (group_id + 1) * (w - 1)
+            starts = ends - w + 1
+            padded_len = n + (group_id[-1] + 1) * (w - 1)
+            features = {}
+            for col in signals:
+                values = data[col].to_numpy(dtype=np.float64)[order]
+                if col == self.hr_col:
+                    # RR διαστήματα (ms) από τον καρδιακό ρυθμό για το RMSSD
+                    values = np.stack([values, np.divide(60_000.0, values, out=np.full(n, np.nan),
+                                                         where=values > 0)])
+                else:
+                    values = values[None, :]
+                padded = np.full((len(values), padded_len), np.nan)
+                padded[:, ends] = values
+                view = sliding_window_view(padded, w, axis=1)
+
+                for start in range(0, n, self.chunk_rows):
+                    idx = starts[start:start + self.chunk_rows]
+                    windows = view[0, idx]
+                    mean, std = _nan_mean_std(windows)
+                    block = {f"{col}_w{w}_mean": mean, f"{col}_w{w}_std": std}
+                    block.update({f"{col}_w{w}_bp_{b}": p for b, p in band_powers(windows, mean).items()})
+                    if col == self.hr_col:
+                        block[f"RR_w{w}_rmssd"] = rmssd(view[1, idx])
+                    if col in self.ecg_signals:
+                        count, amplitude, interval = peak_stats(windows, mean, std, self.peak_k)
+                        block.update({f"{col}_w{w}_peak_count": count, f"{col}_w{w}_peak_amp": amplitude,
+                                      f"{col}_w{w}_peak_interval": interval})
+                    for name, values_block in block.items():
+                        features.setdefault(name, []).append(values_block)
+            for name, parts in features.items():
+                column = np.empty(n, dtype=np.float32)
+                column[order] = np.concatenate(parts)
+                out[name] = column
+        return pd.DataFrame(out, index=data.index)
+
+    def transform(self, data, logger=None):
+        """
+        Επιστρέφει το data με τα window features ως επιπλέον στήλες (ίδια σειρά και index).
+        """
+        logger = logger or logging.getLogger('window_features')
+        start = time.perf_counter()
+        features = self._compute(data)
+        self._record(len(data), time.perf_counter() - start, cached=False, logger=logger)
+        return pd.concat([data, features], axis=1)
+
+    def fit_transform(self, data, logger=None):
+        return self.transform(data, logger=logger)
+
+    # === Streaming ===
+    def _cache_path(self, chunk, carry):
+        digest = hashlib.sha256(self.config_key().encode('utf-8'))
+        for frame in (carry, chunk):
+            if frame is not None and len(frame):
+                digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+        return os.path.join(self.cache_dir, self.config_key(), f"{digest.hexdigest()[:24]}.parquet")
+
+    def _latest(self, data, group_cols):
+        """
+        Οι τελευταίες max_window-1 μετρήσεις κάθε ομάδας κατά time_col (σε σειρά αρχείου χωρίς time_col).
+        """
+        if self.time_col in data.columns:
+            times = pd.to_datetime(data[self.time_col], errors='coerce').to_numpy()
+            data = data.iloc[np.argsort(times, kind='stable')]
+        if not group_cols:
+            return data.tail(self.max_window - 1)
+        return data.groupby(list(group_cols), sort=False, observed=True).tail(self.max_window - 1)
+
+    def _check_order(self, carry, chunk, group_cols):
+        # Το carry αρκεί μόνο αν κάθε ομάδα του chunk ξεκινά μετά τις μετρήσεις της στα προηγούμενα chunks
+        if self.time_col not in chunk.columns:
+            return
+        last = pd.to_datetime(carry[self.time_col], errors='coerce')
+        first = pd.to_datetime(chunk[self.time_col], errors='coerce')
+        if group_cols:
+            last = last.groupby([carry[c] for c in group_cols], observed=True).max()
+            first = first.groupby([chunk[c] for c in group_cols], observed=True).min()
+            first, last = first.align(last, join='inner')
+        else:
+            first, last = first.min(), last.max()
+        if np.any(first < last):
+            raise ValueError(f"Τα chunks δεν είναι σε χρονική σειρά ('{self.time_col}'): μετρήσεις παλαιότερες από "
+                             f"προηγούμενο chunk της ίδιας ομάδας. Ταξινομήστε το αρχείο κατά χρόνο ή χρησιμοποιήστε "
+                             f"το transform.")
+
+    def transform_stream(self, chunks, use_cache=True, logger=None):
+        """
+        Generator πάνω στα chunks του loader, σε χρονική σειρά ανά ομάδα (αλλιώς ValueError). Μέσα στο chunk
+        η σειρά δεν έχει σημασία. Οι τελευταίες, κατά time_col, max_window-1 μετρήσεις κάθε ομάδας
+        μεταφέρονται στο επόμενο chunk, ώστε τα παράθυρα που περνούν το όριο να είναι ίδια με του transform.
+        Τα features κάθε chunk αποθηκεύονται (Parquet) με key από το περιεχόμενο chunk + carry.
+        """
+        logger = logger or logging.getLogger('window_features')
+        if use_cache:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.warning("Το pyarrow δεν είναι εγκατεστημένο. Η cache των window features απενεργοποιείται.")
+                use_cache = False
+
+        carry = None
+        for chunk in chunks:
+            start = time.perf_counter()
+            _, group_cols = self._present(chunk)
+            if carry is not None:
+                self._check_order(carry, chunk, group_cols)
+            combined = chunk if carry is None else pd.concat([carry, chunk])
+            cache_path = self._cache_path(chunk, carry) if use_cache and self.cache_dir else None
+            if cache_path and os.path.isfile(cache_path):
+                features = pd.read_parquet(cache_path)
+                features.index = chunk.index
+                cached = True
+            else:
+                features = self._compute(combined.reset_index(drop=True)).iloc[len(combined) - len(chunk):]
+                features.index = chunk.index
+                if cache_path:
+                    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+                    features.reset_index(drop=True).to_parquet(tmp_path, index=False)
+                    os.replace(tmp_path, cache_path)
+                cached = False
+
+            carry = self._latest(combined, group_cols)
+            self._record(len(chunk), time.perf_counter() - start, cached, logger)
+            yield pd.concat([chunk, features], axis=1)
+
+    def _record(self, n_rows, seconds, cached, logger):
+        stats = self.stats_
+        stats["rows"] += n_rows
+        stats["samples"] += n_rows * len(self.signals)
+        stats["seconds"] += seconds
+        stats["chunks"] += 1
+        stats["cache_hits"] += int(cached)
+        logger.info("Window features: %d γραμμές σε %.3fs (%s)", n_rows, seconds, "cache" if cached else "υπολογισμός")
+
+    def throughput(self):
+        """
+        Γραμμές και δείγματα σήματος ανά δευτερόλεπτο για όσα πέρασαν από τον extractor.
+        """
+        stats = dict(self.stats_)
+        seconds = max(stats["seconds"], 1e-12)
+        stats["rows_per_sec"] = stats["rows"] / seconds
+        stats["samples_per_sec"] = stats["samples"] / seconds
+        return stats
+
+def add_window_features(data, windows=(16,), group_cols=('Patient_ID',), chunk_rows=100_000, use_cache=True,
+                        logger=None):
+    """
+    Stage του pipeline: προσθέτει τα window features στο dataframe και καταγράφει τον ρυθμό.
+    Τα δεδομένα περνούν σε χρονική σειρά και σε chunks από το transform_stream (ίδιο αποτέλεσμα με το
+    transform), ώστε με νέες μετρήσεις να υπολογίζονται μόνο τα chunks που άλλαξαν (cache ανά chunk).
+    """
+    logger = logger or logging.getLogger('window_features')
+    extractor = WindowFeatureExtractor(windows=windows, group_cols=group_cols)
+    order = np.arange(len(data))
+    if extractor.time_col in data.columns:
+        order = np.argsort(pd.to_datetime(data[extractor.time_col], errors='coerce').to_numpy(), kind='stable')
+    ordered = data.iloc[order]
+    chunks = (ordered.iloc[i:i + chunk_rows] for i in range(0, len(ordered), chunk_rows))
+    parts = list(extractor.transform_stream(chunks, use_cache=use_cache, logger=logger))
+    # Επιστροφή στη σειρά (και στο index) του data
+    result = pd.concat(parts).iloc[np.argsort(order)] if parts else extractor.transform(data, logger=logger)
+    stats = extractor.throughput()
+    logger.info("Window features: %d στήλες, %.0f samples/sec, %d/%d chunks από cache", len(extractor.feature_names()),
+                stats["samples_per_sec"], stats["cache_hits"], stats["chunks"])
+    return result